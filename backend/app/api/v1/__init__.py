@@ -1,5 +1,7 @@
 from fastapi import APIRouter
-from . import strategies
+from . import strategies, backtests, metrics
 
 router = APIRouter()
 router.include_router(strategies.router)
+router.include_router(backtests.router)
+router.include_router(metrics.router)
@@ -0,0 +1,615 @@
+# backend/app/api/v1/backtests.py
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import get_db, async_session
+from app.db import crud
+from app.db.notify import local_notifier, JOB_DONE
+from app.services.sweep import expand_grid, RANK_METRICS
+from app.services.portfolio import allocate
+from app.services.montecarlo import METHODS
+from app.services.fingerprint import payload_fingerprint, normalize_payload
+from app.services.strategy_graph import GraphError, get_plan
+from app.services.strategy_registry import registry
+from app.services.datastore import time_bounds
+from app.services import export, trade_store
+
+router = APIRouter(tags=["backtests"])
+
+# re-read the job at least this often while waiting, in case a notification was missed
+_WAIT_RECHECK_SECONDS = 5.0
+_SSE_KEEPALIVE_SECONDS = 15.0
+
+# result-cache lookups by this API process, reported by GET /metrics
+result_cache_stats = {"hits": 0, "misses": 0}
+
+async def _submit_job(db: AsyncSession, job_payload: Dict[str, Any], use_cache: bool) -> Dict[str, Any]:
+    """
+    Queue job_payload unless an identical job (same fingerprint) is already queued, running,
+    or finished within RESULT_CACHE_TTL_SECONDS; in that case return that job instead.
+    """
+    fingerprint = payload_fingerprint(job_payload)
+    if use_cache and settings.RESULT_CACHE_TTL_SECONDS > 0:
+        existing = await crud.find_job_by_fingerprint(db, fingerprint, settings.RESULT_CACHE_TTL_SECONDS)
+        result_cache_stats["hits" if existing else "misses"] += 1
+        if existing:
+            return {"job_id": existing.id, "status": existing.status, "cache_hit": True}
+    job = await crud.create_backtest_job(db, job_payload, fingerprint=fingerprint)
+    return {"job_id": job.id, "status": job.status, "cache_hit": False}
+
+class BacktestRequest(BaseModel):
+    strategy_id: int
+    symbol: str
+    start: str
+    end: str
+    timeframe: str = "1m"
+    params: Dict[str, Any] = None
+    force_close: bool = True
+    # simulate in chunks of STREAM_CHUNK_ROWS bars, for ranges too large to load at once
+    streaming: bool = False
+    # store the engine state at the end of the run so a later job can resume from it
+    checkpoint: bool = False
+    # id of a checkpointed job with the same symbol/timeframe/start/params: only bars after
+    # its checkpoint are simulated, and its trades and metrics are carried into this result
+    resume_from: Optional[int] = None
+    # split the bars into this many time shards simulated in parallel on the worker's pool
+    # (0: one per pool process); the result is the same as a serial run's
+    shards: int = 1
+    # False always queues a fresh job, even if an identical one exists
+    use_cache: bool = True
+
+class ParamRange(BaseModel):
+    start: float
+    stop: float
+    step: float = 1
+
+# each sweep parameter is a list of values, an inclusive range, or a single value
+ParamSpec = Union[List[Optional[float]], ParamRange, float, None]
+
+class SweepRequest(BaseModel):
+    strategy_id: int
+    symbol: str
+    start: str
+    end: str
+    timeframe: str = "1m"
+    fast: ParamSpec = [20]
+    slow: ParamSpec = [50]
+    sl: ParamSpec = None
+    tp: ParamSpec = None
+    force_close: bool = True
+    rank_by: str = "total_pnl"
+    top_n: Optional[int] = None
+    use_cache: bool = True
+
+class WalkForwardRequest(BaseModel):
+    strategy_id: int
+    symbol: str
+    start: str
+    end: str
+    timeframe: str = "1m"
+    fast: ParamSpec = [20]
+    slow: ParamSpec = [50]
+    sl: ParamSpec = None
+    tp: ParamSpec = None
+    force_close: bool = True
+    rank_by: str = "total_pnl"
+    # rolling train/test folds; the train window is train_ratio test windows long
+    folds: int = 5
+    train_ratio: float = 3.0
+    # after each fold only the best 1/eta of the remaining candidates go on
+    eta: int = 2
+    use_cache: bool = True
+
+class MonteCarloRequest(BaseModel):
+    # a finished backtest job whose trades are resampled
+    source_job_id: int
+    # "bootstrap" draws trades with replacement, "shuffle" reorders them
+    method: str = "bootstrap"
+    resamples: int = 10000
+    confidence: float = 0.95
+    # fixed seed for a repeatable run; without one the seed used is in the result
+    seed: Optional[int] = None
+    use_cache: bool = True
+
+class PortfolioRequest(BaseModel):
+    strategy_id: int
+    symbols: List[str]
+    start: str
+    end: str
+    timeframe: str = "1m"
+    params: Dict[str, Any] = None
+    force_close: bool = True
+    # starting capital, split between the symbols by weight
+    capital: float = 100000.0
+    # relative weight per symbol; symbols left out get none. Default: equal weights
+    weights: Optional[Dict[str, float]] = None
+    use_cache: bool = True
+
+async def _strategy_plan_or_400(db: AsyncSession, strategy_id: int, params: Optional[Dict[str, Any]]):
+    """The cached strategy, after checking its graph compiles and can run with params."""
+    s = await registry.get(db, strategy_id)
+    if not s:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    _check_plan(s, params)
+    return s
+
+def _check_plan(s, params: Optional[Dict[str, Any]]):
+    # compile now so a broken graph is rejected here rather than failing in the worker
+    try:
+        plan = get_plan(s.id, s.version, s.graph)
+    except GraphError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid strategy graph: {e}")
+    if plan is not None and (params or {}).get("engine") == "loop":
+        raise HTTPException(status_code=400, detail="The loop engine only runs the built-in SMA crossover")
+
+def _check_shards(req: BacktestRequest):
+    if req.shards < 0:
+        raise HTTPException(status_code=400, detail="shards must not be negative")
+    if req.shards != 1:
+        if (req.params or {}).get("engine") == "loop":
+            raise HTTPException(status_code=400, detail="Sharded backtests run on the vectorized engine")
+        if req.streaming or req.checkpoint or req.resume_from is not None:
+            raise HTTPException(status_code=400, detail="Sharded backtests can't stream, checkpoint or resume")
+
+def _backtest_payload(req: BacktestRequest, s) -> Dict[str, Any]:
+    return {
+        "strategy_id": req.strategy_id,
+        "strategy_version": s.version,
+        "symbol": req.symbol,
+        "start": req.start,
+        "end": req.end,
+        "timeframe": req.timeframe,
+        "params": req.params or {},
+        "force_close": req.force_close,
+        "streaming": req.streaming,
+        "checkpoint": req.checkpoint,
+        "shards": req.shards,
+    }
+
+@router.post("/backtests")
+async def start_backtest(req: BacktestRequest, db: AsyncSession = Depends(get_db)):
+    s = await _strategy_plan_or_400(db, req.strategy_id, req.params)
+    _check_shards(req)
+    job_payload = _backtest_payload(req, s)
+    if req.resume_from is not None:
+        await _check_resumable(db, req.resume_from, job_payload)
+        job_payload.update(resume_from=req.resume_from, checkpoint=True)
+    return await _submit_job(db, job_payload, req.use_cache)
+
+class BatchRequest(BaseModel):
+    jobs: List[BacktestRequest]
+
+@router.post("/backtests/batch")
+async def start_backtest_batch(req: BatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Queue many backtests in one transaction. Jobs are validated like POST /backtests (any
+    invalid job rejects the whole batch); with use_cache, a job matching a queued, running or
+    recently finished job, or an earlier job of the same batch, returns that job instead.
+    """
+    if not req.jobs:
+        raise HTTPException(status_code=400, detail="Batch has no jobs")
+    if len(req.jobs) > settings.BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"Batch has {len(req.jobs)} jobs, limit is {settings.BATCH_MAX_JOBS}")
+    strategies = await registry.get_many(db, {j.strategy_id for j in req.jobs})
+    payloads = []
+    for i, j in enumerate(req.jobs):
+        if j.resume_from is not None:
+            raise HTTPException(status_code=400, detail=f"jobs[{i}]: resumed jobs are submitted through POST /backtests")
+        s = strategies.get(j.strategy_id)
+        if s is None:
+            raise HTTPException(status_code=404, detail=f"jobs[{i}]: Strategy not found")
+        try:
+            _check_plan(s, j.params)
+            _check_shards(j)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"jobs[{i}]: {e.detail}")
+        payloads.append(_backtest_payload(j, s))
+    fingerprints = [payload_fingerprint(p) for p in payloads]
+
+    use_cache = [j.use_cache and settings.RESULT_CACHE_TTL_SECONDS > 0 for j in req.jobs]
+    existing = await crud.find_jobs_by_fingerprints(
+        db, [f for f, c in zip(fingerprints, use_cache) if c], settings.RESULT_CACHE_TTL_SECONDS)
+    out: List[Optional[Dict[str, Any]]] = [None] * len(payloads)
+    new: List[int] = []
+    first_in_batch: Dict[str, int] = {}
+    for i, (f, cached) in enumerate(zip(fingerprints, use_cache)):
+        if cached and f in existing:
+            out[i] = {"job_id": existing[f][0], "status": existing[f][1], "cache_hit": True}
+        elif cached and f in first_in_batch:
+            out[i] = first_in_batch[f]
+        else:
+            new.append(i)
+            if cached:
+                first_in_batch[f] = i
+        if cached:
+            result_cache_stats["hits" if out[i] is not None else "misses"] += 1
+    ids = await crud.create_backtest_jobs(db, [payloads[i] for i in new], [fingerprints[i] for i in new])
+    for i, job_id in zip(new, ids):
+        out[i] = {"job_id": job_id, "status": "queued", "cache_hit": False}
+    # duplicates within the batch point at the job queued for their first occurrence
+    out = [dict(out[o], cache_hit=True) if isinstance(o, int) else o for o in out]
+    return {"jobs": out, "queued": len(new), "cache_hits": len(out) - len(new)}
+
+@router.get("/backtests")
+async def list_backtests(ids: str = Query(..., description="comma-separated job ids"),
+                         db: AsyncSession = Depends(get_db)):
+    """Status of many jobs in one query, without results or payloads, plus the count per status."""
+    try:
+        job_ids = sorted({int(x) for x in ids.split(",") if x.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not job_ids:
+        raise HTTPException(status_code=400, detail="No job ids given")
+    if len(job_ids) > settings.BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"{len(job_ids)} job ids, limit is {settings.BATCH_MAX_JOBS}")
+    rows = await crud.get_job_summaries(db, job_ids)
+    jobs, summary = [], {}
+    for row in rows:
+        summary[row.status] = summary.get(row.status, 0) + 1
+        jobs.append({
+            "id": row.id,
+            "status": row.status,
+            "error": row.error,
+            "created_at": row.created_at.isoformat(),
+            "started_at": row.started_at.isoformat() if row.started_at else None,
+            "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+            "bars": row.bars,
+            "progress": _progress(row),
+        })
+    found = {row.id for row in rows}
+    return {"jobs": jobs, "summary": summary, "missing": [i for i in job_ids if i not in found]}
+
+# a resumed run must simulate the same thing as the run it continues
+_RESUME_KEYS = ("strategy_id", "strategy_version", "symbol", "timeframe", "start", "params", "force_close")
+
+async def _check_resumable(db: AsyncSession, job_id: int, job_payload: Dict[str, Any]):
+    base = await crud.get_job(db, job_id)
+    if not base:
+        raise HTTPException(status_code=404, detail="Job to resume not found")
+    if base.status != "finished" or not (base.result or {}).get("checkpoint"):
+        raise HTTPException(status_code=400, detail=f"Job {job_id} has no checkpoint to resume from")
+    if (job_payload["params"] or {}).get("engine") == "loop":
+        raise HTTPException(status_code=400, detail="The loop engine cannot resume from a checkpoint")
+    old, new = normalize_payload(base.payload), normalize_payload(job_payload)
+    changed = [k for k in _RESUME_KEYS if old.get(k) != new.get(k)]
+    if changed:
+        raise HTTPException(status_code=400, detail=f"Resumed job differs from job {job_id} in: {', '.join(changed)}")
+
+@router.post("/backtests/portfolio")
+async def start_portfolio(req: PortfolioRequest, db: AsyncSession = Depends(get_db)):
+    """One job over several symbols: sleeves are simulated in parallel and combined into portfolio equity."""
+    s = await _strategy_plan_or_400(db, req.strategy_id, req.params)
+    if (req.params or {}).get("engine") == "loop":
+        raise HTTPException(status_code=400, detail="Portfolio jobs run on the vectorized engine")
+    symbols = list(dict.fromkeys(req.symbols))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="Portfolio needs at least one symbol")
+    if len(symbols) > settings.PORTFOLIO_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Portfolio has {len(symbols)} symbols, limit is {settings.PORTFOLIO_MAX_SYMBOLS}")
+    if req.capital <= 0:
+        raise HTTPException(status_code=400, detail="capital must be positive")
+    unknown = sorted(set(req.weights or {}) - set(symbols))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Weights for symbols not in the portfolio: {', '.join(unknown)}")
+    try:
+        allocate(symbols, req.capital, req.weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job_payload = {
+        "job_type": "portfolio",
+        "strategy_id": req.strategy_id,
+        "strategy_version": s.version,
+        "symbols": symbols,
+        "start": req.start,
+        "end": req.end,
+        "timeframe": req.timeframe,
+        "params": req.params or {},
+        "force_close": req.force_close,
+        "capital": req.capital,
+        "weights": req.weights,
+    }
+    return await _submit_job(db, job_payload, req.use_cache)
+
+def _grid_or_400(req: Union[SweepRequest, WalkForwardRequest]):
+    """(grid, expanded combinations) of the request's fast/slow/sl/tp specs."""
+    if req.rank_by not in RANK_METRICS:
+        raise HTTPException(status_code=400, detail=f"rank_by must be one of {', '.join(RANK_METRICS)}")
+    grid = {}
+    for name in ("fast", "slow", "sl", "tp"):
+        spec = getattr(req, name)
+        grid[name] = spec.dict() if isinstance(spec, ParamRange) else spec
+    try:
+        combos = expand_grid(grid)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not combos:
+        raise HTTPException(status_code=400, detail="Sweep grid has no valid combinations (fast must be < slow)")
+    if len(combos) > settings.SWEEP_MAX_COMBINATIONS:
+        raise HTTPException(status_code=400, detail=f"Sweep grid has {len(combos)} combinations, limit is {settings.SWEEP_MAX_COMBINATIONS}")
+    return grid, combos
+
+@router.post("/backtests/sweep")
+async def start_sweep(req: SweepRequest, db: AsyncSession = Depends(get_db)):
+    s = await registry.get(db, req.strategy_id)
+    if not s:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    grid, combos = _grid_or_400(req)
+    job_payload = {
+        "job_type": "sweep",
+        "strategy_id": req.strategy_id,
+        "symbol": req.symbol,
+        "start": req.start,
+        "end": req.end,
+        "timeframe": req.timeframe,
+        "grid": grid,
+        "force_close": req.force_close,
+        "rank_by": req.rank_by,
+        "top_n": req.top_n,
+    }
+    out = await _submit_job(db, job_payload, req.use_cache)
+    out["combinations"] = len(combos)
+    return out
+
+@router.post("/backtests/walkforward")
+async def start_walkforward(req: WalkForwardRequest, db: AsyncSession = Depends(get_db)):
+    """Walk-forward optimization of the SMA crossover grid, pruning weak candidates fold by fold."""
+    s = await registry.get(db, req.strategy_id)
+    if not s:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    grid, combos = _grid_or_400(req)
+    if req.folds < 1:
+        raise HTTPException(status_code=400, detail="folds must be at least 1")
+    if req.train_ratio <= 0:
+        raise HTTPException(status_code=400, detail="train_ratio must be positive")
+    if req.eta < 2:
+        raise HTTPException(status_code=400, detail="eta must be at least 2")
+    job_payload = {
+        "job_type": "walkforward",
+        "strategy_id": req.strategy_id,
+        "symbol": req.symbol,
+        "start": req.start,
+        "end": req.end,
+        "timeframe": req.timeframe,
+        "grid": grid,
+        "force_close": req.force_close,
+        "rank_by": req.rank_by,
+        "folds": req.folds,
+        "train_ratio": req.train_ratio,
+        "eta": req.eta,
+    }
+    out = await _submit_job(db, job_payload, req.use_cache)
+    out["combinations"] = len(combos)
+    return out
+
+@router.post("/backtests/montecarlo")
+async def start_montecarlo(req: MonteCarloRequest, db: AsyncSession = Depends(get_db)):
+    """Confidence intervals of a finished backtest's total pnl, max drawdown and win rate by resampling its trades."""
+    source = await crud.get_job(db, req.source_job_id)
+    if not source:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if source.payload.get("job_type", "backtest") != "backtest" or source.status != "finished":
+        raise HTTPException(status_code=400, detail=f"Job {req.source_job_id} is not a finished backtest")
+    if req.method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(METHODS)}")
+    if not 1 <= req.resamples <= settings.MONTECARLO_MAX_RESAMPLES:
+        raise HTTPException(status_code=400, detail=f"resamples must be between 1 and {settings.MONTECARLO_MAX_RESAMPLES}")
+    if not 0 < req.confidence < 1:
+        raise HTTPException(status_code=400, detail="confidence must be between 0 and 1")
+    job_payload = {
+        "job_type": "montecarlo",
+        "source_job_id": req.source_job_id,
+        "method": req.method,
+        "resamples": req.resamples,
+        "confidence": req.confidence,
+        "seed": req.seed,
+    }
+    return await _submit_job(db, job_payload, req.use_cache)
+
+def _job_out(job) -> Dict[str, Any]:
+    # trades are served page by page from /backtests/{id}/trades
+    result = job.result
+    if isinstance(result, dict) and "trades" in result:
+        result = {k: v for k, v in result.items() if k != "trades"}
+        result["trades_count"] = len(job.result["trades"])
+    return {
+        "id": job.id,
+        "status": job.status,
+        "result": result,
+        "error": job.error,
+        "payload": job.payload,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "timings": job.timings,
+        "bars": job.bars,
+        "peak_rss_mb": job.peak_rss_mb,
+        "progress": _progress(job),
+        "cancel_requested": bool(job.cancel_requested),
+    }
+
+def _progress(job) -> Optional[Dict[str, Any]]:
+    # reported by the worker while the job runs; total is None until the job knows it
+    if job.progress_done is None:
+        return None
+    total = job.progress_total or None
+    return {"done": job.progress_done, "total": total,
+            "fraction": min(1.0, job.progress_done / total) if total else None}
+
+async def _load_job(job_id: int):
+    # short-lived session per read so a waiting request doesn't pin a DB connection
+    async with async_session() as db:
+        return await crud.get_job(db, job_id)
+
+async def _job_updates(job_id: int, timeout: Optional[float]) -> AsyncIterator[Any]:
+    """
+    Yield the job now and again after every JOB_DONE notification for it, until it is
+    finished/failed or `timeout` expires (None waits indefinitely).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+    done = local_notifier.subscribe(JOB_DONE)
+    try:
+        while True:
+            # subscribed before reading, so a completion in between is not lost
+            job = await _load_job(job_id)
+            yield job
+            if job is None or crud.is_job_done(job):
+                return
+            wait = _WAIT_RECHECK_SECONDS
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                wait = min(wait, remaining)
+            try:
+                while await asyncio.wait_for(done.get(), timeout=wait) != str(job_id):
+                    pass
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        local_notifier.unsubscribe(JOB_DONE, done)
+
+@router.get("/backtests/{job_id}")
+async def get_backtest(job_id: int, wait: float = 0, db: AsyncSession = Depends(get_db)):
+    """`wait` > 0 long-polls: the response is held until the job finishes or `wait` seconds pass."""
+    job = await crud.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if wait > 0 and not crud.is_job_done(job):
+        async for job in _job_updates(job_id, min(wait, settings.LONG_POLL_MAX_SECONDS)):
+            pass
+    return _job_out(job)
+
+@router.post("/backtests/{job_id}/cancel")
+async def cancel_backtest(job_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    A queued job is cancelled at once; a running one is stopped by its worker at its next
+    progress report (status "cancelled" once it has). 409 if the job is already done.
+    """
+    status = await crud.cancel_job(db, job_id)
+    if status is None:
+        job = await crud.get_job(db, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already {job.status}")
+    return {"job_id": job_id, "status": status, "cancel_requested": True}
+
+def _epoch_ns(ts) -> Optional[int]:
+    if ts is None:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.value
+
+@router.get("/backtests/{job_id}/trades")
+async def get_backtest_trades(
+    job_id: int,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    layout: str = Query("rows", regex="^(rows|columns)$"),
+    format: Optional[str] = Query(None, regex="^(json|ndjson|arrow)$"),
+    accept: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    One page of a finished job's trades. start/end filter on entry time (same partial-date
+    rules as the backtest range). layout=columns returns parallel arrays with epoch-ns
+    timestamps and exit-reason codes instead of one object per trade.
+    format=ndjson|arrow (or an Accept of application/x-ndjson or
+    application/vnd.apache.arrow.stream) streams every matching trade instead, up to limit if
+    given, chunk by chunk with epoch-ns timestamps.
+    """
+    job = await _finished_job(db, job_id)
+    try:
+        lo, hi = time_bounds(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = _export_media_type(format, accept)
+    if media_type != export.JSON:
+        async def parts():
+            # own session: the response outlives the request's
+            async with async_session() as stream_db:
+                async for cols in crud.iter_job_trades(stream_db, job, offset=offset, limit=limit,
+                                                       start_ns=_epoch_ns(lo), end_ns=_epoch_ns(hi)):
+                    yield export.trade_table(cols)
+        return StreamingResponse(export.stream(parts(), media_type, export.TRADE_FIELDS), media_type=media_type)
+    limit = min(limit or 1000, settings.TRADES_PAGE_MAX)
+    cols, total = await crud.get_job_trades(db, job, offset=offset, limit=limit,
+                                            start_ns=_epoch_ns(lo), end_ns=_epoch_ns(hi))
+    trades = trade_store.columns_to_json(cols) if layout == "columns" else trade_store.trades_from_columns(cols)
+    return {"job_id": job_id, "total": total, "offset": offset, "limit": limit, "trades": trades}
+
+@router.get("/backtests/{job_id}/equity")
+async def get_backtest_equity(
+    job_id: int,
+    format: Optional[str] = Query(None, regex="^(json|ndjson|arrow)$"),
+    accept: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """A finished job's stored equity curve (epoch-ns ts, equity), as JSON, NDJSON or Arrow like /trades."""
+    job = await _finished_job(db, job_id)
+    curve = (job.result or {}).get("equity") or {"ts": [], "equity": []}
+    media_type = _export_media_type(format, accept)
+    if media_type == export.JSON:
+        return {"job_id": job_id, "ts": curve["ts"], "equity": curve["equity"]}
+
+    async def parts():
+        yield export.equity_table(curve)
+    return StreamingResponse(export.stream(parts(), media_type, export.EQUITY_FIELDS), media_type=media_type)
+
+async def _finished_job(db: AsyncSession, job_id: int):
+    job = await crud.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "finished":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job
+
+def _export_media_type(fmt: Optional[str], accept: Optional[str]) -> str:
+    media_type = export.negotiate(fmt, accept)
+    if media_type == export.ARROW and export.pa is None:
+        raise HTTPException(status_code=406, detail="Arrow export needs pyarrow installed on the server")
+    return media_type
+
+@router.get("/backtests/{job_id}/events")
+async def backtest_events(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Server-sent events: a `status` event on every change and a final `done` event with the job."""
+    job = await crud.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        last_status = None
+        updates = _job_updates(job_id, None)
+        next_update = asyncio.ensure_future(updates.__anext__())
+        try:
+            while True:
+                done, _ = await asyncio.wait({next_update}, timeout=_SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+                try:
+                    current = next_update.result()
+                except StopAsyncIteration:
+                    return
+                if current is None:
+                    return
+                if crud.is_job_done(current):
+                    yield f"event: done\ndata: {json.dumps(_job_out(current))}\n\n"
+                    return
+                if current.status != last_status:
+                    last_status = current.status
+                    yield f"event: status\ndata: {json.dumps({'id': job_id, 'status': current.status})}\n\n"
+                next_update = asyncio.ensure_future(updates.__anext__())
+        finally:
+            next_update.cancel()
+            await updates.aclose()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
@@ -0,0 +1,89 @@
+# backend/app/api/v1/metrics.py
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import numpy as np
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import get_db
+from app.db import crud
+from app.api.v1.backtests import result_cache_stats
+from app.services.strategy_registry import registry
+
+router = APIRouter(tags=["metrics"])
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive timestamps; they are UTC
+    if ts is not None and ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts
+
+def _histogram(values: List[float]) -> Dict[str, Any]:
+    v = np.asarray(values, dtype=float)
+    buckets = {str(b): int((v <= b).sum()) for b in LATENCY_BUCKETS}
+    buckets["+Inf"] = len(v)
+    out = {"buckets": buckets, "count": len(v), "sum": float(v.sum())}
+    for name, q in (("p50", 50), ("p95", 95), ("p99", 99)):
+        out[name] = float(np.percentile(v, q)) if len(v) else None
+    out["max"] = float(v.max()) if len(v) else None
+    return out
+
+def _hit_rate(counts: Dict[str, int]) -> Dict[str, Any]:
+    total = counts.get("hits", 0) + counts.get("misses", 0)
+    return dict(counts, hit_rate=counts.get("hits", 0) / total if total else None)
+
+@router.get("/metrics")
+async def get_metrics(window: Optional[float] = Query(None, gt=0), db: AsyncSession = Depends(get_db)):
+    """
+    Job pipeline metrics: queue depth by status now, and latency, throughput, stage times and
+    cache hit rates over the jobs that finished within the last `window` seconds
+    (default METRICS_WINDOW_SECONDS). Job figures come from the database, so they cover every
+    worker; the result-cache and strategy-registry counts are this API process's own since it
+    started.
+    """
+    window = window or settings.METRICS_WINDOW_SECONDS
+    now = datetime.now(timezone.utc)
+    depth = await crud.job_status_counts(db)
+    oldest = _utc(await crud.oldest_queued_at(db))
+    rows = await crud.jobs_finished_since(db, now - timedelta(seconds=window))
+
+    claim_to_finish, queue_wait = [], []
+    stages: Dict[str, float] = {}
+    caches: Dict[str, Dict[str, int]] = {}
+    bars, run_seconds = 0, 0.0
+    done = {"finished": 0, "failed": 0}
+    for status, created_at, started_at, finished_at, timings, job_bars, diagnostics in rows:
+        done[status] = done.get(status, 0) + 1
+        created_at, started_at, finished_at = _utc(created_at), _utc(started_at), _utc(finished_at)
+        if started_at is not None:
+            claim_to_finish.append((finished_at - started_at).total_seconds())
+            if created_at is not None:
+                queue_wait.append(max(0.0, (started_at - created_at).total_seconds()))
+        for k, v in (timings or {}).items():
+            stages[k] = stages.get(k, 0.0) + v
+        if status == "finished" and job_bars and (timings or {}).get("run"):
+            bars += job_bars
+            run_seconds += timings["run"]
+        for name, counts in ((diagnostics or {}).get("caches") or {}).items():
+            merged = caches.setdefault(name, {"hits": 0, "misses": 0})
+            for k in merged:
+                merged[k] += counts.get(k, 0)
+
+    return {
+        "window_seconds": window,
+        "queue": {
+            "depth": {s: depth.get(s, 0) for s in ("queued", "running", "finished", "failed", "cancelled")},
+            "oldest_queued_seconds": (now - oldest).total_seconds() if oldest is not None else None,
+        },
+        "jobs": done,
+        "latency_seconds": {"claim_to_finish": _histogram(claim_to_finish), "queue_wait": _histogram(queue_wait)},
+        # bars simulated per second of runner time (sweeps count bars x combinations)
+        "throughput": {"bars": bars, "run_seconds": run_seconds,
+                       "bars_per_second": bars / run_seconds if run_seconds else None},
+        "stage_seconds": stages,
+        "caches": {**{name: _hit_rate(c) for name, c in caches.items()}, "result": _hit_rate(result_cache_stats),
+                   "strategy": _hit_rate(registry.stats())},
+    }
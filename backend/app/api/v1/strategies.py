@@ -1,7 +1,13 @@
 # backend/app/api/v1/strategies.py
-from fastapi import APIRouter, HTTPException
+import hashlib
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from pydantic import BaseModel
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db
+from app.db import crud
+from app.services.strategy_registry import registry, CachedStrategy
 
 router = APIRouter(tags=["strategies"])
 
@@ -10,32 +16,56 @@ class StrategyIn(BaseModel):
     graph: Dict[str, Any]
     metadata: Dict[str, Any] = {}
 
-class StrategyOut(BaseModel):
-    id: int
-    name: str
-    graph: Dict[str, Any]
-    metadata: Dict[str, Any] = {}
+class StrategyUpdate(BaseModel):
+    # fields left out keep their value
+    name: Optional[str] = None
+    graph: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = None
 
-# in-memory store (replace with DB in production)
-_store: List[Dict[str, Any]] = []
-_next_id = 1
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
 
-@router.post("/strategies", response_model=StrategyOut)
-async def create_strategy(payload: StrategyIn):
-    global _next_id
-    item = {"id": _next_id, "name": payload.name, "graph": payload.graph, "metadata": payload.metadata}
-    _store.append(item)
-    _next_id += 1
-    return item
+def _strategy_response(s: CachedStrategy) -> Response:
+    # no-cache: clients may keep the body but revalidate it with If-None-Match
+    return Response(content=s.body, media_type="application/json",
+                    headers={"ETag": s.etag, "Cache-Control": "no-cache"})
+
+@router.post("/strategies")
+async def create_strategy(payload: StrategyIn, db: AsyncSession = Depends(get_db)):
+    s = await crud.create_strategy(db, payload.dict())
+    return _strategy_response(registry.put(s))
 
 @router.get("/strategies")
-async def list_strategies():
-    # return minimal info list (id + name) — frontend expects list of objects
-    return [{"id": s["id"], "name": s["name"]} for s in _store]
-
-@router.get("/strategies/{strategy_id}", response_model=StrategyOut)
-async def get_strategy(strategy_id: int):
-    for s in _store:
-        if s["id"] == strategy_id:
-            return s
-    raise HTTPException(status_code=404, detail="Strategy not found")
+async def list_strategies(response: Response, if_none_match: Optional[str] = Header(None),
+                          db: AsyncSession = Depends(get_db)):
+    """Newest first, without graphs; the ETag changes whenever a strategy is added or updated."""
+    rows = await crud.list_strategies(db)
+    etag = '"' + hashlib.sha256(json.dumps([[r.id, r.version] for r in rows]).encode()).hexdigest()[:32] + '"'
+    if _not_modified(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return [{"id": r.id, "name": r.name, "version": r.version,
+             "created_at": r.created_at.isoformat() if r.created_at else None} for r in rows]
+
+@router.get("/strategies/{strategy_id}")
+async def get_strategy(strategy_id: int, if_none_match: Optional[str] = Header(None),
+                       db: AsyncSession = Depends(get_db)):
+    s = await registry.get(db, strategy_id)
+    if s is None:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    if _not_modified(if_none_match, s.etag):
+        return Response(status_code=304, headers={"ETag": s.etag})
+    return _strategy_response(s)
+
+@router.put("/strategies/{strategy_id}")
+async def update_strategy(strategy_id: int, payload: StrategyUpdate, db: AsyncSession = Depends(get_db)):
+    """Change the given fields and bump the version, which changes the ETag."""
+    registry.invalidate(strategy_id)
+    s = await crud.update_strategy(db, strategy_id, payload.dict())
+    if s is None:
+        raise HTTPException(status_code=404, detail="Strategy not found")
+    return _strategy_response(registry.put(s))
@@ -1,7 +1,13 @@
-from sqlalchemy import select, update
-from app.db.models import Strategy, BacktestJob
+from sqlalchemy import select, update, delete, insert, literal, func, or_, and_
+from app.core.config import settings
+from app.db.models import Strategy, BacktestJob, BacktestTradeChunk, BacktestCheckpoint
+from app.db.notify import notify, JOBS_QUEUED, JOB_DONE
+from app.services import trade_store
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+import time
+import numpy as np
 
 # Strategy CRUD
 async def create_strategy(db: AsyncSession, payload: Dict[str, Any]) -> Strategy:
@@ -12,44 +18,372 @@ async def create_strategy(db: AsyncSession, payload: Dict[str, Any]) -> Strategy
     return s
 
 async def list_strategies(db: AsyncSession):
-    q = select(Strategy).order_by(Strategy.created_at.desc())
+    # listing only: the graph and metadata columns are never read
+    q = (select(Strategy.id, Strategy.name, Strategy.version, Strategy.created_at)
+         .order_by(Strategy.created_at.desc(), Strategy.id.desc()))
     r = await db.execute(q)
-    return r.scalars().all()
+    return list(r.all())
 
 async def get_strategy(db: AsyncSession, strategy_id: int) -> Optional[Strategy]:
     q = select(Strategy).where(Strategy.id == strategy_id)
     r = await db.execute(q)
     return r.scalar_one_or_none()
 
+async def get_strategies(db: AsyncSession, strategy_ids) -> List[Strategy]:
+    r = await db.execute(select(Strategy).where(Strategy.id.in_(set(strategy_ids))))
+    return list(r.scalars().all())
+
+async def strategy_versions(db: AsyncSession, strategy_ids) -> Dict[int, int]:
+    """Current version per existing strategy id, without loading graphs."""
+    r = await db.execute(select(Strategy.id, Strategy.version).where(Strategy.id.in_(set(strategy_ids))))
+    return {strategy_id: version for strategy_id, version in r.all()}
+
+async def update_strategy(db: AsyncSession, strategy_id: int, payload: Dict[str, Any]) -> Optional[Strategy]:
+    """Apply the given name/graph/metadata and bump the version. None if the strategy doesn't exist."""
+    values = {"name": payload.get("name"), "graph": payload.get("graph"), "meta": payload.get("metadata")}
+    values = {k: v for k, v in values.items() if v is not None}
+    q = (update(Strategy).where(Strategy.id == strategy_id)
+         .values(version=Strategy.version + 1, **values)
+         .execution_options(synchronize_session=False))
+    r = await db.execute(q)
+    await db.commit()
+    if not r.rowcount:
+        return None
+    # populate_existing: a copy already loaded in this session would still hold the old values
+    q = select(Strategy).where(Strategy.id == strategy_id).execution_options(populate_existing=True)
+    return (await db.execute(q)).scalar_one()
+
 # Backtest job CRUD
-async def create_backtest_job(db: AsyncSession, payload: Dict[str, Any]) -> BacktestJob:
-    job = BacktestJob(payload=payload, status="queued")
+async def create_backtest_job(db: AsyncSession, payload: Dict[str, Any], fingerprint: Optional[str] = None) -> BacktestJob:
+    job = BacktestJob(payload=payload, status="queued", fingerprint=fingerprint)
     db.add(job)
-    await db.commit()
+    await db.flush()
+    # wakes idle workers; delivered together with the commit
+    await notify(db, JOBS_QUEUED, str(job.id))
     await db.refresh(job)
     return job
 
-async def fetch_next_queued_job(db: AsyncSession) -> Optional[BacktestJob]:
-    q = select(BacktestJob).where(BacktestJob.status == "queued").order_by(BacktestJob.created_at)
+async def create_backtest_jobs(db: AsyncSession, payloads: List[Dict[str, Any]],
+                               fingerprints: List[Optional[str]]) -> List[int]:
+    """Queue many jobs in one transaction and one batched INSERT ... RETURNING; ids in payload order."""
+    if not payloads:
+        return []
+    q = insert(BacktestJob).returning(BacktestJob.id, sort_by_parameter_order=True)
+    r = await db.execute(q, [{"payload": p, "status": "queued", "fingerprint": f}
+                             for p, f in zip(payloads, fingerprints)])
+    ids = list(r.scalars().all())
+    # one wakeup covers the whole batch
+    await notify(db, JOBS_QUEUED, str(ids[0]))
+    return ids
+
+async def find_jobs_by_fingerprints(db: AsyncSession, fingerprints: List[str],
+                                    max_age_seconds: float) -> Dict[str, Any]:
+    """find_job_by_fingerprint for many fingerprints in one query: fingerprint -> (id, status) of its newest match."""
+    if not fingerprints:
+        return {}
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    q = (
+        select(BacktestJob.fingerprint, BacktestJob.id, BacktestJob.status)
+        .where(BacktestJob.fingerprint.in_(set(fingerprints)))
+        .where(or_(
+            BacktestJob.status.in_(("queued", "running")),
+            and_(BacktestJob.status == "finished", BacktestJob.updated_at >= cutoff),
+        ))
+        .order_by(BacktestJob.id)
+    )
     r = await db.execute(q)
-    job = r.scalars().first()
-    if job:
-        job.status = "running"
-        await db.commit()
-        await db.refresh(job)
-    return job
+    # ascending ids, so the newest match per fingerprint is written last
+    return {fingerprint: (job_id, status) for fingerprint, job_id, status in r.all()}
 
-async def save_backtest_result(db: AsyncSession, job_id: int, result: Dict[str, Any]):
-    q = update(BacktestJob).where(BacktestJob.id == job_id).values(result=result, status="finished")
-    await db.execute(q)
+async def find_job_by_fingerprint(db: AsyncSession, fingerprint: str, max_age_seconds: float) -> Optional[BacktestJob]:
+    """
+    Newest job with this fingerprint that is still queued/running, or finished within
+    max_age_seconds. Failed jobs never match, so a failure is retried on resubmit.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    q = (
+        select(BacktestJob)
+        .where(BacktestJob.fingerprint == fingerprint)
+        .where(or_(
+            BacktestJob.status.in_(("queued", "running")),
+            and_(BacktestJob.status == "finished", BacktestJob.updated_at >= cutoff),
+        ))
+        .order_by(BacktestJob.id.desc())
+        .limit(1)
+    )
+    r = await db.execute(q)
+    return r.scalars().first()
+
+async def expire_fingerprints(db: AsyncSession, max_age_seconds: float) -> int:
+    """Drop cache eligibility of finished/failed jobs older than max_age_seconds. Returns rows touched."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    q = (
+        update(BacktestJob)
+        .where(BacktestJob.fingerprint.isnot(None))
+        .where(BacktestJob.status.in_(("finished", "failed")))
+        .where(BacktestJob.updated_at < cutoff)
+        .values(fingerprint=None)
+        .execution_options(synchronize_session=False)
+    )
+    r = await db.execute(q)
+    await db.commit()
+    return r.rowcount
+
+async def claim_queued_jobs(db: AsyncSession, limit: int = 1) -> List[BacktestJob]:
+    """
+    Atomically move up to `limit` of the oldest queued jobs to running and return them.
+    On Postgres the candidate rows are locked with FOR UPDATE SKIP LOCKED, so concurrent
+    workers claim disjoint batches; the status guard in the UPDATE keeps the claim
+    conditional on backends without row locks (SQLite serializes writers instead).
+    """
+    candidates = (
+        select(BacktestJob.id)
+        .where(BacktestJob.status == "queued")
+        .order_by(BacktestJob.created_at, BacktestJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    q = (
+        update(BacktestJob)
+        .where(BacktestJob.id.in_(candidates), BacktestJob.status == "queued")
+        .values(status="running", started_at=func.now())
+        .returning(BacktestJob)
+        .execution_options(synchronize_session=False)
+    )
+    r = await db.execute(q)
+    jobs = list(r.scalars().all())
     await db.commit()
+    return sorted(jobs, key=lambda j: j.id)
+
+async def fetch_next_queued_job(db: AsyncSession) -> Optional[BacktestJob]:
+    jobs = await claim_queued_jobs(db, limit=1)
+    return jobs[0] if jobs else None
+
+async def _copy_resumed_trades(db: AsyncSession, job_id: int, resume: Dict[str, Any]) -> Tuple[Dict[str, Any], int, int]:
+    """
+    Give job_id the first resume["kept_trades"] trades of the job it resumes. Whole chunks
+    are copied inside the database; a chunk cut by the boundary is decoded and its kept
+    head returned, to be stored again together with the new trades.
+    Returns (head columns, position of the head's first trade, next chunk seq).
+    """
+    src_id, kept = resume["job_id"], resume["kept_trades"]
+    src = BacktestTradeChunk
+    whole = and_(src.job_id == src_id, src.first_index + src.count <= kept)
+    names = ["seq", "first_index", "count", "first_entry_ts", "last_entry_ts", "data"]
+    rows = select(literal(job_id), *[getattr(src, n) for n in names]).where(whole)
+    await db.execute(insert(BacktestTradeChunk).from_select(["job_id", *names], rows))
+    next_seq = (await db.execute(select(func.count()).select_from(src).where(whole))).scalar_one()
+
+    q = select(src).where(src.job_id == src_id, src.first_index < kept, src.first_index + src.count > kept)
+    cut = (await db.execute(q)).scalar_one_or_none()
+    if cut is None:
+        return trade_store.empty_columns(), kept, next_seq
+    head = trade_store.slice_columns(trade_store.decode_columns(cut.data), 0, kept - cut.first_index)
+    return head, cut.first_index, next_seq
+
+def _stats_values(stats: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # instrument.run_recorded stats -> BacktestJob columns
+    if not stats:
+        return {}
+    values = {
+        "timings": stats.get("timings"),
+        "bars": stats.get("bars"),
+        "peak_rss_mb": stats.get("peak_rss_mb"),
+        "diagnostics": {"caches": stats.get("caches"), "profiles": stats.get("profiles")},
+    }
+    if stats.get("progress"):
+        # the last (done, total) the job reported
+        values["progress_done"], values["progress_total"] = stats["progress"]
+    return values
 
-async def mark_job_failed(db: AsyncSession, job_id: int, error: str):
-    q = update(BacktestJob).where(BacktestJob.id == job_id).values(error=error, status="failed")
+async def save_backtest_result(db: AsyncSession, job_id: int, result: Dict[str, Any],
+                               stats: Optional[Dict[str, Any]] = None):
+    """Store a finished job's result; stats (see instrument.run_recorded) get a "save" timing added."""
+    t = time.perf_counter()
+    trades = result.get("trades")
+    checkpoint = result.get("checkpoint")
+    if isinstance(trades, dict):
+        # columnar trades go to their own table; the job row keeps only the summary
+        result = {k: v for k, v in result.items() if k not in ("trades", "checkpoint")}
+        await db.execute(delete(BacktestTradeChunk).where(BacktestTradeChunk.job_id == job_id))
+        first_index, first_seq = 0, 0
+        if result.get("resume"):
+            head, first_index, first_seq = await _copy_resumed_trades(db, job_id, result["resume"])
+            trades = trade_store.concat_columns([head, trades])
+        result["trades_count"] = first_index + len(trades["entry_ts"])
+        db.add_all([BacktestTradeChunk(job_id=job_id, **chunk)
+                    for chunk in trade_store.iter_chunks(trades, settings.TRADE_CHUNK_SIZE, first_index, first_seq)])
+    if checkpoint:
+        await db.execute(delete(BacktestCheckpoint).where(BacktestCheckpoint.job_id == job_id))
+        db.add(BacktestCheckpoint(job_id=job_id, last_ts=checkpoint["last_ts"], data=checkpoint["data"]))
+        result["checkpoint"] = {"last_ts": checkpoint["last_ts"]}
+    if stats:
+        # encoding and writing the trades and checkpoint; the row update below is not included
+        stats = dict(stats, timings=dict(stats.get("timings") or {}, save=time.perf_counter() - t))
+    q = (update(BacktestJob).where(BacktestJob.id == job_id)
+         .values(result=result, status="finished", finished_at=func.now(), **_stats_values(stats)))
     await db.execute(q)
+    await notify(db, JOB_DONE, str(job_id))
+
+async def get_checkpoint(db: AsyncSession, job_id: int) -> Optional[BacktestCheckpoint]:
+    q = select(BacktestCheckpoint).where(BacktestCheckpoint.job_id == job_id)
+    r = await db.execute(q)
+    return r.scalar_one_or_none()
+
+async def mark_job_failed(db: AsyncSession, job_id: int, error: str, stats: Optional[Dict[str, Any]] = None,
+                          status: str = "failed"):
+    q = (update(BacktestJob).where(BacktestJob.id == job_id)
+         .values(error=error, status=status, finished_at=func.now(), **_stats_values(stats)))
+    await db.execute(q)
+    await notify(db, JOB_DONE, str(job_id))
+
+async def update_job_progress(db: AsyncSession, job_id: int, done: int, total: int) -> bool:
+    """Store a running job's progress; returns whether it has been asked to cancel."""
+    q = (update(BacktestJob).where(BacktestJob.id == job_id)
+         .values(progress_done=done, progress_total=total)
+         .returning(BacktestJob.cancel_requested)
+         .execution_options(synchronize_session=False))
+    cancel = (await db.execute(q)).scalar_one_or_none()
     await db.commit()
+    return bool(cancel)
+
+async def cancel_job(db: AsyncSession, job_id: int) -> Optional[str]:
+    """
+    Cancel a queued job outright, or flag a running one for its worker to stop. Returns the
+    job's status after the request, or None if it is not queued or running. Either way the
+    job is no longer offered to identical submissions.
+    """
+    q = (update(BacktestJob).where(BacktestJob.id == job_id, BacktestJob.status == "queued")
+         .values(status="cancelled", error="Cancelled", finished_at=func.now(), fingerprint=None)
+         .execution_options(synchronize_session=False))
+    if (await db.execute(q)).rowcount:
+        await notify(db, JOB_DONE, str(job_id))
+        return "cancelled"
+    q = (update(BacktestJob).where(BacktestJob.id == job_id, BacktestJob.status == "running")
+         .values(cancel_requested=True, fingerprint=None)
+         .execution_options(synchronize_session=False))
+    if (await db.execute(q)).rowcount:
+        await db.commit()
+        return "running"
+    return None
+
+async def job_status_counts(db: AsyncSession) -> Dict[str, int]:
+    r = await db.execute(select(BacktestJob.status, func.count()).group_by(BacktestJob.status))
+    return {status: count for status, count in r.all()}
+
+async def oldest_queued_at(db: AsyncSession) -> Optional[datetime]:
+    r = await db.execute(select(func.min(BacktestJob.created_at)).where(BacktestJob.status == "queued"))
+    return r.scalar_one_or_none()
+
+async def jobs_finished_since(db: AsyncSession, since: datetime) -> List[Any]:
+    """Instrumentation columns of the jobs that finished or failed since `since`."""
+    q = (select(BacktestJob.status, BacktestJob.created_at, BacktestJob.started_at, BacktestJob.finished_at,
+                BacktestJob.timings, BacktestJob.bars, BacktestJob.diagnostics)
+         .where(BacktestJob.finished_at >= since))
+    r = await db.execute(q)
+    return list(r.all())
+
+async def get_job_summaries(db: AsyncSession, job_ids: List[int]) -> List[Any]:
+    """Status and timestamps of the given jobs in one query, without their payloads or results."""
+    q = (select(BacktestJob.id, BacktestJob.status, BacktestJob.error, BacktestJob.created_at,
+                BacktestJob.started_at, BacktestJob.finished_at, BacktestJob.bars,
+                BacktestJob.progress_done, BacktestJob.progress_total)
+         .where(BacktestJob.id.in_(job_ids))
+         .order_by(BacktestJob.id))
+    r = await db.execute(q)
+    return list(r.all())
+
+def is_job_done(job: BacktestJob) -> bool:
+    return job.status in ("finished", "failed", "cancelled")
 
 async def get_job(db: AsyncSession, job_id: int) -> Optional[BacktestJob]:
     q = select(BacktestJob).where(BacktestJob.id == job_id)
     r = await db.execute(q)
     return r.scalar_one_or_none()
+
+def _trade_chunks_query(q, job_id: int, offset: int, limit: Optional[int],
+                        start_ns: Optional[int], end_ns: Optional[int]):
+    # the chunks that can hold trades of the page/range, in order
+    q = q.where(BacktestTradeChunk.job_id == job_id).order_by(BacktestTradeChunk.seq)
+    if start_ns is not None:
+        q = q.where(BacktestTradeChunk.last_entry_ts >= start_ns)
+    if end_ns is not None:
+        q = q.where(BacktestTradeChunk.first_entry_ts <= end_ns)
+    if start_ns is None and end_ns is None:
+        q = q.where(BacktestTradeChunk.first_index + BacktestTradeChunk.count > offset)
+        if limit is not None:
+            q = q.where(BacktestTradeChunk.first_index < offset + limit)
+    return q
+
+async def get_job_trades(db: AsyncSession, job: BacktestJob, offset: int = 0, limit: Optional[int] = None,
+                         start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    A page of a job's trades as columns, plus the number of trades matching the filter.
+    start_ns/end_ns filter on entry time; offset/limit apply after the filter.
+    Only the chunks overlapping the requested page/range are read and decoded.
+    """
+    time_filtered = start_ns is not None or end_ns is not None
+    result = job.result or {}
+    if isinstance(result.get("trades"), list):
+        # results saved before trades were stored as chunks
+        cols, base = trade_store.columns_from_trades(result["trades"]), 0
+    else:
+        q = _trade_chunks_query(select(BacktestTradeChunk), job.id, offset, limit, start_ns, end_ns)
+        r = await db.execute(q)
+        chunks = r.scalars().all()
+        cols = trade_store.concat_columns([trade_store.decode_columns(c.data) for c in chunks])
+        base = chunks[0].first_index if chunks else offset
+
+    if time_filtered:
+        ts = cols["entry_ts"]
+        lo = int(np.searchsorted(ts, start_ns, side="left")) if start_ns is not None else 0
+        hi = int(np.searchsorted(ts, end_ns, side="right")) if end_ns is not None else len(ts)
+        cols = trade_store.slice_columns(cols, lo, hi)
+        total, base = hi - lo, 0
+    else:
+        total = result.get("trades_count", base + len(cols["entry_ts"]))
+    lo = offset - base
+    hi = lo + limit if limit is not None else None
+    return trade_store.slice_columns(cols, lo, hi), total
+
+async def iter_job_trades(db: AsyncSession, job: BacktestJob, offset: int = 0, limit: Optional[int] = None,
+                          start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    The trades get_job_trades would return, as columns one stored chunk at a time, so a
+    whole run can be streamed without decoding (or holding) all of it at once.
+    """
+    if isinstance((job.result or {}).get("trades"), list):
+        cols, _ = await get_job_trades(db, job, offset, limit, start_ns, end_ns)
+        yield cols
+        return
+    q = _trade_chunks_query(select(BacktestTradeChunk.id, BacktestTradeChunk.first_index),
+                            job.id, offset, limit, start_ns, end_ns)
+    chunks = (await db.execute(q)).all()
+    time_filtered = start_ns is not None or end_ns is not None
+    # trades still to skip (offset) and to send (limit), counted after the time filter
+    skip = offset if time_filtered or not chunks else offset - chunks[0].first_index
+    remaining = limit
+    for chunk in chunks:
+        r = await db.execute(select(BacktestTradeChunk.data).where(BacktestTradeChunk.id == chunk.id))
+        cols = trade_store.decode_columns(r.scalar_one())
+        if time_filtered:
+            ts = cols["entry_ts"]
+            lo = int(np.searchsorted(ts, start_ns, side="left")) if start_ns is not None else 0
+            hi = int(np.searchsorted(ts, end_ns, side="right")) if end_ns is not None else len(ts)
+            cols = trade_store.slice_columns(cols, lo, hi)
+        n = len(cols["entry_ts"])
+        if skip >= n:
+            skip -= n
+            continue
+        cols = trade_store.slice_columns(cols, skip, skip + remaining if remaining is not None else None)
+        skip = 0
+        yield cols
+        if remaining is not None:
+            remaining -= len(cols["entry_ts"])
+            if remaining <= 0:
+                return
+
+async def get_job_pnl(db: AsyncSession, job: BacktestJob) -> np.ndarray:
+    """The pnl of all of a job's trades, in order, decoding one stored chunk at a time."""
+    parts = [cols["pnl"] async for cols in iter_job_trades(db, job)]
+    return np.concatenate(parts) if parts else np.empty(0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON, Text, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Boolean, Float, String, JSON, Text, DateTime, LargeBinary, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -10,7 +10,9 @@ class Strategy(Base):
     name = Column(String, nullable=False)
     graph = Column(JSON, nullable=False)   # serialized React Flow graph
     meta = Column(JSON, nullable=True)     # previously named 'metadata' — renamed to avoid conflict
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    version = Column(Integer, nullable=False, default=1)  # bumped on every update; cached copies are keyed by it
+    # the list endpoint's order
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 class BacktestJob(Base):
     __tablename__ = "backtest_jobs"
@@ -19,5 +21,40 @@ class BacktestJob(Base):
     status = Column(String, default="queued", index=True)
     result = Column(JSON, nullable=True)
     error = Column(Text, nullable=True)
+    # sha256 of the normalized payload + dataset version; cleared once the cached result expires
+    fingerprint = Column(String(64), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)   # claimed by a worker
+    finished_at = Column(DateTime(timezone=True), nullable=True)  # finished, failed or cancelled
+    # seconds per pipeline stage (queue_wait, inputs, load, indicators, simulate, metrics, save, ...)
+    timings = Column(JSON, nullable=True)
+    bars = Column(BigInteger, nullable=True)
+    peak_rss_mb = Column(Float, nullable=True)
+    # cache hits/misses during the run and paths of cProfile dumps
+    diagnostics = Column(JSON, nullable=True)
+    # work done / total reported by a running job (bars for the engines; total 0 until known)
+    progress_done = Column(BigInteger, nullable=True)
+    progress_total = Column(BigInteger, nullable=True)
+    # set by POST /backtests/{id}/cancel on a running job; the worker stops it at its next report
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+class BacktestTradeChunk(Base):
+    # a run's trades as compressed column chunks (see app.services.trade_store)
+    __tablename__ = "backtest_trade_chunks"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("backtest_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)
+    first_index = Column(Integer, nullable=False)      # position of the chunk's first trade in the run
+    count = Column(Integer, nullable=False)
+    first_entry_ts = Column(BigInteger, nullable=False)  # epoch ns, for time-range pruning
+    last_entry_ts = Column(BigInteger, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+class BacktestCheckpoint(Base):
+    # engine state at the end of a run, for resuming it over newly arrived bars
+    __tablename__ = "backtest_checkpoints"
+    job_id = Column(Integer, ForeignKey("backtest_jobs.id", ondelete="CASCADE"), primary_key=True)
+    last_ts = Column(BigInteger, nullable=False)   # epoch ns of the bar a resume starts from
+    data = Column(LargeBinary, nullable=False)     # see app.services.checkpoint
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import engine
+
+logger = logging.getLogger("notify")
+
+# a job was queued; payload is the job id
+JOBS_QUEUED = "backtest_jobs"
+# a job reached finished/failed; payload is the job id
+JOB_DONE = "backtest_job_done"
+
+class LocalNotifier:
+    """
+    In-process pub/sub. Every subscriber gets its own queue bound to the event loop it
+    subscribed from, so publish() is safe to call from any thread or loop.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        q = asyncio.Queue()
+        self._subscribers[channel].add((asyncio.get_running_loop(), q))
+        return q
+
+    def unsubscribe(self, channel: str, q: asyncio.Queue):
+        self._subscribers[channel] = {(loop, s) for loop, s in self._subscribers[channel] if s is not q}
+
+    def publish(self, channel: str, payload: str = ""):
+        for loop, q in list(self._subscribers[channel]):
+            if loop.is_closed():
+                continue
+            loop.call_soon_threadsafe(q.put_nowait, payload)
+
+local_notifier = LocalNotifier()
+
+def _is_postgres(bind) -> bool:
+    return bind is not None and bind.dialect.name == "postgresql"
+
+async def notify(db: AsyncSession, channel: str, payload: str = "", commit: bool = True):
+    """
+    Publish on `channel`: NOTIFY for other processes on Postgres (delivered on commit)
+    plus the local notifier for listeners in this process.
+    """
+    if _is_postgres(db.bind):
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": channel, "payload": payload})
+    if commit:
+        await db.commit()
+    local_notifier.publish(channel, payload)
+
+async def _listen_postgres(channels: Iterable[str], retry_delay: float = 5.0):
+    def forward(connection, pid, channel, payload):
+        local_notifier.publish(channel, payload)
+
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                apg = raw.driver_connection
+                for channel in channels:
+                    await apg.add_listener(channel, forward)
+                logger.info(f"Listening on {', '.join(channels)}")
+                # LISTEN stays active while the connection is open
+                while not apg.is_closed():
+                    await asyncio.sleep(retry_delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"LISTEN connection lost: {e}")
+        await asyncio.sleep(retry_delay)
+
+def start_listener(channels: Iterable[str]) -> Optional[asyncio.Task]:
+    """Bridge Postgres NOTIFYs into the local notifier. No-op on other databases."""
+    if not _is_postgres(engine):
+        return None
+    return asyncio.create_task(_listen_postgres(list(channels)))
@@ -1,6 +1,9 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import strategies
+from app.api import v1
+from app.core.config import settings
+from app.db.notify import start_listener, JOB_DONE
 
 app = FastAPI()
 
@@ -12,7 +15,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(strategies.router, prefix="/api/v1")
+app.include_router(v1.router, prefix="/api/v1")
+
+_background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # job-done NOTIFYs feed the long-poll/SSE endpoints (Postgres only)
+    listener = start_listener([JOB_DONE])
+    if listener:
+        _background_tasks.append(listener)
+    if settings.RUN_EMBEDDED_WORKER:
+        from app.workers.worker import worker_loop
+        _background_tasks.append(asyncio.create_task(worker_loop()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000)
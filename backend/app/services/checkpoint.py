@@ -0,0 +1,49 @@
+"""
+Engine checkpoints.
+
+A checkpoint is the state of a StreamingStrategy (price history, open position, equity
+accumulator, running trade totals) stored as one compressed .npz: arrays as members and
+all scalars as a JSON document, so resuming never unpickles anything.
+"""
+from typing import Any, Dict
+import io
+import json
+import numpy as np
+
+_META = "__meta__"
+
+def _flatten(state: Dict[str, Any], prefix: str = ""):
+    arrays, scalars = {}, {}
+    for key, value in state.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            a, s = _flatten(value, f"{name}/")
+            arrays.update(a)
+            scalars.update(s)
+        elif isinstance(value, np.ndarray):
+            arrays[name] = value
+        else:
+            scalars[name] = value.item() if isinstance(value, np.generic) else value
+    return arrays, scalars
+
+def _nest(flat: Dict[str, Any]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, value in flat.items():
+        node = out
+        *parents, leaf = name.split("/")
+        for p in parents:
+            node = node.setdefault(p, {})
+        node[leaf] = value
+    return out
+
+def encode_checkpoint(state: Dict[str, Any]) -> bytes:
+    arrays, scalars = _flatten(state)
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays, **{_META: np.asarray(json.dumps(scalars))})
+    return buf.getvalue()
+
+def decode_checkpoint(blob: bytes) -> Dict[str, Any]:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as z:
+        flat = {name: z[name] for name in z.files if name != _META}
+        flat.update(json.loads(str(z[_META])))
+    return _nest(flat)
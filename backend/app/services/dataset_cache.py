@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+import numpy as np
+import pandas as pd
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return sum(_nbytes(v) for v in value) if isinstance(value, (tuple, list)) else 0
+
+class DatasetCache:
+    """
+    LRU cache of full OHLCV DataFrames (or derived arrays) bounded by a byte budget.
+    Each entry carries the version of its source file (path, mtime, size); a lookup with a
+    different version reloads. Cached values are shared between jobs and must not be mutated.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: Hashable, version: Any, loader: Callable[[], Any],
+                    size_hint: int = 0) -> Optional[Any]:
+        """
+        Return the cached frame for key/version, loading it on a miss.
+        Returns None (without loading) when size_hint says the dataset can never fit.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["version"] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["df"]
+            self.misses += 1
+            if entry is not None:
+                self._drop(key)
+        if size_hint > self.max_bytes:
+            return None
+
+        # load outside the lock so other datasets stay servable meanwhile
+        df = loader()
+        nbytes = _nbytes(df)
+        if nbytes <= self.max_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = {"version": version, "df": df, "bytes": nbytes}
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    oldest = next(iter(self._entries))
+                    self._drop(oldest)
+                    self.evictions += 1
+        return df
+
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
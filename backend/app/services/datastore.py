@@ -0,0 +1,233 @@
+"""
+Columnar OHLCV store.
+
+Each dataset lives in a directory `{symbol}_{timeframe}/` next to the CSV files, with one
+`.npy` file per column and `timestamp.npy` holding int64 epoch nanoseconds. Files are opened
+with mmap_mode="r" and the time range is found by binary search, so a load only touches the
+pages of the requested window.
+
+Convert a CSV with:  python -m app.services.datastore BTCUSD 1m
+A dataset whose CSV has changed since it was converted is ignored until it is converted again.
+"""
+from typing import Iterator, List, Optional, Tuple
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+DATA_DIRS = (os.path.join("backend", "data"), "data")
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+META_FILE = "meta.json"
+
+def find_data_file(name: str) -> Optional[str]:
+    for d in DATA_DIRS:
+        path = os.path.join(d, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def _file_version(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _stale(path: str, csv_path: str) -> bool:
+    # the CSV changed (e.g. bars were appended) since the dataset in path was ingested from it
+    meta_path = os.path.join(path, META_FILE)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if "source_mtime_ns" not in meta:
+        # ingested before the source was recorded: only a CSV written after it counts
+        return _file_version(csv_path)[0] > _file_version(meta_path)[0]
+    return _file_version(csv_path) != (meta["source_mtime_ns"], meta["source_size"])
+
+def columnar_path(symbol: str, timeframe: str) -> Optional[str]:
+    """
+    The dataset's columnar directory; None if it was never ingested or its CSV changed since,
+    in which case loads read the CSV until it is ingested again.
+    """
+    path = find_data_file(f"{symbol}_{timeframe}")
+    if not path or not os.path.exists(os.path.join(path, META_FILE)):
+        return None
+    csv_path = find_data_file(f"{symbol}_{timeframe}.csv")
+    if csv_path is not None and _stale(path, csv_path):
+        return None
+    return path
+
+def available_timeframes(symbol: str) -> List[str]:
+    """Timeframes stored for symbol, as CSV or columnar datasets."""
+    prefix = f"{symbol}_"
+    found = set()
+    for d in DATA_DIRS:
+        if not os.path.isdir(d):
+            continue
+        for name in os.listdir(d):
+            if not name.startswith(prefix):
+                continue
+            tf = name[len(prefix):]
+            if tf.endswith(".csv"):
+                found.add(tf[:-len(".csv")])
+            elif os.path.exists(os.path.join(d, name, META_FILE)):
+                found.add(tf)
+    return sorted(found)
+
+def dataset_version(symbol: str, timeframe: str) -> Optional[Tuple[str, int, int]]:
+    """
+    (path, mtime_ns, size) of the files backing a dataset: columnar store first, then CSV.
+    The store's meta.json records the version of the CSV it was ingested from, so appending
+    to the CSV changes the version either way.
+    """
+    path = columnar_path(symbol, timeframe)
+    if path:
+        stats = [os.stat(os.path.join(path, f)) for f in os.listdir(path)]
+        return path, max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats)
+    path = find_data_file(f"{symbol}_{timeframe}.csv")
+    if path:
+        st = os.stat(path)
+        return path, st.st_mtime_ns, st.st_size
+    return None
+
+def time_bounds(start: Optional[str], end: Optional[str]) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """
+    Resolve start/end strings the way DataFrame.loc[start:end] does on a DatetimeIndex:
+    a partial string covers its whole period, so end="2023-01-02" includes that entire day.
+    Timestamps are taken as exact bounds.
+    """
+    def bound(s, upper):
+        if s is None or s == "":
+            return None
+        if isinstance(s, pd.Timestamp):
+            return s
+        try:
+            p = pd.Period(s)
+            return p.end_time if upper else p.start_time
+        except (ValueError, TypeError):
+            return pd.Timestamp(s)
+    return bound(start, False), bound(end, True)
+
+def _to_epoch_ns(ts: pd.Timestamp, tz: Optional[str]) -> int:
+    if tz and ts.tzinfo is None:
+        ts = ts.tz_localize(tz)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.value
+
+def _columnar_window(path: str, start, end) -> Tuple[dict, np.ndarray, int, int]:
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    tz = meta.get("tz")
+    ts = np.load(os.path.join(path, "timestamp.npy"), mmap_mode="r")
+    lo_ts, hi_ts = time_bounds(start, end)
+    lo = int(np.searchsorted(ts, _to_epoch_ns(lo_ts, tz), side="left")) if lo_ts is not None else 0
+    hi = int(np.searchsorted(ts, _to_epoch_ns(hi_ts, tz), side="right")) if hi_ts is not None else len(ts)
+    return meta, ts, lo, max(lo, hi)
+
+def _columnar_frame(path: str, meta: dict, ts: np.ndarray, lo: int, hi: int, copy: bool = True) -> pd.DataFrame:
+    # copy=False keeps the columns as read-only views of the mapped files
+    take = (lambda a: np.array(a[lo:hi])) if copy else (lambda a: a[lo:hi])
+    index = pd.DatetimeIndex(take(ts).view("datetime64[ns]"), name="timestamp")
+    if meta.get("tz"):
+        index = index.tz_localize("UTC").tz_convert(meta["tz"])
+    data = {}
+    for col in meta["columns"]:
+        data[col] = take(np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r"))
+    return pd.DataFrame(data, index=index, copy=False)
+
+def map_columnar(path: str) -> pd.DataFrame:
+    """The whole dataset in directory path, as a frame over the mapped files (no copy)."""
+    meta, ts, lo, hi = _columnar_window(path, None, None)
+    return _columnar_frame(path, meta, ts, lo, hi, copy=False)
+
+def load_columnar(symbol: str, timeframe: str, start: Optional[str], end: Optional[str]) -> Optional[pd.DataFrame]:
+    """Load [start, end] from the columnar store, or None if the dataset was never ingested."""
+    path = columnar_path(symbol, timeframe)
+    if path is None:
+        return None
+    meta, ts, lo, hi = _columnar_window(path, start, end)
+    return _columnar_frame(path, meta, ts, lo, hi)
+
+def iter_columnar(symbol: str, timeframe: str, start: Optional[str], end: Optional[str],
+                  chunk_rows: int) -> Optional[Iterator[pd.DataFrame]]:
+    """Like load_columnar, but yields the window as frames of at most chunk_rows rows."""
+    path = columnar_path(symbol, timeframe)
+    if path is None:
+        return None
+    meta, ts, lo, hi = _columnar_window(path, start, end)
+    return (_columnar_frame(path, meta, ts, i, min(i + chunk_rows, hi)) for i in range(lo, hi, chunk_rows))
+
+def iter_csv(symbol: str, timeframe: str, start: Optional[str], end: Optional[str],
+             chunk_rows: int) -> Optional[Iterator[pd.DataFrame]]:
+    """
+    Read `{symbol}_{timeframe}.csv` in chunks of chunk_rows, filtered to [start, end].
+    Assumes the file is sorted by timestamp (as ingest_csv and the fetch scripts write it).
+    """
+    path = find_data_file(f"{symbol}_{timeframe}.csv")
+    if path is None:
+        return None
+    lo_ts, hi_ts = time_bounds(start, end)
+
+    def chunks():
+        for chunk in pd.read_csv(path, parse_dates=["timestamp"], chunksize=chunk_rows):
+            chunk = chunk.set_index("timestamp")
+            if lo_ts is not None:
+                chunk = chunk[chunk.index >= _localize(lo_ts, chunk.index.tz)]
+            if hi_ts is not None:
+                past = chunk.index > _localize(hi_ts, chunk.index.tz)
+                if past.any():
+                    if not past.all():
+                        yield chunk[~past]
+                    return
+            if len(chunk):
+                yield chunk
+    return chunks()
+
+def _localize(ts: pd.Timestamp, tz) -> pd.Timestamp:
+    return ts.tz_localize(tz) if tz is not None and ts.tzinfo is None else ts
+
+def ingest_csv(symbol: str, timeframe: str, csv_path: Optional[str] = None, out_dir: Optional[str] = None) -> str:
+    """Convert `{symbol}_{timeframe}.csv` into the columnar layout. Returns the dataset directory."""
+    csv_path = csv_path or find_data_file(f"{symbol}_{timeframe}.csv")
+    if not csv_path or not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Historical data not found: {symbol}_{timeframe}.csv")
+    # taken before reading, so bars appended meanwhile make the dataset stale rather than lost
+    mtime_ns, size = _file_version(csv_path)
+    df = pd.read_csv(csv_path, parse_dates=["timestamp"])
+    df = df.set_index("timestamp").sort_index()
+    out_dir = out_dir or os.path.join(os.path.dirname(csv_path), f"{symbol}_{timeframe}")
+    return write_columnar(df, out_dir, symbol=symbol, timeframe=timeframe, source=os.path.basename(csv_path),
+                          source_mtime_ns=mtime_ns, source_size=size)
+
+def write_columnar(df: pd.DataFrame, out_dir: str, **meta) -> str:
+    """Write a sorted OHLCV frame as a columnar dataset directory; meta goes into meta.json."""
+    index = df.index
+    tz = str(index.tz) if index.tz is not None else None
+    if tz:
+        index = index.tz_convert("UTC").tz_localize(None)
+
+    # write next to the target and swap in, so readers never see a half-written dataset
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "timestamp.npy"), index.asi8.astype(np.int64))
+    columns = [c for c in OHLCV_COLUMNS if c in df.columns]
+    for col in columns:
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), df[col].to_numpy(dtype=np.float64))
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump(dict(meta, columns=columns, rows=len(df), tz=tz), f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert OHLCV CSV files into the columnar store")
+    parser.add_argument("symbol")
+    parser.add_argument("timeframe")
+    parser.add_argument("--csv", help="source CSV (default: {symbol}_{timeframe}.csv in the data dir)")
+    parser.add_argument("--out", help="output directory (default: next to the CSV)")
+    args = parser.parse_args()
+    out = ingest_csv(args.symbol, args.timeframe, csv_path=args.csv, out_dir=args.out)
+    print(f"Wrote {out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+_YEAR_NS = 365 * 86400 * 1_000_000_000
+
+def bars_per_year(index: pd.DatetimeIndex, bar_ns: Optional[int] = None) -> Optional[float]:
+    """Annualization factor; bar_ns defaults to the median spacing of the index."""
+    if bar_ns is None:
+        if len(index) < 2:
+            return None
+        bar_ns = int(np.median(np.diff(index.asi8)))
+    return _YEAR_NS / bar_ns if bar_ns > 0 else None
+
+def holding_mask(n: int, entry_idx: np.ndarray, exit_idx: np.ndarray) -> np.ndarray:
+    """
+    held[i] == 1 when a position is open over the move from bar i-1 to bar i,
+    i.e. entry < i <= exit for some trade (trades enter and exit on bar closes).
+    An entry of -1 is a position carried in from before bar 0; an exit >= n one
+    that is still open after the last bar.
+    """
+    delta = np.zeros(n + 2, dtype=np.int64)
+    np.add.at(delta, np.asarray(entry_idx) + 1, 1)
+    np.add.at(delta, np.minimum(np.asarray(exit_idx), n) + 1, -1)
+    return np.cumsum(delta[:n])
+
+class EquityAccumulator:
+    """
+    Mark-to-market equity (cumulative pnl, qty=1) and the risk metrics derived from it,
+    fed bar chunk by bar chunk so memory does not grow with the number of bars.
+    The in-memory path feeds one chunk, streaming/resumed runs feed many.
+    """
+
+    def __init__(self, points: int = 500):
+        self.points = max(1, points)
+        self.bars = 0
+        self.prev_close: Optional[float] = None
+        self.level = 0.0
+        # equity starts flat at 0, which counts as the first peak
+        self.peak = 0.0
+        self.last_peak = -1
+        self.max_dd = 0.0
+        self.max_dd_bars = 0
+        self.held_bars = 0
+        # mean / sum of squared deviations of per-bar returns, merged across chunks
+        self.ret_mean = 0.0
+        self.ret_m2 = 0.0
+        self.neg_sq = 0.0
+        self.trades = 0
+        self.holding_bars = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        # downsampled curve: every `stride`-th bar, stride doubles when the buffer fills
+        self.stride = 1
+        self.sample_idx = np.empty(0, dtype=np.int64)
+        self.sample_ts = np.empty(0, dtype=np.int64)
+        self.sample_eq = np.empty(0)
+        self.last_point: Optional[Tuple[int, int, float]] = None
+
+    def state(self) -> Dict[str, Any]:
+        """Everything needed to continue accumulating later (see from_state)."""
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "EquityAccumulator":
+        acc = cls.__new__(cls)
+        acc.__dict__.update(state)
+        if acc.last_point is not None:
+            acc.last_point = tuple(acc.last_point)
+        return acc
+
+    def add_bars(self, ts: np.ndarray, close: np.ndarray, held: np.ndarray):
+        """ts: epoch-ns bar times, held: holding_mask for these bars."""
+        n = len(close)
+        if n == 0:
+            return
+        close = np.asarray(close, dtype=np.float64)
+        prev = np.concatenate(([self.prev_close if self.prev_close is not None else close[0]], close[:-1]))
+        equity = self.level + np.cumsum(held * (close - prev))
+        gidx = self.bars + np.arange(n)
+
+        peak = np.maximum.accumulate(np.maximum(equity, self.peak))
+        dd = peak - equity
+        last_peak = np.maximum(np.maximum.accumulate(np.where(dd <= 0, gidx, -1)), self.last_peak)
+        self.max_dd = max(self.max_dd, float(dd.max()))
+        self.max_dd_bars = max(self.max_dd_bars, int((gidx - last_peak).max()))
+        self.peak, self.last_peak = float(peak[-1]), int(last_peak[-1])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rets = held * (close / prev - 1.0)
+        rets = np.nan_to_num(rets, nan=0.0, posinf=0.0, neginf=0.0)
+        # Chan et al. pairwise merge of (count, mean, M2)
+        m, m2 = float(rets.mean()), float(((rets - rets.mean()) ** 2).sum())
+        total = self.bars + n
+        d = m - self.ret_mean
+        self.ret_mean += d * n / total
+        self.ret_m2 += m2 + d * d * self.bars * n / total
+        self.neg_sq += float((np.minimum(rets, 0.0) ** 2).sum())
+        self.held_bars += int(held.sum())
+
+        keep = gidx % self.stride == 0
+        self.sample_idx = np.concatenate((self.sample_idx, gidx[keep]))
+        self.sample_ts = np.concatenate((self.sample_ts, ts[keep]))
+        self.sample_eq = np.concatenate((self.sample_eq, equity[keep]))
+        while len(self.sample_idx) > 2 * self.points:
+            self.stride *= 2
+            keep = self.sample_idx % self.stride == 0
+            self.sample_idx, self.sample_ts, self.sample_eq = self.sample_idx[keep], self.sample_ts[keep], self.sample_eq[keep]
+        self.last_point = (int(gidx[-1]), int(ts[-1]), float(equity[-1]))
+
+        self.bars = total
+        self.level = float(equity[-1])
+        self.prev_close = float(close[-1])
+
+    def add_trades(self, entry_idx: np.ndarray, exit_idx: np.ndarray, pnl: np.ndarray):
+        """Closed trades with global bar indices."""
+        self.trades += len(pnl)
+        self.holding_bars += int((np.asarray(exit_idx) - np.asarray(entry_idx)).sum())
+        self.gross_profit += float(pnl[pnl > 0].sum())
+        self.gross_loss += float(-pnl[pnl < 0].sum())
+
+    def curve(self) -> Dict[str, Any]:
+        ts, eq = self.sample_ts.tolist(), self.sample_eq.tolist()
+        if self.last_point is not None and (not len(self.sample_idx) or self.sample_idx[-1] != self.last_point[0]):
+            ts.append(self.last_point[1])
+            eq.append(self.last_point[2])
+        return {"ts": ts, "equity": eq}
+
+    def metrics(self, periods_per_year: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Per-bar returns are the held position's close-to-close percent change;
+        Sharpe/Sortino are annualized with periods_per_year.
+        """
+        n = self.bars
+        scale = np.sqrt(periods_per_year) if periods_per_year else 1.0
+        std = np.sqrt(self.ret_m2 / n) if n else 0.0
+        downside = np.sqrt(self.neg_sq / n) if n else 0.0
+        return {
+            "max_drawdown": self.max_dd,
+            "max_drawdown_bars": self.max_dd_bars,
+            "sharpe": float(self.ret_mean / std * scale) if std > 0 else None,
+            "sortino": float(self.ret_mean / downside * scale) if downside > 0 else None,
+            "exposure": self.held_bars / n if n else 0.0,
+            "profit_factor": self.gross_profit / self.gross_loss if self.gross_loss > 0 else None,
+            "avg_holding_bars": self.holding_bars / self.trades if self.trades else None,
+        }
@@ -0,0 +1,92 @@
+"""
+Streamed exports of trades and equity curves.
+
+Tables go out as NDJSON (one object per line) or as an Arrow IPC stream (one record batch
+per part, e.g. per stored trade chunk), with timestamps as int64 epoch nanoseconds (UTC), so
+clients load them column-wise instead of parsing ISO strings. Arrow needs pyarrow.
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional
+import io
+import json
+import numpy as np
+from app.services.trade_store import EXIT_REASONS
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+FORMATS = {"json": JSON, "ndjson": NDJSON, "arrow": ARROW}
+TRADE_FIELDS = ("entry_ts", "exit_ts", "entry_price", "exit_price", "qty", "pnl", "exit_reason")
+EQUITY_FIELDS = ("ts", "equity")
+
+def negotiate(fmt: Optional[str], accept: Optional[str]) -> str:
+    """Media type of an export: the format query parameter if given, else the Accept header."""
+    if fmt:
+        return FORMATS[fmt]
+    for media in (accept or "").split(","):
+        media = media.split(";")[0].strip()
+        if media in (NDJSON, "application/ndjson"):
+            return NDJSON
+        if media in (ARROW, "application/vnd.apache.arrow.file"):
+            return ARROW
+    return JSON
+
+def trade_table(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # exit_reason stays an int8 code (-1 for none) until encoding
+    return {name: cols[name] for name in TRADE_FIELDS}
+
+def equity_table(curve: Dict[str, List[Any]]) -> Dict[str, np.ndarray]:
+    return {"ts": np.asarray(curve.get("ts", []), dtype=np.int64),
+            "equity": np.asarray(curve.get("equity", []), dtype=np.float64)}
+
+def ndjson_lines(table: Dict[str, np.ndarray]) -> bytes:
+    names = list(table)
+    columns = [table[n].tolist() for n in names]
+    if "exit_reason" in table:
+        # -1 indexes the trailing None
+        names_of = np.asarray(EXIT_REASONS + (None,), dtype=object)
+        columns[names.index("exit_reason")] = names_of[table["exit_reason"]].tolist()
+    rows = zip(*columns)
+    return "".join(json.dumps(dict(zip(names, row))) + "\n" for row in rows).encode()
+
+def _arrow_schema(fields) -> Any:
+    types = {"exit_reason": pa.dictionary(pa.int8(), pa.string()), "ts": pa.int64(),
+             "entry_ts": pa.int64(), "exit_ts": pa.int64()}
+    return pa.schema([(name, types.get(name, pa.float64())) for name in fields])
+
+def _arrow_batch(table: Dict[str, np.ndarray], schema) -> Any:
+    arrays = []
+    for field in schema:
+        values = table[field.name]
+        if pa.types.is_dictionary(field.type):
+            codes = np.asarray(values, dtype=np.int8)
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), pa.array(EXIT_REASONS)))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+async def stream(parts: AsyncIterator[Dict[str, np.ndarray]], media_type: str, fields) -> AsyncIterator[bytes]:
+    """Encode tables from parts (same fields each) as NDJSON or an Arrow IPC stream, part by part."""
+    if media_type == NDJSON:
+        async for table in parts:
+            yield ndjson_lines(table)
+        return
+    schema = _arrow_schema(fields)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def flush() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    async for table in parts:
+        writer.write_batch(_arrow_batch(table, schema))
+        yield flush()
+    writer.close()
+    yield flush()
@@ -0,0 +1,43 @@
+from typing import Any, Dict
+import hashlib
+import json
+from app.services.datastore import time_bounds
+from app.services.resample import resolve_dataset
+
+# params that choose how a result is computed but never change it
+_NON_SEMANTIC_PARAMS = ("engine",)
+
+def normalize_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill defaults and canonicalize fields so equivalent payloads compare equal."""
+    p = dict(payload)
+    p.setdefault("job_type", "backtest")
+    p.setdefault("timeframe", "1m")
+    p["force_close"] = bool(p.get("force_close", True))
+    # streaming and in-memory runs produce the same result
+    p.pop("streaming", None)
+    # so do sharded and serial ones
+    p.pop("shards", None)
+    # "2023-01-01" and "2023-01-01T00:00:00" are the same start; compare resolved bounds
+    lo, hi = time_bounds(p.get("start"), p.get("end"))
+    p["start"] = lo.isoformat() if lo is not None else None
+    p["end"] = hi.isoformat() if hi is not None else None
+    if p["job_type"] in ("backtest", "portfolio"):
+        params = dict(p.get("params") or {})
+        for k in _NON_SEMANTIC_PARAMS:
+            params.pop(k, None)
+        params["fast"] = int(params.get("fast", 20))
+        params["slow"] = int(params.get("slow", 50))
+        for k in ("sl", "tp"):
+            params[k] = float(params[k]) if params.get(k) is not None else None
+        p["params"] = params
+    return p
+
+def payload_fingerprint(payload: Dict[str, Any]) -> str:
+    """sha256 of the normalized payload plus the version (path, mtime, size) of its dataset(s)."""
+    p = normalize_payload(payload)
+    if "symbols" in p:
+        version = [resolve_dataset(s, p["timeframe"]) for s in p["symbols"]]
+    else:
+        version = resolve_dataset(p.get("symbol"), p["timeframe"])
+    blob = json.dumps({"payload": p, "dataset": version}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
@@ -0,0 +1,144 @@
+"""
+Indicator kernels shared by the simulator, the sweep and compiled strategy graphs.
+
+Every kernel is a single vectorized pass:
+- rolling windows (mean, sum, std, min, max) run pandas' rolling aggregations, which are
+  O(n) running sums and, for min/max, a monotonic deque;
+- EMA-style indicators (EMA, RSI, ATR) are the recursive filter y[t] = (1-a) y[t-1] + a x[t]
+  (pandas ewm with adjust=False), which can be continued exactly from its last output.
+
+Results are memoized in indicator_cache, bounded by INDICATOR_CACHE_MAX_BYTES, per
+(dataset, version, first bar, indicator, params) over the rest of the dataset (see
+simulator.run_indicators), so backtests and sweeps starting on the same bar share them and
+each takes the first bars of its window.
+"""
+from typing import Any, Callable, Hashable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.dataset_cache import DatasetCache
+
+# rolling means are computed per block of this many bars (see rolling_mean)
+SMA_BLOCK = 1 << 16
+
+_ROLLING_OPS = {
+    "mean": lambda r: r.mean(),
+    "sum": lambda r: r.sum(),
+    # population std, so a one-bar window is 0 rather than NaN
+    "std": lambda r: r.std(ddof=0),
+    "min": lambda r: r.min(),
+    "max": lambda r: r.max(),
+}
+
+def rolling(values: np.ndarray, window: int, op: str = "mean", values_start: int = 0,
+            out_start: Optional[int] = None) -> np.ndarray:
+    """
+    Trailing window aggregate (min_periods=1) for global bar positions
+    [out_start, values_start + len(values)), where values[0] is the bar at global position
+    values_start (default: the whole array).
+
+    pandas' rolling sums carry running state, so their last bits depend on where the series
+    started. Here every block of SMA_BLOCK positions is computed from its own window-1 bar
+    prefix, which makes each value a function of the bar position and the prices alone:
+    chunked, resumed and sharded runs reproduce the in-memory result exactly.
+    values must reach back to rolling_history_start(out_start, window).
+    """
+    agg = _ROLLING_OPS[op]
+    out_start = values_start if out_start is None else out_start
+    end = values_start + len(values)
+    out = np.empty(max(0, end - out_start))
+    b = (out_start // SMA_BLOCK) * SMA_BLOCK
+    while b < end:
+        be = min(b + SMA_BLOCK, end)
+        lo = max(0, b - window + 1)
+        if lo < values_start:
+            raise ValueError("rolling needs values from an earlier bar than provided")
+        seg = values[lo - values_start:be - values_start]
+        block = agg(pd.Series(seg).rolling(window=window, min_periods=1)).to_numpy()[b - lo:]
+        s = max(b, out_start)
+        out[s - out_start:be - out_start] = block[s - b:]
+        b = be
+    return out
+
+def rolling_mean(values: np.ndarray, window: int, values_start: int = 0, out_start: Optional[int] = None) -> np.ndarray:
+    return rolling(values, window, "mean", values_start, out_start)
+
+def rolling_history_start(next_pos: int, window: int) -> int:
+    """Earliest bar rolling() needs to continue a series at global position next_pos."""
+    return max(0, (next_pos // SMA_BLOCK) * SMA_BLOCK - window + 1)
+
+def ema(values: np.ndarray, alpha: float, initial: Optional[float] = None) -> np.ndarray:
+    """
+    y[0] = values[0] (or the recursion continued from `initial`, the output just before
+    values[0]), then y[t] = (1-alpha) y[t-1] + alpha values[t].
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if initial is None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    # seeding the series with the previous output replays the exact same recursion
+    return pd.Series(np.concatenate(([initial], values))).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+def ema_alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+def wilder_alpha(window: int) -> float:
+    return 1.0 / window
+
+def diff(values: np.ndarray) -> np.ndarray:
+    # first bar has no previous bar: 0 change
+    return np.concatenate(([0.0], np.diff(values)))
+
+def rsi_from_averages(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        out = 100.0 - 100.0 / (1.0 + rs)
+    # no losses: 100, or 50 when nothing moved at all
+    return np.where(avg_loss > 0, out, np.where(avg_gain > 0, 100.0, 50.0))
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """Wilder's RSI."""
+    change = diff(np.asarray(close, dtype=np.float64))
+    a = wilder_alpha(window)
+    return rsi_from_averages(ema(np.maximum(change, 0.0), a), ema(np.maximum(-change, 0.0), a))
+
+def true_range(high: np.ndarray, low: np.ndarray, prev_close: np.ndarray) -> np.ndarray:
+    """prev_close[t] is the close before bar t (NaN for the first bar: high - low)."""
+    tr = high - low
+    with np.errstate(invalid="ignore"):
+        gaps = np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    return np.fmax(tr, gaps)
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14) -> np.ndarray:
+    """Wilder's average true range."""
+    prev_close = np.concatenate(([np.nan], np.asarray(close, dtype=np.float64)[:-1]))
+    return ema(true_range(high, low, prev_close), wilder_alpha(window))
+
+def bollinger(close: np.ndarray, window: int = 20, k: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(middle, upper, lower) bands: SMA +- k population standard deviations."""
+    mid = rolling(close, window, "mean")
+    sd = rolling(close, window, "std")
+    return mid, mid + k * sd, mid - k * sd
+
+def vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray, window: int) -> np.ndarray:
+    """Volume-weighted typical price over a trailing window of bars."""
+    typical = (high + low + close) / 3.0
+    return vwap_from_sums(rolling(typical * volume, window, "sum"), rolling(volume, window, "sum"), typical)
+
+def vwap_from_sums(pv: np.ndarray, vol: np.ndarray, typical: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # no volume in the window: fall back to the typical price
+        return np.where(vol > 0, pv / vol, typical)
+
+# indicator arrays shared by every job in this process
+indicator_cache = DatasetCache(settings.INDICATOR_CACHE_MAX_BYTES)
+
+def memoized(scope: Optional[Tuple[Hashable, Any]], key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+    """
+    compute() through indicator_cache. scope is (dataset key, dataset version) from the
+    caller, where the key also pins the first bar the arrays are computed from; None
+    disables memoizing. Cached arrays are shared and must not be modified.
+    """
+    if scope is None:
+        return compute()
+    dataset, version = scope
+    return indicator_cache.get_or_load((dataset, key), version, compute)
@@ -0,0 +1,152 @@
+"""
+Per-job pipeline instrumentation.
+
+Code on the job path marks its stages with `with stage("load"): ...` and counts work with
+count("bars", n). Both are no-ops unless a recorder is active, which run_recorded sets up
+around a job runner (in the process that runs it), so the simulator needs no extra arguments.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import cProfile
+import os
+import sys
+import time
+from app.core.config import settings
+from app.services import job_control
+from app.services.job_control import JobControl
+
+class StageRecorder:
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - t
+
+    def count(self, name: str, n: int):
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+_recorder: ContextVar[Optional[StageRecorder]] = ContextVar("stage_recorder", default=None)
+
+def stage(name: str):
+    recorder = _recorder.get()
+    return recorder.stage(name) if recorder is not None else nullcontext()
+
+def count(name: str, n: int):
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.count(name, n)
+
+def timed_iter(name: str, items: Iterable[Any]) -> Iterator[Any]:
+    """Iterate items, timing only the production of each item (e.g. reading a chunk) under name."""
+    it = iter(items)
+    while True:
+        with stage(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+def reset_peak_rss():
+    # Linux only: makes VmHWM restart from the current RSS, so the peak is this job's
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB (since the last reset_peak_rss, on Linux)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def _cache_counts() -> Dict[str, Dict[str, int]]:
+    # imported here: the simulator imports this module
+    from app.services.simulator import dataset_cache
+    from app.services.indicators import indicator_cache
+    return {name: {k: cache.stats()[k] for k in ("hits", "misses")}
+            for name, cache in (("dataset", dataset_cache), ("indicator", indicator_cache))}
+
+def run_recorded(runner: Callable[[Dict[str, Any]], Any], payload: Dict[str, Any],
+                 profile_name: Optional[str] = None, control: Optional[JobControl] = None):
+    """
+    runner(payload) with its stages recorded. Returns (result, stats) where stats holds
+    "timings" (seconds per stage, "run" for the whole call), "bars", "peak_rss_mb", the
+    dataset/indicator cache hits and misses during the call ("caches"), and "profiles": the
+    path of a cProfile dump when profiling is on (PROFILE_SLOWER_THAN_SECONDS) and the run
+    took at least that long. With control, the runner reports progress to the job's slot and
+    can be stopped (see job_control). Module level so it can be submitted to a process pool.
+    """
+    recorder = StageRecorder()
+    token = _recorder.set(recorder)
+    before = _cache_counts()
+    reset_peak_rss()
+    profiler = cProfile.Profile() if settings.PROFILE_SLOWER_THAN_SECONDS > 0 else None
+    t = time.perf_counter()
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active in this process (e.g. a concurrent job's thread)
+            profiler = None
+    try:
+        with job_control.bound(control):
+            result = runner(payload)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _recorder.reset(token)
+    elapsed = time.perf_counter() - t
+    after = _cache_counts()
+    stats = {
+        "timings": dict(recorder.timings, run=elapsed),
+        "bars": recorder.counts.get("bars", 0),
+        "peak_rss_mb": peak_rss_mb(),
+        "caches": {name: {k: after[name][k] - before[name][k] for k in counts} for name, counts in before.items()},
+        "profiles": [],
+    }
+    if profiler is not None and elapsed >= settings.PROFILE_SLOWER_THAN_SECONDS:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, f"{profile_name or f'pid{os.getpid()}_{int(time.time())}'}.prof")
+        profiler.dump_stats(path)
+        stats["profiles"].append(path)
+    return result, stats
+
+def merge_stats(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stats of work split over several run_recorded calls: times, bars and cache counts add up."""
+    timings: Dict[str, float] = {}
+    caches: Dict[str, Dict[str, int]] = {}
+    for p in parts:
+        for k, v in p["timings"].items():
+            timings[k] = timings.get(k, 0.0) + v
+        for name, counts in p["caches"].items():
+            merged = caches.setdefault(name, {})
+            for k, v in counts.items():
+                merged[k] = merged.get(k, 0) + v
+    peaks = [p["peak_rss_mb"] for p in parts if p["peak_rss_mb"] is not None]
+    return {
+        "timings": timings,
+        "bars": sum(p["bars"] for p in parts),
+        "peak_rss_mb": max(peaks) if peaks else None,
+        "caches": caches,
+        "profiles": [path for p in parts for path in p["profiles"]],
+    }
@@ -0,0 +1,152 @@
+"""
+Progress, cancellation and resource limits of running jobs.
+
+The worker gives each running job a slot in a small array shared with its pool processes
+(JobSlots). Engines report their work with add_total(n) and advance(n), between slices of
+it; both are no-ops unless a job is bound, which run_recorded sets up in the process running
+the job (or a part of it), so the engines need no extra arguments. The worker copies a slot's
+progress to the job row every PROGRESS_INTERVAL_SECONDS and raises its stop flag when the job
+is cancelled or runs past JOB_MAX_SECONDS; the next advance() in any process working on the
+job then raises JobStopped. advance() also stops a job once the calling process has grown by
+more than JOB_MAX_MEMORY_MB since it started on the job. Stopping is cooperative: code between
+two advance() calls runs to its end.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import os
+import time
+from app.core.config import settings
+
+# slot fields: owning job id (0 when free), work done, work total, stop code
+_FIELDS = 4
+STOP_CANCELLED = 1
+STOP_TIMEOUT = 2
+# seconds between two looks at the stop flag and the memory use of one bound job
+_CHECK_INTERVAL = 0.1
+
+class JobStopped(Exception):
+    """A job told to stop; status is the one it ends with ("cancelled" or "failed")."""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+@dataclass(frozen=True)
+class JobControl:
+    """Picklable handle on a job's slot, passed to every process working on the job."""
+    job_id: int
+    slot: int
+    max_memory_mb: float = 0.0
+
+# this process's view of the worker's slot array (None outside a worker)
+_array = None
+
+def init_process(array):
+    """Pool initializer: attach to the worker's slot array."""
+    global _array
+    _array = array
+
+class JobSlots:
+    """The worker's side: one slot per job it runs at a time. Create it before the pool."""
+
+    def __init__(self, n: int, ctx):
+        self.array = ctx.Array("q", n * _FIELDS)
+        self._free = list(range(n - 1, -1, -1))
+        # jobs run on the worker's own threads too (executor=None)
+        init_process(self.array)
+
+    def allocate(self, job_id: int) -> Optional[JobControl]:
+        if not self._free:
+            return None
+        slot = self._free.pop()
+        with self.array.get_lock():
+            self.array[slot * _FIELDS:(slot + 1) * _FIELDS] = [job_id, 0, 0, 0]
+        return JobControl(job_id, slot, settings.JOB_MAX_MEMORY_MB)
+
+    def release(self, control: JobControl):
+        with self.array.get_lock():
+            self.array[control.slot * _FIELDS] = 0
+        self._free.append(control.slot)
+
+    def progress(self, control: JobControl) -> Tuple[int, int]:
+        """(done, total) reported so far."""
+        base = control.slot * _FIELDS
+        with self.array.get_lock():
+            return self.array[base + 1], self.array[base + 2]
+
+    def stop(self, control: JobControl, code: int):
+        self.array[control.slot * _FIELDS + 3] = code
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MiB (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError):
+        return None
+
+class _Binding:
+    def __init__(self, control: JobControl, check_memory: bool):
+        self.control = control
+        self.base = control.slot * _FIELDS
+        self.rss_start = rss_mb() if check_memory and control.max_memory_mb > 0 else None
+        self.next_check = 0.0
+
+_current: ContextVar[Optional[_Binding]] = ContextVar("job_control", default=None)
+
+@contextmanager
+def bound(control: Optional[JobControl], check_memory: bool = True):
+    """Report to and obey control's slot within the block (a no-op for None or outside a worker)."""
+    if control is None or _array is None:
+        yield
+        return
+    token = _current.set(_Binding(control, check_memory))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def current() -> Optional[JobControl]:
+    binding = _current.get()
+    return binding.control if binding is not None else None
+
+def add_total(n: int):
+    """Announce n more units of work (bars, unless the job type says otherwise)."""
+    binding = _current.get()
+    if binding is not None:
+        with _array.get_lock():
+            if _array[binding.base] == binding.control.job_id:
+                _array[binding.base + 2] += int(n)
+
+def advance(n: int):
+    """Report n units done, then raise JobStopped if the job has to stop."""
+    binding = _current.get()
+    if binding is None:
+        return
+    with _array.get_lock():
+        owned = _array[binding.base] == binding.control.job_id
+        if owned:
+            _array[binding.base + 1] += int(n)
+    now = time.monotonic()
+    if owned and now < binding.next_check:
+        return
+    binding.next_check = now + _CHECK_INTERVAL
+    if not owned:
+        # the worker is done with the job (another part of it failed or it was stopped)
+        raise JobStopped("failed", "Job was abandoned by the worker")
+    code = _array[binding.base + 3]
+    if code == STOP_CANCELLED:
+        raise JobStopped("cancelled", "Cancelled")
+    if code == STOP_TIMEOUT:
+        raise JobStopped("failed", f"Wall time limit of {settings.JOB_MAX_SECONDS:g}s exceeded")
+    if binding.rss_start is not None:
+        grown = (rss_mb() or 0.0) - binding.rss_start
+        if grown > binding.control.max_memory_mb:
+            raise JobStopped("failed", f"Memory limit of {binding.control.max_memory_mb:g} MiB exceeded "
+                                       f"(grew by {grown:.0f} MiB)")
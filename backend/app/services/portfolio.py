@@ -0,0 +1,169 @@
+"""
+Multi-symbol portfolio backtests.
+
+Capital is split between the symbols by weight; each symbol's sleeve runs the strategy on
+its own bars and reinvests its whole sleeve value in every trade (qty = sleeve value /
+entry price). Sleeves are independent, so they are simulated in parallel (one pool task per
+symbol) and only combined at the end: every sleeve's value is carried forward onto the
+union of all bar times and summed into the portfolio equity.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from concurrent.futures import Executor
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.equity import EquityAccumulator, bars_per_year
+from app.services.resample import timeframe_to_ns
+from app.services.simulator import (
+    StreamingStrategy, stream_trades, bar_slices, load_ohlcv, strategy_plan, run_indicators, compute_metrics_from_pnl,
+)
+from app.services.strategy_graph import sma_crossover_plan
+from app.services.trade_store import concat_columns, epoch_ns
+from app.services.instrument import stage, run_recorded, merge_stats
+from app.services import job_control
+
+def allocate(symbols: List[str], capital: float, weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Sleeve capital per symbol; weights are relative (default equal) and normalized."""
+    raw = {s: float((weights or {}).get(s, 1.0 if not weights else 0.0)) for s in symbols}
+    if any(w < 0 for w in raw.values()):
+        raise ValueError("weights must not be negative")
+    total = sum(raw.values())
+    if total <= 0:
+        raise ValueError("weights must give at least one symbol a positive weight")
+    return {s: capital * w / total for s, w in raw.items()}
+
+def leg_payloads(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    sleeves = allocate(payload["symbols"], float(payload.get("capital", 100000.0)), payload.get("weights"))
+    common = {k: v for k, v in payload.items() if k not in ("symbols", "weights", "capital", "job_type")}
+    # a zero-weight symbol has nothing to simulate
+    return [dict(common, symbol=s, capital=c) for s, c in sleeves.items() if c > 0]
+
+def run_portfolio_leg(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One symbol's sleeve: sized trades and the sleeve value at each of its bars.
+    Runs inside a pool process, so it must stay a picklable module-level function.
+    """
+    symbol, timeframe = payload["symbol"], payload.get("timeframe", "1m")
+    capital = float(payload["capital"])
+    params = payload.get("params", {}) or {}
+    sl, tp = params.get("sl"), params.get("tp")
+    plan = strategy_plan(payload.get("strategy")) or sma_crossover_plan(int(params.get("fast", 20)), int(params.get("slow", 50)))
+    strategy = StreamingStrategy(plan, bool(payload.get("force_close", True)), float(sl) if sl is not None else None,
+                                 float(tp) if tp is not None else None, settings.EQUITY_CURVE_POINTS)
+    with stage("load"):
+        df = load_ohlcv(symbol, timeframe, payload.get("start"), payload.get("end"))
+    strategy.indicators = run_indicators(symbol, timeframe, df)
+    trades = concat_columns(list(stream_trades(strategy, bar_slices(df))))
+    with stage("metrics"):
+        return _size_sleeve(symbol, capital, strategy, df, trades, timeframe)
+
+def _size_sleeve(symbol: str, capital: float, strategy: StreamingStrategy, df: pd.DataFrame,
+                 trades: Dict[str, np.ndarray], timeframe: str) -> Dict[str, Any]:
+    # compounding: each trade is sized with the sleeve value after the previous ones
+    growth = np.cumprod(np.concatenate(([1.0], trades["exit_price"] / trades["entry_price"])))
+    qty = capital * growth[:-1] / trades["entry_price"]
+    trades["qty"] = qty
+    trades["pnl"] = qty * (trades["exit_price"] - trades["entry_price"])
+
+    ts = epoch_ns(df.index)
+    close = df["close"].to_numpy(dtype=float)
+    entry_idx = np.searchsorted(ts, trades["entry_ts"])
+    exit_idx = np.searchsorted(ts, trades["exit_ts"])
+    if strategy.open_position is not None:
+        # still open at the end (force_close off): marked to market, not closed
+        entry_bar, _, entry_price = strategy.open_position
+        entry_idx = np.append(entry_idx, entry_bar)
+        exit_idx = np.append(exit_idx, len(ts))
+        qty = np.append(qty, capital * growth[-1] / entry_price)
+    # units held over the move from bar i-1 to bar i, as in equity.holding_mask
+    delta = np.zeros(len(ts) + 2)
+    np.add.at(delta, entry_idx + 1, qty)
+    np.add.at(delta, np.minimum(exit_idx, len(ts)) + 1, -qty)
+    held = np.cumsum(delta[:len(ts)])
+    value = capital + np.cumsum(held * np.diff(close, prepend=close[:1]))
+
+    metrics = compute_metrics_from_pnl(trades["pnl"])
+    metrics.update(strategy.metrics(timeframe))
+    # the strategy's own drawdown/profit factor are per unit; restate them for the sleeve
+    pnl = trades["pnl"]
+    loss = -pnl[pnl < 0].sum()
+    metrics["profit_factor"] = float(pnl[pnl > 0].sum() / loss) if loss > 0 else None
+    metrics["max_drawdown"], metrics["max_drawdown_pct"] = _max_drawdown(value)
+    return {"symbol": symbol, "capital": capital, "ts": ts, "value": value, "trades": trades, "metrics": metrics}
+
+def combine_portfolio(legs: List[Dict[str, Any]], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Portfolio equity and metrics from the sleeves' values on the union of their bar times."""
+    capital = sum(leg["capital"] for leg in legs)
+    union = np.unique(np.concatenate([leg["ts"] for leg in legs]))
+    equity = np.zeros(len(union))
+    for leg in legs:
+        if not len(leg["ts"]):
+            equity += leg["capital"]
+            continue
+        # last known sleeve value at each union bar; its capital before its first bar
+        pos = np.searchsorted(leg["ts"], union, side="right") - 1
+        equity += np.where(pos >= 0, leg["value"][np.maximum(pos, 0)], leg["capital"])
+
+    # the accumulator tracks pnl (equity - capital), so the curve matches single backtests
+    acc = EquityAccumulator(settings.EQUITY_CURVE_POINTS)
+    acc.add_bars(union, equity, np.ones(len(union)))
+    trades = [leg["trades"] for leg in legs]
+    acc.add_trades(np.concatenate([np.searchsorted(union, t["entry_ts"]) for t in trades]),
+                   np.concatenate([np.searchsorted(union, t["exit_ts"]) for t in trades]),
+                   np.concatenate([t["pnl"] for t in trades]))
+    timeframe = payload.get("timeframe", "1m")
+    risk = acc.metrics(bars_per_year(pd.DatetimeIndex([]), timeframe_to_ns(timeframe)))
+    final = float(equity[-1]) if len(equity) else capital
+
+    metrics = compute_metrics_from_pnl(np.concatenate([t["pnl"] for t in trades]))
+    metrics.update(risk)
+    metrics.update({
+        "capital": capital,
+        "final_equity": final,
+        "total_return": final / capital - 1.0 if capital else None,
+        "max_drawdown_pct": _max_drawdown(equity)[1],
+        # share of the portfolio's capital invested, averaged over the sleeves
+        "exposure": sum(leg["capital"] * leg["metrics"]["exposure"] for leg in legs) / capital if capital else 0.0,
+    })
+    symbols = {}
+    for leg in legs:
+        final_value = float(leg["value"][-1]) if len(leg["value"]) else leg["capital"]
+        symbols[leg["symbol"]] = dict(leg["metrics"], capital=leg["capital"], final_value=final_value,
+                                      weight=leg["capital"] / capital if capital else None, bars=len(leg["ts"]))
+    return {"metrics": metrics, "symbols": symbols, "equity": acc.curve(), "bars": len(union)}
+
+def _max_drawdown(equity: np.ndarray):
+    """(largest drop from a running peak, the same as a fraction of that peak)."""
+    if not len(equity):
+        return 0.0, 0.0
+    peak = np.maximum.accumulate(equity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frac = np.where(peak > 0, (peak - equity) / peak, 0.0)
+    return float((peak - equity).max()), float(frac.max())
+
+def run_portfolio_sync(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # one sleeve after another; the worker runs them in parallel through run_portfolio
+    return combine_portfolio([run_portfolio_leg(leg) for leg in leg_payloads(payload)], payload)
+
+async def run_portfolio(payload: Dict[str, Any], executor: Optional[Executor] = None,
+                        job_id: Optional[int] = None):
+    """
+    Fan the sleeves out over executor (the worker's process pool) and combine their values.
+    Returns (result, stats) like instrument.run_recorded.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    runs = await asyncio.gather(*(
+        loop.run_in_executor(executor, run_recorded, run_portfolio_leg, leg, f"job_{job_id}_{leg['symbol']}",
+                             job_control.current())
+        for leg in leg_payloads(payload)))
+    stats = merge_stats([s for _, s in runs])
+    t = time.perf_counter()
+    # summing the aligned sleeves is plain numpy; keep it off the event loop
+    result = await loop.run_in_executor(None, combine_portfolio, [leg for leg, _ in runs], payload)
+    stats["timings"]["combine"] = time.perf_counter() - t
+    # the sleeves' stage times are summed over processes; run is the portfolio's wall time
+    stats["timings"]["run"] = time.perf_counter() - start
+    return result, stats
@@ -0,0 +1,85 @@
+"""
+Build coarser OHLCV bars (5m, 15m, 1h, 4h, 1d, ...) from the finest stored resolution,
+so only the base timeframe has to be exported.
+"""
+from typing import Any, Optional, Tuple
+import re
+import numpy as np
+import pandas as pd
+from app.services.datastore import available_timeframes, dataset_version
+
+_UNIT_NS = {
+    "s": 1_000_000_000,
+    "m": 60 * 1_000_000_000,
+    "h": 3600 * 1_000_000_000,
+    "d": 86400 * 1_000_000_000,
+}
+_TIMEFRAME_RE = re.compile(r"^(\d+)([smhd])$")
+
+def timeframe_to_ns(timeframe: str) -> Optional[int]:
+    """Bar length of a timeframe like "1m", "4h", "1d"; None if it isn't a fixed duration."""
+    m = _TIMEFRAME_RE.match(timeframe or "")
+    if not m or int(m.group(1)) == 0:
+        return None
+    return int(m.group(1)) * _UNIT_NS[m.group(2)]
+
+def base_timeframe(symbol: str, timeframe: str) -> Optional[str]:
+    """Finest stored timeframe of symbol that evenly divides `timeframe`."""
+    target = timeframe_to_ns(timeframe)
+    if target is None:
+        return None
+    candidates = []
+    for tf in available_timeframes(symbol):
+        ns = timeframe_to_ns(tf)
+        if ns and ns < target and target % ns == 0:
+            candidates.append((ns, tf))
+    return min(candidates)[1] if candidates else None
+
+def resolve_dataset(symbol: str, timeframe: str) -> Optional[Tuple[str, Any]]:
+    """
+    (source timeframe, version) backing symbol/timeframe: the stored dataset itself,
+    or the base it is resampled from. The version changes whenever the source file does.
+    """
+    version = dataset_version(symbol, timeframe)
+    if version is not None:
+        return timeframe, version
+    base = base_timeframe(symbol, timeframe)
+    if base is None:
+        return None
+    return base, ("resampled", timeframe, dataset_version(symbol, base))
+
+def resample_ohlcv(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    Aggregate bars into `timeframe` buckets aligned to the epoch (left-labelled, like
+    DataFrame.resample): open=first, high=max, low=min, close=last, volume=sum, any
+    other column=last. Empty buckets are skipped rather than filled.
+    """
+    period = timeframe_to_ns(timeframe)
+    if period is None:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    index = df.index
+    if len(df) == 0:
+        return df.iloc[:0]
+    ts = index.tz_convert("UTC").tz_localize(None).asi8 if index.tz is not None else index.asi8
+    bucket = ts // period
+    # df is sorted, so each bucket is one contiguous run of rows
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+
+    out = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col == "open":
+            out[col] = values[starts]
+        elif col == "high":
+            out[col] = np.maximum.reduceat(values, starts)
+        elif col == "low":
+            out[col] = np.minimum.reduceat(values, starts)
+        elif col == "volume":
+            out[col] = np.add.reduceat(values, starts)
+        else:
+            out[col] = values[ends]
+    new_index = pd.DatetimeIndex((bucket[starts] * period).view("datetime64[ns]"), name=index.name)
+    if index.tz is not None:
+        new_index = new_index.tz_localize("UTC").tz_convert(index.tz)
+    return pd.DataFrame(out, index=new_index)
@@ -0,0 +1,176 @@
+"""
+One long backtest split into time shards that run in parallel ("shards" in the payload).
+
+The bars are cut into equal shards of at least SHARD_MIN_BARS. Every shard is simulated in its
+own pool task from a flat position, warmed up on the plan's history window before its first
+bar (StreamingStrategy.warm_start), so its signals are exactly those of a serial run and only
+a position carried in across its first bar can make it differ. The shards are then reconciled
+in order: a shard entered flat is taken as is; otherwise it is simulated again from its first
+bar with the carried position, in steps of doubling length, until its open position (entry
+bar and price, which fix the TP/SL levels) agrees with the one the shard's own trades imply
+there. From there on both runs are in the same state, so the shard's later trades stand and a
+re-simulation typically costs about the length of the carried trade. The merged trades are
+those of a serial run; the equity and risk metrics are then rebuilt by replaying them over the
+serial run's STREAM_CHUNK_ROWS slices (StreamingStrategy.replay), so they match it bit for bit.
+
+Plans with carried (ema) steps depend on every earlier bar and are run serially in one task.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import time
+from concurrent.futures import Executor
+import numpy as np
+from app.core.config import settings
+from app.services.simulator import (
+    backtest_strategy, load_ohlcv, row_slices, run_backtest_sync, compute_metrics_from_pnl,
+)
+from app.services.trade_store import concat_columns, slice_columns, epoch_ns
+from app.services.instrument import stage, run_recorded, merge_stats
+from app.services import job_control
+
+# (entry bar, entry epoch ns, entry price), as StreamingStrategy.open_position
+Position = Tuple[int, int, float]
+# bars fed by the first step of a re-simulation; each further step is twice as long
+_FIRST_STEP = 1024
+
+def shard_bounds(n: int, shards: int, min_bars: int) -> List[int]:
+    """Start bars of up to `shards` equal shards of at least min_bars bars, followed by n."""
+    shards = max(1, min(shards, n // max(1, min_bars)))
+    return [i * n // shards for i in range(shards)] + [n]
+
+def _load(payload: Dict[str, Any]):
+    with stage("load"):
+        return load_ohlcv(payload.get("symbol"), payload.get("timeframe", "1m"), payload.get("start"), payload.get("end"))
+
+def _open_after(bar: int, trades: Dict[str, np.ndarray], entry_bar: np.ndarray, exit_bar: np.ndarray,
+                last_open: Optional[Position]) -> Optional[Position]:
+    # the position open between bar - 1 and bar, given a run's trades (sorted by exit) and its final position
+    i = int(np.searchsorted(exit_bar, bar))
+    if i < len(exit_bar):
+        return (int(entry_bar[i]), int(trades["entry_ts"][i]), float(trades["entry_price"][i])) if entry_bar[i] < bar else None
+    return last_open if last_open is not None and last_open[0] < bar else None
+
+# pool tasks: each takes one picklable dict so it can go through instrument.run_recorded
+
+def count_bars(payload: Dict[str, Any]) -> int:
+    return len(_load(payload))
+
+def simulate_shard(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Trades closed in the bars [lo, hi) entered flat, and the position open after them."""
+    payload = task["payload"]
+    lo, hi = task["bounds"]
+    df = _load(payload)
+    strategy = backtest_strategy(payload).warm_start(df, lo)
+    parts = [strategy.feed(chunk) for chunk in row_slices(df.iloc[lo:hi], settings.STREAM_CHUNK_ROWS)]
+    return {"trades": concat_columns([p for p in parts if len(p["pnl"])]), "position": strategy.open_position}
+
+def reconcile_shard(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    simulate_shard's result for [lo, hi) corrected for task["open_position"] carried into it:
+    re-simulated in growing steps until the position agrees with the shard's own at a step's
+    end, after which the shard's trades stand. "resimulated" is the number of bars fed.
+    """
+    payload, shard = task["payload"], task["shard"]
+    lo, hi = task["bounds"]
+    df = _load(payload)
+    ts = epoch_ns(df.index)
+    entry_bar = np.searchsorted(ts, shard["trades"]["entry_ts"])
+    exit_bar = np.searchsorted(ts, shard["trades"]["exit_ts"])
+    strategy = backtest_strategy(payload).warm_start(df, lo)
+    strategy.open_position = task["open_position"]
+    parts, bar, step = [], lo, _FIRST_STEP
+    while bar < hi:
+        end = min(hi, bar + step)
+        parts.append(strategy.feed(df.iloc[bar:end]))
+        bar, step = end, min(2 * step, settings.STREAM_CHUNK_ROWS)
+        if strategy.open_position == _open_after(bar, shard["trades"], entry_bar, exit_bar, shard["position"]):
+            first = int(np.searchsorted(exit_bar, bar))
+            parts.append(slice_columns(shard["trades"], first, len(exit_bar)))
+            return {"trades": concat_columns([p for p in parts if len(p["pnl"])]), "position": shard["position"],
+                    "resimulated": bar - lo}
+    return {"trades": concat_columns([p for p in parts if len(p["pnl"])]), "position": strategy.open_position,
+            "resimulated": hi - lo}
+
+def replay_shards(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Equity and risk metrics of the merged trades (plus the forced close of task["open_position"])
+    as a serial run finds them, fed in the same slices; returns them with the forced close.
+    """
+    payload, trades, last_open = task["payload"], task["trades"], task["open_position"]
+    df = _load(payload)
+    strategy = backtest_strategy(payload)
+    ts = epoch_ns(df.index)
+    entry_bar = np.searchsorted(ts, trades["entry_ts"])
+    exit_bar = np.searchsorted(ts, trades["exit_ts"])
+    lo = 0
+    for chunk in row_slices(df, settings.STREAM_CHUNK_ROWS):
+        hi = lo + len(chunk)
+        a, b = np.searchsorted(exit_bar, [lo, hi])
+        strategy.replay(chunk, slice_columns(trades, a, b), _open_after(hi, trades, entry_bar, exit_bar, last_open))
+        job_control.advance(len(chunk))
+        lo = hi
+    return {"final": strategy.finish(), "metrics": strategy.metrics(payload.get("timeframe", "1m")),
+            "equity": strategy.equity.curve()}
+
+RunTasks = Callable[[Callable[[Dict[str, Any]], Any], List[Dict[str, Any]]], Awaitable[List[Any]]]
+
+async def _run_sharded(payload: Dict[str, Any], run_tasks: RunTasks, parts: int) -> Dict[str, Any]:
+    shards = int(payload.get("shards") or parts)
+    (n,) = await run_tasks(count_bars, [payload])
+    bounds = shard_bounds(n, shards, settings.SHARD_MIN_BARS)
+    if len(bounds) <= 2 or backtest_strategy(payload).plan.carried:
+        (result,) = await run_tasks(run_backtest_sync, [payload])
+        return result
+
+    job_control.add_total(n)
+    runs = await run_tasks(simulate_shard, [{"payload": payload, "bounds": [lo, hi]}
+                                            for lo, hi in zip(bounds, bounds[1:])])
+    trades = [runs[0]["trades"]]
+    position = runs[0]["position"]
+    resimulated = 0
+    for lo, hi, shard in zip(bounds[1:], bounds[2:], runs[1:]):
+        if position is not None:
+            # the shard was run flat but a position is carried into it
+            job_control.add_total(hi - lo)
+            (shard,) = await run_tasks(reconcile_shard, [{"payload": payload, "bounds": [lo, hi], "shard": shard,
+                                                          "open_position": position}])
+            job_control.advance(hi - lo - shard["resimulated"])
+            resimulated += shard["resimulated"]
+        trades.append(shard["trades"])
+        position = shard["position"]
+    merged = concat_columns([t for t in trades if len(t["pnl"])])
+
+    job_control.add_total(n)
+    (replay,) = await run_tasks(replay_shards, [{"payload": payload, "trades": merged, "open_position": position}])
+    if len(replay["final"]["pnl"]):
+        merged = concat_columns([merged, replay["final"]])
+    metrics = compute_metrics_from_pnl(merged["pnl"])
+    metrics.update(replay["metrics"])
+    return {"trades": merged, "metrics": metrics, "equity": replay["equity"],
+            "shards": {"count": len(bounds) - 1, "resimulated_bars": resimulated}}
+
+async def run_sharded_backtest(payload: Dict[str, Any], executor: Optional[Executor] = None,
+                               job_id: Optional[int] = None):
+    """
+    A backtest with its shards spread over the pool processes of executor. Returns (result,
+    stats) like instrument.run_recorded.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    parts: List[Dict[str, Any]] = []
+    control = job_control.current()
+
+    async def pooled(fn, tasks):
+        base = len(parts)
+        runs = await asyncio.gather(*(
+            loop.run_in_executor(executor, run_recorded, fn, t, f"job_{job_id}_{base + i}_{fn.__name__}", control)
+            for i, t in enumerate(tasks)))
+        parts.extend(s for _, s in runs)
+        return [r for r, _ in runs]
+
+    result = await _run_sharded(payload, pooled, settings.WORKER_CONCURRENCY or os.cpu_count() or 1)
+    stats = merge_stats(parts)
+    # the tasks' stage times are summed over processes; run is the job's wall time
+    stats["timings"]["run"] = time.perf_counter() - start
+    return result, stats
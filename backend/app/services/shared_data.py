@@ -0,0 +1,180 @@
+"""
+OHLCV datasets shared by the worker's pool processes.
+
+The worker publishes each dataset a job needs once, in the columnar store's layout (one .npy
+file per column), to its own directory under SHARED_DATA_DIR (tmpfs such as /dev/shm when
+there is one). Pool processes map those files read-only, so they all read the same physical
+pages and a load is a lookup instead of a parse. Published datasets are reference counted by
+the jobs running on them; one nobody uses is deleted once its source file changes or the
+store is over SHARED_DATA_MAX_BYTES. A process still mapping a deleted dataset keeps a valid
+(unlinked) mapping until its next lookup of that dataset drops it.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import pandas as pd
+from app.services.datastore import META_FILE, map_columnar, write_columnar
+from app.services.resample import resolve_dataset
+
+_DIR_PREFIX = "backtester-"
+
+def dataset_dir(root: str, symbol: str, timeframe: str, version: Any) -> str:
+    # one directory per dataset version, so a changed source is published beside the old one
+    digest = hashlib.sha256(json.dumps([symbol, timeframe, version], default=str).encode()).hexdigest()[:16]
+    return os.path.join(root, f"{symbol}_{timeframe}-{digest}")
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SharedDatasetStore:
+    """The worker's side: publishes datasets for its pool and deletes them when unused."""
+
+    def __init__(self, base_dir: Optional[str] = None, max_bytes: int = 0):
+        base_dir = base_dir or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+        # left behind by workers that died without cleaning up
+        for stale in glob.glob(os.path.join(base_dir, f"{_DIR_PREFIX}*")):
+            pid = stale.rsplit("-", 1)[-1]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                shutil.rmtree(stale, ignore_errors=True)
+        self.root = os.path.join(base_dir, f"{_DIR_PREFIX}{os.getpid()}")
+        os.makedirs(self.root, exist_ok=True)
+        self.max_bytes = max_bytes
+        # path -> {"key", "bytes", "refs"}, least recently acquired first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._current: Dict[Hashable, str] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, symbol: str, timeframe: str) -> Optional[str]:
+        """
+        Publish symbol/timeframe if needed and take a reference on it. Returns its directory,
+        or None when it isn't shared (unknown dataset, or larger than the whole budget).
+        Blocking: run it off the event loop.
+        """
+        resolved = resolve_dataset(symbol, timeframe)
+        if resolved is None:
+            return None
+        source_tf, version = resolved
+        path = dataset_dir(self.root, symbol, timeframe, version)
+        # publishing holds the lock so concurrent jobs on one dataset write it once
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                size = version[2] if source_tf == timeframe else version[2][2]
+                if size > self.max_bytes:
+                    return None
+                entry = {"key": (symbol, timeframe), "bytes": self._publish(symbol, timeframe, source_tf, path), "refs": 0}
+                self._entries[path] = entry
+                self._bytes += entry["bytes"]
+            self._current[entry["key"]] = path
+            entry["refs"] += 1
+            self._entries.move_to_end(path)
+            self._evict()
+        return path
+
+    def release(self, path: str):
+        with self._lock:
+            self._entries[path]["refs"] -= 1
+            self._evict()
+
+    def acquire_many(self, datasets: List[Tuple[str, str]]) -> List[str]:
+        paths: List[str] = []
+        try:
+            for symbol, timeframe in datasets:
+                path = self.acquire(symbol, timeframe)
+                if path is not None:
+                    paths.append(path)
+        except Exception:
+            self.release_many(paths)
+            raise
+        return paths
+
+    def release_many(self, paths: List[str]):
+        for p in paths:
+            self.release(p)
+
+    def _publish(self, symbol: str, timeframe: str, source_tf: str, path: str) -> int:
+        # imported here: the simulator imports this module
+        from app.services.simulator import load_full_dataset
+        write_columnar(load_full_dataset(symbol, timeframe, source_tf), path, symbol=symbol, timeframe=timeframe)
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+    def _evict(self):
+        for path, entry in list(self._entries.items()):
+            if entry["refs"] > 0:
+                continue
+            stale = self._current.get(entry["key"]) != path
+            if stale or self._bytes > self.max_bytes:
+                shutil.rmtree(path, ignore_errors=True)
+                self._bytes -= entry["bytes"]
+                del self._entries[path]
+                if not stale:
+                    del self._current[entry["key"]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_use": sum(1 for e in self._entries.values() if e["refs"] > 0),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._entries.clear()
+            self._current.clear()
+            self._bytes = 0
+        shutil.rmtree(self.root, ignore_errors=True)
+
+# pool process side: the store's directory (None outside a worker pool) and the datasets mapped so far
+_root: Optional[str] = None
+_mapped: Dict[Hashable, Tuple[str, pd.DataFrame]] = {}
+_mapped_lock = threading.Lock()
+
+def init_process(root: Optional[str]):
+    """Pool initializer: remember the store and pay the import cost before the first job."""
+    global _root
+    _root = root
+    # the job runners' modules (numpy, pandas and the simulator with them)
+    import app.services.sweep
+    import app.services.portfolio
+    import app.services.walkforward
+
+def warm_up(_: Any = None) -> int:
+    return os.getpid()
+
+def mapped_frame(symbol: str, timeframe: str, version: Any) -> Optional[pd.DataFrame]:
+    """The published dataset as a read-only frame over the shared files, or None if it isn't published."""
+    if _root is None:
+        return None
+    key = (symbol, timeframe)
+    path = dataset_dir(_root, symbol, timeframe, version)
+    published = os.path.exists(os.path.join(path, META_FILE))
+    with _mapped_lock:
+        hit = _mapped.get(key)
+        if hit is not None and hit[0] == path and published:
+            return hit[1]
+        # a different version or deleted: let go of the old mapping
+        _mapped.pop(key, None)
+        if not published:
+            return None
+        try:
+            df = map_columnar(path)
+        except FileNotFoundError:
+            # deleted between the check and the mapping
+            return None
+        _mapped[key] = (path, df)
+        return df
@@ -1,8 +1,22 @@
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
 import os
 import asyncio
+from app.core.config import settings
+from app.services.datastore import load_columnar, iter_columnar, iter_csv, time_bounds
+from app.services.resample import resolve_dataset, resample_ohlcv, timeframe_to_ns
+from app.services.dataset_cache import DatasetCache
+from app.services.shared_data import mapped_frame
+from app.services.trade_store import (
+    trade_columns, trades_from_columns, columns_from_trades, concat_columns, empty_columns, epoch_ns, reason_codes,
+)
+from app.services.equity import EquityAccumulator, bars_per_year, holding_mask
+from app.services.checkpoint import encode_checkpoint, decode_checkpoint
+from app.services.indicators import SMA_BLOCK, rolling_mean, memoized, indicator_cache
+from app.services.strategy_graph import Plan, get_plan, sma_crossover_plan, sma_key
+from app.services import instrument, job_control
 
 @dataclass
 class Trade:
@@ -30,6 +44,153 @@ def load_ohlcv_from_csv(symbol: str, timeframe: str, start: str, end: str) -> pd
         df = df.loc[:end]
     return df
 
+# full datasets shared by every job in this process, keyed by (symbol, timeframe)
+dataset_cache = DatasetCache(settings.DATASET_CACHE_MAX_BYTES)
+
+def _load_uncached(symbol: str, timeframe: str, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+    # columnar store first (reads only the requested window), CSV as fallback
+    df = load_columnar(symbol, timeframe, start, end)
+    if df is None:
+        df = load_ohlcv_from_csv(symbol, timeframe, start, end)
+    return df
+
+def load_full_dataset(symbol: str, timeframe: str, source_tf: str) -> pd.DataFrame:
+    """The whole dataset, read (and resampled from source_tf if that differs) without caching."""
+    df = _load_uncached(symbol, source_tf, None, None)
+    return df if source_tf == timeframe else resample_ohlcv(df, timeframe)
+
+def _in_memory_dataset(symbol: str, timeframe: str, resolved: Tuple[str, Any]) -> Optional[pd.DataFrame]:
+    """The whole dataset as held in memory (loading it on a miss); None if it exceeds the cache budget."""
+    source_tf, version = resolved
+    # in a worker pool: the copy the worker published for all of its processes
+    shared = mapped_frame(symbol, timeframe, version)
+    if shared is not None:
+        return shared
+    if source_tf == timeframe:
+        loader = lambda: _load_uncached(symbol, timeframe, None, None)
+        size_hint = version[2]
+    else:
+        # aggregated from a finer stored timeframe; cached like any other dataset and
+        # invalidated through the base file's version
+        loader = lambda: resample_ohlcv(load_ohlcv(symbol, source_tf, None, None), timeframe)
+        size_hint = version[2][2] * timeframe_to_ns(source_tf) // timeframe_to_ns(timeframe)
+    return dataset_cache.get_or_load((symbol, timeframe), version, loader, size_hint=size_hint)
+
+def load_ohlcv(symbol: str, timeframe: str, start: str, end: str) -> pd.DataFrame:
+    resolved = resolve_dataset(symbol, timeframe)
+    if resolved is None:
+        # let the CSV loader raise its usual FileNotFoundError
+        return load_ohlcv_from_csv(symbol, timeframe, start, end)
+    source_tf = resolved[0]
+    df = _in_memory_dataset(symbol, timeframe, resolved)
+    if df is None:
+        # larger than the whole cache budget: read just the window
+        if source_tf == timeframe:
+            return _load_uncached(symbol, timeframe, start, end)
+        # plus the rest of the bucket holding `end`; a partial bucket before `start` is dropped,
+        # so the bars are those of the cached path
+        _, hi_ts = time_bounds(start, end)
+        until = str(hi_ts + pd.Timedelta(timeframe_to_ns(timeframe), "ns")) if hi_ts is not None else None
+        return resample_ohlcv(_load_uncached(symbol, source_tf, start, until), timeframe).loc[start or None:end or None]
+    # slicing a sorted index is a binary search and returns a view, not a copy
+    return df.loc[start or None:end or None]
+
+class RunIndicators:
+    """
+    Indicator arrays of runs that start on the same bar of an in-memory dataset. Each is
+    computed once over the rest of the dataset and memoized per (dataset, version, first
+    bar, indicator); indicators are causal, so a run of n bars takes the first n values,
+    exactly what it would compute itself, whatever its end.
+    """
+
+    def __init__(self, dataset: Tuple[str, str], version: Any, tail: pd.DataFrame):
+        self.scope = ((dataset, int(epoch_ns(tail.index[:1])[0])), version)
+        self.tail = tail
+
+    def columns(self, fields: Iterable[str]) -> Dict[str, np.ndarray]:
+        return {f: self.tail[f].to_numpy(dtype=float) for f in fields}
+
+    def memo(self, key: Any, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        return memoized(self.scope, key, compute)
+
+def run_indicators(symbol: str, timeframe: str, df: pd.DataFrame) -> Optional[RunIndicators]:
+    """
+    RunIndicators for a run over df, bars load_ohlcv served from the in-memory dataset; None
+    when df is not such a window or the arrays would not fit the indicator cache.
+    """
+    resolved = resolve_dataset(symbol, timeframe)
+    if resolved is None or not len(df):
+        return None
+    full = _in_memory_dataset(symbol, timeframe, resolved)
+    if full is None:
+        return None
+    first = int(full.index.searchsorted(df.index[0]))
+    last = first + len(df) - 1
+    if last >= len(full) or full.index[first] != df.index[0] or full.index[last] != df.index[-1]:
+        return None
+    if (len(full) - first) * 8 > indicator_cache.max_bytes:
+        return None
+    return RunIndicators((symbol, timeframe), resolved[1], full.iloc[first:])
+
+def run_sma(close: np.ndarray, window: int, indicators: Optional[RunIndicators] = None) -> np.ndarray:
+    """rolling_mean(close, window), taken from the run's memoized arrays when it has them."""
+    if indicators is None:
+        return rolling_mean(close, window)
+    full = indicators.memo(sma_key(window), lambda: rolling_mean(indicators.columns(["close"])["close"], window))
+    return full[:len(close)]
+
+def _iter_stored(symbol: str, timeframe: str, start: Optional[str], end: Optional[str],
+                 chunk_rows: int) -> Iterator[pd.DataFrame]:
+    chunks = iter_columnar(symbol, timeframe, start, end, chunk_rows)
+    if chunks is None:
+        chunks = iter_csv(symbol, timeframe, start, end, chunk_rows)
+    if chunks is None:
+        raise FileNotFoundError(f"Historical data not found: {symbol}_{timeframe}")
+    return chunks
+
+def _iter_resampled(chunks: Iterable[pd.DataFrame], timeframe: str, start: Optional[str],
+                    end: Optional[str]) -> Iterator[pd.DataFrame]:
+    # the last bucket of a chunk may continue in the next one, so it is held back until then;
+    # buckets are kept by label like load_ohlcv's .loc[start:end] on the resampled frame
+    period = timeframe_to_ns(timeframe)
+    lo_ts, hi_ts = time_bounds(start, end)
+    pending = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        bucket = epoch_ns(chunk.index) // period
+        cut = int(np.searchsorted(bucket, bucket[-1]))
+        pending = chunk.iloc[cut:]
+        bars = resample_ohlcv(chunk.iloc[:cut], timeframe)
+        bars = bars.loc[lo_ts:hi_ts] if len(bars) else bars
+        if len(bars):
+            yield bars
+        if hi_ts is not None and len(pending) and pending.index[0] > _as_index_tz(hi_ts, chunk.index):
+            return
+    if pending is not None and len(pending):
+        bars = resample_ohlcv(pending, timeframe).loc[lo_ts:hi_ts]
+        if len(bars):
+            yield bars
+
+def _as_index_tz(ts: pd.Timestamp, index: pd.DatetimeIndex) -> pd.Timestamp:
+    return ts.tz_localize(index.tz) if index.tz is not None and ts.tzinfo is None else ts
+
+def iter_ohlcv_chunks(symbol: str, timeframe: str, start: Optional[str], end: Optional[str],
+                      chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    The bars load_ohlcv would return, as consecutive frames of about chunk_rows source rows,
+    read from the columnar store or the CSV without holding the whole range in memory.
+    """
+    chunk_rows = chunk_rows or settings.STREAM_CHUNK_ROWS
+    resolved = resolve_dataset(symbol, timeframe)
+    if resolved is None:
+        raise FileNotFoundError(f"Historical data not found: {symbol}_{timeframe}")
+    source_tf = resolved[0]
+    if source_tf == timeframe:
+        return _iter_stored(symbol, timeframe, start, end, chunk_rows)
+    # read the base open-ended: the bucket holding `end` may extend past it
+    return _iter_resampled(_iter_stored(symbol, source_tf, start, None, chunk_rows), timeframe, start, end)
+
 def run_sma_crossover(
     df: pd.DataFrame,
     fast: int = 20,
@@ -37,13 +198,51 @@ def run_sma_crossover(
     force_close: bool = True,
     sl_pct: Optional[float] = None,
     tp_pct: Optional[float] = None,
+    engine: str = "vectorized",
+    indicators: Optional[RunIndicators] = None,
 ):
     """
     Simple SMA crossover with optional percent-based stop-loss and take-profit.
     sl_pct/tp_pct are fractional (e.g. 0.03 for 3%).
     Exits are checked on each bar's close price.
+    engine="vectorized" resolves entries/exits with array operations (SMAs from indicators
+    when given, see run_indicators), engine="loop" is the bar-by-bar reference implementation.
     """
+    if engine == "vectorized":
+        return trades_from_columns(_run_sma_crossover_vectorized(df, fast, slow, force_close, sl_pct, tp_pct, indicators))
+    if engine == "loop":
+        return _run_sma_crossover_loop(df, fast, slow, force_close, sl_pct, tp_pct)
+    raise ValueError(f"Unknown engine: {engine}")
+
+def run_sma_crossover_columns(
+    df: pd.DataFrame,
+    fast: int = 20,
+    slow: int = 50,
+    force_close: bool = True,
+    sl_pct: Optional[float] = None,
+    tp_pct: Optional[float] = None,
+    engine: str = "vectorized",
+    indicators: Optional[RunIndicators] = None,
+) -> Dict[str, np.ndarray]:
+    """Same as run_sma_crossover, but returns trades as parallel arrays (see trade_store)."""
+    if engine == "vectorized":
+        return _run_sma_crossover_vectorized(df, fast, slow, force_close, sl_pct, tp_pct, indicators)
+    return columns_from_trades(run_sma_crossover(df, fast, slow, force_close, sl_pct, tp_pct, engine=engine))
+
+# bars the loop engine simulates between two progress reports
+_LOOP_PROGRESS_BARS = 10000
+
+def _run_sma_crossover_loop(
+    df: pd.DataFrame,
+    fast: int,
+    slow: int,
+    force_close: bool,
+    sl_pct: Optional[float],
+    tp_pct: Optional[float],
+):
     df = df.copy()
+    # pandas' own rolling means, independent of indicators.rolling; the blocked kernel equals
+    # them bit for bit over the first SMA_BLOCK bars, so the engines' trades can be compared
     df["sma_fast"] = df["close"].rolling(window=fast, min_periods=1).mean()
     df["sma_slow"] = df["close"].rolling(window=slow, min_periods=1).mean()
 
@@ -52,7 +251,11 @@ def run_sma_crossover(
     entry_time = None
     trades = []
 
-    for t, row in df.iterrows():
+    reported = 0
+    for i, (t, row) in enumerate(df.iterrows()):
+        if i - reported >= _LOOP_PROGRESS_BARS:
+            job_control.advance(i - reported)
+            reported = i
         price = float(row["close"])
 
         # entry signal
@@ -107,6 +310,8 @@ def run_sma_crossover(
                 entry_time = None
                 continue
 
+    job_control.advance(len(df) - reported)
+
     # Force-close any open position at the last available bar's close if requested
     if force_close and position == 1 and entry_price is not None:
         last_idx = df.index[-1]
@@ -118,6 +323,343 @@ def run_sma_crossover(
                             qty=1, pnl=pnl, exit_reason="force_close").__dict__)
     return trades
 
+# first TP/SL scan window; doubled on every miss so long holds stay O(n)
+_BARRIER_SCAN_STEP = 256
+
+def _first_barrier_hit(
+    close: np.ndarray,
+    lo: int,
+    hi: int,
+    entry_price: float,
+    sl_pct: Optional[float],
+    tp_pct: Optional[float],
+) -> Tuple[Optional[int], Optional[str]]:
+    """Return (index, reason) of the first bar in [lo, hi) that hits TP or SL."""
+    step = _BARRIER_SCAN_STEP
+    while lo < hi:
+        stop = min(hi, lo + step)
+        ret = (close[lo:stop] - entry_price) / entry_price
+        hit_tp = ret >= tp_pct if tp_pct is not None else np.zeros(len(ret), dtype=bool)
+        hit_sl = ret <= -abs(sl_pct) if sl_pct is not None else np.zeros(len(ret), dtype=bool)
+        hits = hit_tp | hit_sl
+        if hits.any():
+            h = int(np.argmax(hits))
+            # TP is checked before SL on the same bar
+            return lo + h, "tp" if hit_tp[h] else "sl"
+        lo = stop
+        step *= 2
+    return None, None
+
+def signal_segment(
+    close: np.ndarray,
+    enter: np.ndarray,
+    exit: np.ndarray,
+    sl_pct: Optional[float] = None,
+    tp_pct: Optional[float] = None,
+    open_entry_price: Optional[float] = None,
+    exit_reason: str = "sma_cross",
+):
+    """
+    Array core of the vectorized engine over one run of bars.
+    Only one position is held at a time, so trades are resolved segment by segment:
+    the next entry is found by binary search over the bars where `enter` holds, the
+    next signal exit by binary search over bars where `exit` holds, and TP/SL are
+    evaluated on the price segment in between.
+
+    open_entry_price carries in a position opened before close[0]; its trade reports
+    entry index -1. Returns (entries, exits, reasons, open_position) where open_position
+    is (entry index, entry price) of a position still open after the last bar, or None.
+    """
+    n = len(close)
+    entry_candidates = np.flatnonzero(enter)
+    cross_candidates = np.flatnonzero(exit)
+    use_barriers = sl_pct is not None or tp_pct is not None
+
+    entries, exits, reasons = [], [], []
+    i = 0
+    carried = open_entry_price is not None
+    while i < n or carried:
+        if carried:
+            j, entry_price = -1, float(open_entry_price)
+            carried = False
+        else:
+            p = np.searchsorted(entry_candidates, i)
+            if p == len(entry_candidates):
+                break
+            j = int(entry_candidates[p])
+            entry_price = float(close[j])
+
+        # exits are only evaluated from the bar after entry
+        q = np.searchsorted(cross_candidates, j + 1)
+        k_cross = int(cross_candidates[q]) if q < len(cross_candidates) else None
+
+        k, reason = None, None
+        if use_barriers:
+            # TP/SL take precedence over the cross-down on the same bar
+            hi = k_cross + 1 if k_cross is not None else n
+            k, reason = _first_barrier_hit(close, j + 1, hi, entry_price, sl_pct, tp_pct)
+        if k is None and k_cross is not None:
+            k, reason = k_cross, exit_reason
+        if k is None:
+            return entries, exits, reasons, (j, entry_price)
+
+        entries.append(j)
+        exits.append(k)
+        reasons.append(reason)
+        i = k + 1
+
+    return entries, exits, reasons, None
+
+def crossover_segment(
+    close: np.ndarray,
+    sma_fast: np.ndarray,
+    sma_slow: np.ndarray,
+    sl_pct: Optional[float] = None,
+    tp_pct: Optional[float] = None,
+    open_entry_price: Optional[float] = None,
+):
+    """signal_segment for the SMA crossover: in while fast > slow, out once fast < slow."""
+    return signal_segment(close, sma_fast > sma_slow, sma_fast < sma_slow, sl_pct, tp_pct, open_entry_price)
+
+def simulate_crossover_arrays(
+    close: np.ndarray,
+    sma_fast: np.ndarray,
+    sma_slow: np.ndarray,
+    force_close: bool = True,
+    sl_pct: Optional[float] = None,
+    tp_pct: Optional[float] = None,
+):
+    """Returns (entry_idx, exit_idx, exit_reasons) for the trades the loop engine would produce."""
+    entries, exits, reasons, open_position = crossover_segment(close, sma_fast, sma_slow, sl_pct, tp_pct)
+    if open_position is not None and force_close:
+        entries.append(open_position[0])
+        exits.append(len(close) - 1)
+        reasons.append("force_close")
+    return np.asarray(entries, dtype=np.int64), np.asarray(exits, dtype=np.int64), reasons
+
+def _run_sma_crossover_vectorized(
+    df: pd.DataFrame,
+    fast: int,
+    slow: int,
+    force_close: bool,
+    sl_pct: Optional[float],
+    tp_pct: Optional[float],
+    indicators: Optional[RunIndicators] = None,
+):
+    close = df["close"].to_numpy(dtype=float)
+    sma_fast = run_sma(close, fast, indicators)
+    sma_slow = run_sma(close, slow, indicators)
+
+    entry_idx, exit_idx, reasons = simulate_crossover_arrays(
+        close, sma_fast, sma_slow, force_close=force_close, sl_pct=sl_pct, tp_pct=tp_pct)
+
+    return trade_columns(df.index, close, entry_idx, exit_idx, reasons)
+
+class StreamingStrategy:
+    """
+    The vectorized engine fed bar chunk by bar chunk: entries and exits come from a compiled
+    Plan (the built-in SMA crossover or a strategy graph). Between chunks it keeps only the
+    prices the plan still needs (under SMA_BLOCK + lookback bars), the open position and an
+    EquityAccumulator, so memory stays flat however many bars are streamed through.
+    Feeding all bars in one chunk or in many gives the same trades and metrics.
+    """
+
+    def __init__(self, plan: Plan, force_close: bool = True, sl_pct: Optional[float] = None,
+                 tp_pct: Optional[float] = None, equity_points: int = 500):
+        self.plan = plan
+        self.force_close = force_close
+        self.sl_pct, self.tp_pct = sl_pct, tp_pct
+        self.bars = 0
+        # price columns of global bars [history_start, bars)
+        self.history = {f: np.empty(0) for f in plan.fields}
+        self.history.update({plan.carry_key(i): np.empty(0) for i in plan.carried})
+        self.history_start = 0
+        # (global entry bar, entry epoch ns, entry price) of a position still open
+        self.open_position: Optional[Tuple[int, int, float]] = None
+        self.last_ts: Optional[int] = None
+        self.last_close: Optional[float] = None
+        self.tz: Optional[str] = None
+        self.bar_ns: Optional[int] = None
+        # trades closed so far by feed(); finish()'s forced close is not included
+        self.closed_count = 0
+        self.closed_wins = 0
+        self.closed_pnl = 0.0
+        self.equity = EquityAccumulator(equity_points)
+        # memoized indicator arrays of this run, see run_indicators
+        self.indicators: Optional[RunIndicators] = None
+        self._run_outputs: Optional[Dict[int, np.ndarray]] = None
+
+    def state(self) -> Dict[str, Any]:
+        """Snapshot to continue from later with from_state (see app.services.checkpoint)."""
+        state = {k: v for k, v in self.__dict__.items() if k not in ("plan", "equity", "indicators", "_run_outputs")}
+        state["equity"] = self.equity.state()
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], plan: Plan) -> "StreamingStrategy":
+        """Continue a snapshot; plan must be the one the snapshot was taken with."""
+        strategy = cls.__new__(cls)
+        strategy.__dict__.update({k: v for k, v in state.items() if k != "equity"})
+        strategy.plan = plan
+        strategy.indicators = strategy._run_outputs = None
+        if strategy.open_position is not None:
+            strategy.open_position = tuple(strategy.open_position)
+        strategy.equity = EquityAccumulator.from_state(state["equity"])
+        return strategy
+
+    def _columns(self, entry_ts, exit_ts, entry_price, exit_price, reasons) -> Dict[str, np.ndarray]:
+        cols = {
+            "entry_ts": np.asarray(entry_ts, dtype=np.int64),
+            "exit_ts": np.asarray(exit_ts, dtype=np.int64),
+            "entry_price": np.asarray(entry_price, dtype=np.float64),
+            "exit_price": np.asarray(exit_price, dtype=np.float64),
+            "qty": np.ones(len(reasons)),
+            "pnl": np.asarray(exit_price, dtype=np.float64) - np.asarray(entry_price, dtype=np.float64),
+            "exit_reason": reason_codes(reasons),
+        }
+        if self.tz:
+            cols["tz"] = self.tz
+        return cols
+
+    def warm_start(self, df: pd.DataFrame, start: int):
+        """
+        Continue flat at bar `start` of df, as if its bars before that had been fed: only the
+        plan's history window of them is read. Plans with carried (ema) steps depend on every
+        earlier bar and can't be started this way.
+        """
+        if self.plan.carried:
+            raise ValueError("A plan with carried steps can only be run from its first bar")
+        self.bars = self.history_start = start
+        if start:
+            self.history_start = self.plan.history_start(start)
+            self.history = {f: df[f].to_numpy(dtype=float)[self.history_start:start].copy() for f in self.plan.fields}
+        return self
+
+    def feed(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Advance over the next bars; returns the trades closed within them."""
+        n = len(df)
+        if n == 0:
+            return empty_columns()
+        close = df["close"].to_numpy(dtype=float)
+        ts = self._clock(df)
+
+        values = dict(self.history)
+        values.update({f: np.concatenate((self.history[f], df[f].to_numpy(dtype=float))) for f in self.plan.fields})
+        with instrument.stage("indicators"):
+            if self.indicators is not None and self._run_outputs is None:
+                self._run_outputs = self.plan.run_outputs(self.indicators.columns(self.plan.fields), self.indicators.memo)
+            enter, exit, carry = self.plan.signals(values, self.history_start, self.bars, self._run_outputs)
+        for key, outputs in carry.items():
+            values[key] = np.concatenate((values[key], outputs))
+        carried = self.open_position
+        with instrument.stage("simulate"):
+            entries, exits, reasons, still_open = signal_segment(
+                close, enter, exit, self.sl_pct, self.tp_pct,
+                open_entry_price=carried[2] if carried else None, exit_reason=self.plan.exit_reason)
+            entries = np.asarray(entries, dtype=np.int64)
+            exits = np.asarray(exits, dtype=np.int64)
+
+            # entry -1 is the position carried in from an earlier chunk
+            from_here = entries >= 0
+            local = np.maximum(entries, 0)
+            entry_ts = np.where(from_here, ts[local], carried[1] if carried else 0)
+            entry_price = np.where(from_here, close[local], carried[2] if carried else 0.0)
+            entry_bar = np.where(from_here, self.bars + entries, carried[0] if carried else 0)
+            cols = self._columns(entry_ts, ts[exits], entry_price, close[exits], reasons)
+
+        open_position = None
+        if still_open is not None:
+            j, price = still_open
+            open_position = carried if j < 0 else (self.bars + j, int(ts[j]), float(price))
+        self._book(ts, close, entry_bar, self.bars + exits, cols["pnl"], open_position)
+        instrument.count("bars", n)
+
+        keep_from = self.plan.history_start(self.bars)
+        self.history = {f: v[keep_from - self.history_start:].copy() for f, v in values.items()}
+        self.history_start = keep_from
+        job_control.advance(n)
+        return cols
+
+    def replay(self, df: pd.DataFrame, trades: Dict[str, np.ndarray], open_position: Optional[Tuple[int, int, float]]):
+        """
+        Account for the next bars without simulating them, given what feed() would have found:
+        the trades closed within them and the position open after them. Bars are assumed to
+        have unique timestamps. Replaying a run's trades over the chunks it was fed in gives its
+        equity and metrics to the last bit; indicator history is not kept.
+        """
+        n = len(df)
+        if n == 0:
+            return
+        ts = self._clock(df)
+        entry_bar = self.bars + np.searchsorted(ts, trades["entry_ts"])
+        # at most one trade entered before this chunk: the position open until now
+        if self.open_position is not None:
+            entry_bar[trades["entry_ts"] < ts[0]] = self.open_position[0]
+        exit_bar = self.bars + np.searchsorted(ts, trades["exit_ts"])
+        self._book(ts, df["close"].to_numpy(dtype=float), entry_bar, exit_bar, trades["pnl"], open_position)
+
+    def _clock(self, df: pd.DataFrame) -> np.ndarray:
+        ts = epoch_ns(df.index)
+        if df.index.tz is not None:
+            self.tz = str(df.index.tz)
+        if self.bar_ns is None and len(ts) > 1:
+            self.bar_ns = int(np.median(np.diff(ts)))
+        return ts
+
+    def _book(self, ts: np.ndarray, close: np.ndarray, entry_bar: np.ndarray,
+              exit_bar: np.ndarray, pnl: np.ndarray, open_position: Optional[Tuple[int, int, float]]):
+        # equity and counters of the next len(ts) bars, in which trades (global bars) closed
+        n = len(ts)
+        held_entries = np.maximum(entry_bar - self.bars, -1)
+        held_exits = exit_bar - self.bars
+        if open_position is not None:
+            held_entries = np.append(held_entries, max(open_position[0] - self.bars, -1))
+            held_exits = np.append(held_exits, n)
+        self.open_position = open_position
+        with instrument.stage("metrics"):
+            self.equity.add_bars(ts, close, holding_mask(n, held_entries, held_exits))
+            self.equity.add_trades(entry_bar, exit_bar, pnl)
+        self.closed_count += len(pnl)
+        self.closed_wins += int((pnl > 0).sum())
+        self.closed_pnl += float(pnl.sum())
+        self.bars += n
+        self.last_ts, self.last_close = int(ts[-1]), float(close[-1])
+
+    def finish(self) -> Dict[str, np.ndarray]:
+        """Force-close a position still open after the last bar (if force_close)."""
+        if self.open_position is None or not self.force_close:
+            return empty_columns()
+        entry_bar, entry_ts, entry_price = self.open_position
+        self.open_position = None
+        cols = self._columns([entry_ts], [self.last_ts], [entry_price], [self.last_close], ["force_close"])
+        self.equity.add_trades(np.array([entry_bar]), np.array([self.bars - 1]), cols["pnl"])
+        return cols
+
+    def metrics(self, timeframe: Optional[str] = None) -> Dict[str, Any]:
+        bar_ns = (timeframe_to_ns(timeframe) if timeframe else None) or self.bar_ns
+        return self.equity.metrics(bars_per_year(pd.DatetimeIndex([]), bar_ns))
+
+def bar_slices(df: pd.DataFrame) -> List[pd.DataFrame]:
+    """
+    df as consecutive views of STREAM_CHUNK_ROWS bars, announced as the job's work: feeding
+    them one by one gives the same result as feeding df, with progress reported in between.
+    """
+    job_control.add_total(len(df))
+    return row_slices(df, settings.STREAM_CHUNK_ROWS)
+
+def row_slices(df: pd.DataFrame, step: int) -> List[pd.DataFrame]:
+    return [df.iloc[i:i + step] for i in range(0, len(df), step)] or [df]
+
+def stream_trades(strategy: StreamingStrategy, chunks: Iterable[pd.DataFrame]) -> Iterator[Dict[str, np.ndarray]]:
+    """Yield each chunk's closed trades as soon as it is processed, then the force-closed one."""
+    for chunk in chunks:
+        cols = strategy.feed(chunk)
+        if len(cols["pnl"]):
+            yield cols
+    cols = strategy.finish()
+    if len(cols["pnl"]):
+        yield cols
+
 def compute_metrics(trades: list) -> Dict[str, Any]:
     total_pnl = sum(t["pnl"] for t in trades)
     wins = [t for t in trades if t["pnl"] > 0]
@@ -125,23 +667,141 @@ def compute_metrics(trades: list) -> Dict[str, Any]:
     avg_pnl = total_pnl / len(trades) if trades else None
     return {"total_pnl": total_pnl, "trades_count": len(trades), "win_rate": win_rate, "avg_pnl": avg_pnl}
 
+def compute_metrics_from_pnl(pnl: np.ndarray) -> Dict[str, Any]:
+    # compute_metrics over a pnl array instead of trade dicts
+    count = len(pnl)
+    total = float(pnl.sum()) if count else 0
+    return {
+        "total_pnl": total,
+        "trades_count": count,
+        "win_rate": float((pnl > 0).sum()) / count if count else None,
+        "avg_pnl": total / count if count else None,
+    }
+
+def compute_equity_metrics(df: pd.DataFrame, trades: Dict[str, np.ndarray], timeframe: Optional[str] = None):
+    """Bar-level equity and risk metrics for columnar trades over df. Returns (metrics, downsampled curve)."""
+    ts = epoch_ns(df.index)
+    entry_idx = np.searchsorted(ts, trades["entry_ts"])
+    exit_idx = np.searchsorted(ts, trades["exit_ts"])
+    acc = EquityAccumulator(settings.EQUITY_CURVE_POINTS)
+    acc.add_bars(ts, df["close"].to_numpy(dtype=float), holding_mask(len(ts), entry_idx, exit_idx))
+    acc.add_trades(entry_idx, exit_idx, trades["pnl"])
+    ppy = bars_per_year(df.index, timeframe_to_ns(timeframe) if timeframe else None)
+    return acc.metrics(ppy), acc.curve()
+
+def strategy_plan(strategy: Optional[Dict[str, Any]]) -> Optional[Plan]:
+    """
+    Compiled plan of the job's strategy graph ({"id", "version", "graph"}, attached by the
+    worker). None when there is none or it has no buy node: the payload's SMA params apply.
+    """
+    if not strategy:
+        return None
+    return get_plan(strategy["id"], strategy["version"], strategy["graph"])
+
+def backtest_strategy(payload: Dict[str, Any]) -> StreamingStrategy:
+    """A fresh engine for a backtest payload: its strategy graph, or the SMA crossover of its params."""
+    params = payload.get("params", {}) or {}
+    sl, tp = params.get("sl"), params.get("tp")
+    plan = strategy_plan(payload.get("strategy")) or sma_crossover_plan(int(params.get("fast", 20)), int(params.get("slow", 50)))
+    return StreamingStrategy(plan, bool(payload.get("force_close", True)), float(sl) if sl is not None else None,
+                             float(tp) if tp is not None else None, settings.EQUITY_CURVE_POINTS)
+
+def _feed_with_checkpoint(strategy: StreamingStrategy, chunks: Iterable[pd.DataFrame]):
+    """
+    Run chunks through strategy, snapshotting it just before the last bar. A resume
+    replays that bar, since it may still change (e.g. a resampled bucket still filling).
+    Returns (trade column parts, state, closed trades at the snapshot).
+    """
+    parts, pending = [], None
+    for chunk in chunks:
+        if pending is not None:
+            parts.append(strategy.feed(pending))
+        pending = chunk
+    state, kept = None, 0
+    if pending is not None and len(pending):
+        parts.append(strategy.feed(pending.iloc[:-1]))
+        state, kept = strategy.state(), strategy.closed_count
+        parts.append(strategy.feed(pending.iloc[-1:]))
+    parts.append(strategy.finish())
+    return parts, state, kept
+
+def run_backtest_sync(payload: Dict[str, Any]) -> Dict[str, Any]:
+    symbol = payload.get("symbol")
+    timeframe = payload.get("timeframe", "1m")
+    start = payload.get("start")
+    end = payload.get("end")
+    params = payload.get("params", {}) or {}
+    fast = int(params.get("fast", 20))
+    slow = int(params.get("slow", 50))
+    sl = params.get("sl", None)
+    tp = params.get("tp", None)
+    sl_pct = float(sl) if sl is not None else None
+    tp_pct = float(tp) if tp is not None else None
+    engine = params.get("engine", "vectorized")
+    force_close = bool(payload.get("force_close", True))
+    plan = strategy_plan(payload.get("strategy"))
+    if engine == "loop":
+        if plan is not None:
+            raise ValueError("The loop engine only runs the built-in SMA crossover")
+        with instrument.stage("load"):
+            df = load_ohlcv(symbol, timeframe, start, end)
+        job_control.add_total(len(df))
+        with instrument.stage("simulate"):
+            trades = run_sma_crossover_columns(df, fast=fast, slow=slow, force_close=force_close,
+                                               sl_pct=sl_pct, tp_pct=tp_pct, engine=engine)
+        instrument.count("bars", len(df))
+        with instrument.stage("metrics"):
+            metrics = compute_metrics_from_pnl(trades["pnl"])
+            risk, equity = compute_equity_metrics(df, trades, timeframe)
+        metrics.update(risk)
+        return {"trades": trades, "metrics": metrics, "equity": equity}
+
+    plan = plan or sma_crossover_plan(fast, slow)
+    resume = payload.get("checkpoint_state")
+    if resume is not None:
+        # continue a previous run: only bars from its checkpoint on are read
+        strategy = StreamingStrategy.from_state(decode_checkpoint(resume["data"]), plan)
+        start = pd.Timestamp(resume["last_ts"], tz="UTC") if strategy.tz else pd.Timestamp(resume["last_ts"])
+        prior = (strategy.closed_count, strategy.closed_wins, strategy.closed_pnl)
+    else:
+        strategy = backtest_strategy(payload)
+    if payload.get("streaming"):
+        # bounded memory: read and simulate the range chunk by chunk
+        chunks = instrument.timed_iter("load", iter_ohlcv_chunks(symbol, timeframe, start, end))
+    else:
+        with instrument.stage("load"):
+            df = load_ohlcv(symbol, timeframe, start, end)
+        if resume is None:
+            strategy.indicators = run_indicators(symbol, timeframe, df)
+        chunks = bar_slices(df)
+
+    result: Dict[str, Any] = {}
+    if payload.get("checkpoint") or resume is not None:
+        parts, state, kept = _feed_with_checkpoint(strategy, chunks)
+        if state is not None:
+            with instrument.stage("checkpoint"):
+                result["checkpoint"] = {"last_ts": strategy.last_ts, "data": encode_checkpoint(state)}
+        if resume is not None:
+            # the previous run's trades up to its checkpoint stay; later ones are recomputed
+            result["resume"] = {"job_id": resume["job_id"], "kept_trades": prior[0]}
+    else:
+        parts = list(stream_trades(strategy, chunks))
+    trades = concat_columns([p for p in parts if len(p["pnl"])])
+
+    if resume is None:
+        metrics = compute_metrics_from_pnl(trades["pnl"])
+    else:
+        count, wins, total = prior
+        pnl = trades["pnl"]
+        count += len(pnl)
+        total += float(pnl.sum())
+        wins += int((pnl > 0).sum())
+        metrics = {"total_pnl": total, "trades_count": count,
+                   "win_rate": wins / count if count else None, "avg_pnl": total / count if count else None}
+    metrics.update(strategy.metrics(timeframe))
+    result.update({"trades": trades, "metrics": metrics, "equity": strategy.equity.curve()})
+    return result
+
 async def run_backtest_simulation(payload: Dict[str, Any]) -> Dict[str, Any]:
-    def _run():
-        symbol = payload.get("symbol")
-        timeframe = payload.get("timeframe", "1m")
-        start = payload.get("start")
-        end = payload.get("end")
-        params = payload.get("params", {}) or {}
-        fast = int(params.get("fast", 20))
-        slow = int(params.get("slow", 50))
-        sl = params.get("sl", None)
-        tp = params.get("tp", None)
-        sl_pct = float(sl) if sl is not None else None
-        tp_pct = float(tp) if tp is not None else None
-        force_close = bool(payload.get("force_close", True))
-        df = load_ohlcv_from_csv(symbol, timeframe, start, end)
-        trades = run_sma_crossover(df, fast=fast, slow=slow, force_close=force_close, sl_pct=sl_pct, tp_pct=tp_pct)
-        metrics = compute_metrics(trades)
-        return {"trades": trades, "metrics": metrics}
-    result = await asyncio.to_thread(_run)
+    result = await asyncio.to_thread(run_backtest_sync, payload)
     return result
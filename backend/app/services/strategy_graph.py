@@ -0,0 +1,436 @@
+"""
+Strategy graphs compiled to vectorized execution plans.
+
+A saved React Flow graph (`{"nodes": [...], "edges": [...]}`) is compiled into a Plan: a flat,
+topologically ordered list of array operations. Identical subexpressions (the same
+indicator on the same input, the same comparison, ...) become one step, so each is computed
+once per run however many nodes reference it.
+
+Node types (node["data"]["nodeType"]) and their params (node["data"]["params"]):
+
+    start       ignored, as are its edges
+    price       field: open | high | low | close | volume (default close)
+    constant    value
+    indicator   kind: sma (default) | ema | rsi | min | max | bollinger | atr | vwap, window;
+                bollinger also band: upper | middle | lower and k (default 2);
+                input: one edge, default the close price (atr/vwap use the bar's prices)
+    compare     op: > < >= <= crosses_above crosses_below; inputs: two edges
+    logic       op: and | or | not
+    buy         entry condition; several inputs must all hold
+    sell        exit condition; several inputs must all hold
+
+Inputs are ordered by the edge's targetHandle ("a", "b", ...), then by edge order.
+A graph without compare/logic nodes (the editor's start/buy/sell/indicator graphs) states no
+condition and runs the payload's SMA crossover, as every graph did before graphs were compiled.
+A position is entered on a bar where the buy condition holds while flat, and exited on the
+first later bar where the sell condition holds (or on SL/TP, see simulator.signal_segment).
+"""
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import threading
+import numpy as np
+from app.services.indicators import (
+    rolling, rolling_history_start, ema, ema_alpha, wilder_alpha, diff,
+    rsi_from_averages, true_range, vwap_from_sums,
+)
+
+class GraphError(ValueError):
+    pass
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+_BOOL_OPS = ("cmp", "cross", "and", "or", "not")
+_COMPARE = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+# a < b is b > a: one canonical form so both spellings share a step
+_MIRRORED = {"<": ">", "<=": ">="}
+
+@dataclass(frozen=True)
+class Step:
+    op: str
+    args: Tuple[int, ...] = ()
+    param: Any = None
+
+# steps whose output at bar t also depends on the bar before (computed from need - 1)
+_LOOKBACK_ONE = ("cross", "diff", "prev")
+# indicator steps worth memoizing across jobs (the rest are cheap elementwise ops)
+_MEMOIZED = ("roll", "ema")
+
+class Plan:
+    """
+    Steps are in dependency order; entry/exit index the steps giving the boolean entry and
+    exit signals (exit None: positions only close on SL/TP/force close).
+
+    Windowed steps only need the bars before them that rolling() asks for. Recursive (ema)
+    steps need their own previous output, which the caller keeps next to the price history
+    under carry_key(i); signals() returns the new outputs to append to it.
+    """
+
+    def __init__(self, steps: List[Step], entry: int, exit: Optional[int], exit_reason: str = "signal"):
+        self.steps = steps
+        self.entry = entry
+        self.exit = exit
+        self.exit_reason = exit_reason
+        # price columns the steps read; close is always fed, the engine trades on it
+        self.fields = sorted({s.param for s in steps if s.op == "price"} | {"close"})
+        self.carried = [i for i, s in enumerate(steps) if s.op == "ema"]
+        # structural key of each step, independent of its position in this plan
+        self.keys: List[Tuple] = []
+        for step in steps:
+            self.keys.append((step.op, step.param, tuple(self.keys[a] for a in step.args)))
+
+    @staticmethod
+    def carry_key(i: int) -> str:
+        return f"#{i}"
+
+    def _needs(self, start: int) -> List[Optional[int]]:
+        # first bar each step must be computed from for exact outputs from `start` on
+        need: List[Optional[int]] = [None] * len(self.steps)
+        for i in (self.entry, self.exit):
+            if i is not None:
+                need[i] = start
+        for i in reversed(range(len(self.steps))):
+            if need[i] is None:
+                continue
+            step = self.steps[i]
+            if step.op == "roll":
+                req = rolling_history_start(need[i], step.param[1])
+            elif step.op in _LOOKBACK_ONE:
+                req = max(0, need[i] - 1)
+            else:
+                req = need[i]
+            for a in step.args:
+                need[a] = req if need[a] is None else min(need[a], req)
+        return need
+
+    def history_start(self, next_pos: int) -> int:
+        """Earliest bar whose prices (and carried outputs) are needed to continue at next_pos."""
+        need = self._needs(next_pos)
+        starts = [need[i] for i, s in enumerate(self.steps) if s.op == "price" and need[i] is not None]
+        starts += [max(0, need[i] - 1) for i in self.carried if need[i] is not None]
+        return min(starts, default=next_pos)
+
+    def signals(self, columns: Dict[str, np.ndarray], values_start: int, out_start: int,
+                run_outputs: Optional[Dict[int, np.ndarray]] = None):
+        """
+        Returns (entry, exit, carry): boolean signals for bars [out_start, end) and the new
+        outputs of carried steps over the same bars. columns hold the price fields of bars
+        [values_start, end) and carried outputs of bars [values_start, out_start), reaching
+        back to history_start(out_start). run_outputs (see run_outputs) supplies indicator
+        steps computed over the whole run instead.
+        """
+        end = values_start + len(columns["close"])
+        need = self._needs(out_start)
+        out: List[Optional[np.ndarray]] = [None] * len(self.steps)
+
+        def arg(a: int, start: int) -> np.ndarray:
+            return out[a][start - need[a]:]
+
+        for i, step in enumerate(self.steps):
+            lo = need[i]
+            if lo is None:
+                continue
+            if run_outputs is not None and i in run_outputs:
+                out[i] = run_outputs[i][lo:end]
+            else:
+                out[i] = self._apply(step, i, lo, end, arg, columns, values_start, need)
+        n = end - out_start
+        exit_signal = out[self.exit] if self.exit is not None else np.zeros(n, dtype=bool)
+        carry = {self.carry_key(i): out[i][out_start - need[i]:] for i in self.carried if need[i] is not None}
+        return out[self.entry], exit_signal, carry
+
+    def run_outputs(self, columns: Dict[str, np.ndarray],
+                    memo: Callable[[Hashable, Callable[[], np.ndarray]], np.ndarray]) -> Dict[int, np.ndarray]:
+        """
+        Outputs of the indicator steps over all bars of columns, a run from its first bar,
+        each through memo(key, compute) under its structural key. Every step is causal, so
+        the first n values are what signals() computes over the run's first n bars.
+        """
+        end = len(columns["close"])
+        need = [0] * len(self.steps)
+        out: Dict[int, np.ndarray] = {}
+
+        def value(i: int) -> np.ndarray:
+            if i not in out:
+                step = self.steps[i]
+                compute = lambda: self._apply(step, i, 0, end, arg, columns, 0, need)
+                out[i] = memo(self.keys[i], compute) if step.op in _MEMOIZED else compute()
+            return out[i]
+
+        def arg(a: int, start: int) -> np.ndarray:
+            return value(a)[start:]
+
+        return {i: value(i) for i, s in enumerate(self.steps) if s.op in _MEMOIZED}
+
+    def _apply(self, step: Step, i: int, lo: int, end: int, arg, columns, values_start: int, need) -> np.ndarray:
+        op, args = step.op, step.args
+        if op == "price":
+            if lo < values_start:
+                raise ValueError("Plan.signals needs prices from an earlier bar than provided")
+            return columns[step.param][lo - values_start:]
+        if op == "const":
+            return np.full(end - lo, step.param)
+        if op == "roll":
+            agg, window = step.param
+            return rolling(arg(args[0], need[args[0]]), window, agg, values_start=need[args[0]], out_start=lo)
+        if op == "ema":
+            initial = None
+            if lo > 0:
+                prev = columns[self.carry_key(i)]
+                if lo - 1 < values_start:
+                    raise ValueError("Plan.signals needs carried outputs from an earlier bar than provided")
+                initial = float(prev[lo - 1 - values_start])
+            return ema(arg(args[0], lo), step.param, initial)
+        if op in _LOOKBACK_ONE:
+            # the value one bar back is available unless lo is the series' first bar
+            prev = max(0, lo - 1)
+            xs = [arg(a, prev) for a in args]
+            if op == "diff":
+                res = diff(xs[0])
+            elif op == "prev":
+                res = np.concatenate(([np.nan], xs[0][:-1]))
+            else:
+                # a crosses above b on bar t: a > b on t, a <= b on t-1 (never on bar 0)
+                a, b = xs
+                now, before = (a > b, a <= b) if step.param == "above" else (a < b, a >= b)
+                res = now & np.concatenate(([False], before[:-1]))
+            return res[lo - prev:]
+        xs = [arg(a, lo) for a in args]
+        if op == "cmp":
+            return _COMPARE[step.param](xs[0], xs[1])
+        if op == "and":
+            return np.logical_and.reduce(xs)
+        if op == "or":
+            return np.logical_or.reduce(xs)
+        if op == "not":
+            return ~xs[0]
+        if op == "pos":
+            return np.maximum(xs[0], 0.0)
+        if op == "neg":
+            return np.maximum(-xs[0], 0.0)
+        if op == "rsi":
+            return rsi_from_averages(xs[0], xs[1])
+        if op == "tr":
+            return true_range(*xs)
+        if op == "lin":
+            return xs[0] + step.param * xs[1]
+        if op == "mul":
+            return xs[0] * xs[1]
+        if op == "typical":
+            return (xs[0] + xs[1] + xs[2]) / 3.0
+        if op == "vwap":
+            return vwap_from_sums(*xs)
+        raise ValueError(f"Unknown plan step: {op}")
+
+class PlanBuilder:
+    """Appends steps, returning the index of an identical existing step instead of a duplicate."""
+
+    def __init__(self):
+        self.steps: List[Step] = []
+        self._index: Dict[Step, int] = {}
+
+    def add(self, op: str, args: Tuple[int, ...] = (), param: Any = None) -> int:
+        if op in ("and", "or"):
+            args = tuple(sorted(set(args)))
+            if len(args) == 1:
+                return args[0]
+        step = Step(op, tuple(args), param)
+        if step not in self._index:
+            self._index[step] = len(self.steps)
+            self.steps.append(step)
+        return self._index[step]
+
+    def is_bool(self, i: int) -> bool:
+        return self.steps[i].op in _BOOL_OPS
+
+def sma_key(window: int) -> Tuple:
+    """Plan.keys entry of the SMA(window) of the close, as every plan and the sweep compute it."""
+    return ("roll", ("mean", window), (("price", "close", ()),))
+
+def sma_crossover_plan(fast: int, slow: int) -> Plan:
+    """The built-in strategy: long while SMA(fast) > SMA(slow), out when it drops below."""
+    b = PlanBuilder()
+    close = b.add("price", param="close")
+    sma_fast = b.add("roll", (close,), ("mean", fast))
+    sma_slow = b.add("roll", (close,), ("mean", slow))
+    return Plan(b.steps, b.add("cmp", (sma_fast, sma_slow), ">"), b.add("cmp", (sma_slow, sma_fast), ">"),
+                exit_reason="sma_cross")
+
+def _int_param(params: Dict[str, Any], name: str, node_id: str) -> int:
+    try:
+        value = int(float(params[name]))
+    except (KeyError, TypeError, ValueError):
+        raise GraphError(f"Node {node_id}: '{name}' must be a number")
+    if value < 1:
+        raise GraphError(f"Node {node_id}: '{name}' must be at least 1")
+    return value
+
+def _float_param(params: Dict[str, Any], name: str, default: float, node_id: str) -> float:
+    try:
+        return float(params.get(name, default))
+    except (TypeError, ValueError):
+        raise GraphError(f"Node {node_id}: '{name}' must be a number")
+
+def _lower_indicator(b: PlanBuilder, kind: str, src: int, params: Dict[str, Any], node_id: str) -> int:
+    """Add the steps of one indicator node; shared pieces (e.g. the SMA under Bollinger) dedupe."""
+    window = _int_param(params, "window", node_id)
+    if kind == "sma":
+        return b.add("roll", (src,), ("mean", window))
+    if kind in ("min", "max"):
+        return b.add("roll", (src,), (kind, window))
+    if kind == "ema":
+        return b.add("ema", (src,), ema_alpha(window))
+    if kind == "rsi":
+        change = b.add("diff", (src,))
+        alpha = wilder_alpha(window)
+        gain = b.add("ema", (b.add("pos", (change,)),), alpha)
+        loss = b.add("ema", (b.add("neg", (change,)),), alpha)
+        return b.add("rsi", (gain, loss))
+    if kind == "bollinger":
+        band = str(params.get("band", "middle")).lower()
+        mid = b.add("roll", (src,), ("mean", window))
+        if band == "middle":
+            return mid
+        if band not in ("upper", "lower"):
+            raise GraphError(f"Node {node_id}: band must be upper, middle or lower")
+        k = _float_param(params, "k", 2.0, node_id)
+        sd = b.add("roll", (src,), ("std", window))
+        return b.add("lin", (mid, sd), k if band == "upper" else -k)
+    # ATR and VWAP read the bar's own prices rather than an input edge
+    high, low = b.add("price", param="high"), b.add("price", param="low")
+    close = b.add("price", param="close")
+    if kind == "atr":
+        tr = b.add("tr", (high, low, b.add("prev", (close,))))
+        return b.add("ema", (tr,), wilder_alpha(window))
+    if kind == "vwap":
+        volume = b.add("price", param="volume")
+        typical = b.add("typical", (high, low, close))
+        pv = b.add("roll", (b.add("mul", (typical, volume)),), ("sum", window))
+        return b.add("vwap", (pv, b.add("roll", (volume,), ("sum", window)), typical))
+    raise GraphError(f"Node {node_id}: unknown indicator '{kind}'")
+
+def compile_graph(graph: Dict[str, Any]) -> Optional[Plan]:
+    """Compile a strategy graph; None if it has no buy node or no condition (run the SMA crossover)."""
+    nodes = {n["id"]: n for n in (graph or {}).get("nodes", []) if "id" in n}
+
+    def node_type(node_id: str) -> str:
+        return str(nodes[node_id].get("data", {}).get("nodeType", "")).lower()
+
+    inputs = defaultdict(list)
+    for order, e in enumerate((graph or {}).get("edges", [])):
+        if e.get("target") in nodes and e.get("source") in nodes and node_type(e["source"]) != "start":
+            inputs[e["target"]].append((e.get("targetHandle") or "", order, e["source"]))
+    for edges in inputs.values():
+        edges.sort()
+
+    buys = [i for i in nodes if node_type(i) == "buy"]
+    if not buys or not any(node_type(i) in ("compare", "logic") for i in nodes):
+        return None
+    sells = [i for i in nodes if node_type(i) == "sell"]
+
+    b = PlanBuilder()
+    built: Dict[str, int] = {}
+    visiting = set()
+
+    def sources(node_id: str) -> List[int]:
+        return [build(src) for _, _, src in inputs[node_id]]
+
+    def need_bool(i: int, node_id: str) -> int:
+        if not b.is_bool(i):
+            raise GraphError(f"Node {node_id} needs a condition (compare/logic node) as input")
+        return i
+
+    def need_number(i: int, node_id: str) -> int:
+        if b.is_bool(i):
+            raise GraphError(f"Node {node_id} needs a price, constant or indicator as input")
+        return i
+
+    def build(node_id: str) -> int:
+        if node_id in built:
+            return built[node_id]
+        if node_id in visiting:
+            raise GraphError(f"Strategy graph has a cycle through node {node_id}")
+        visiting.add(node_id)
+        data = nodes[node_id].get("data", {})
+        params = data.get("params") or {}
+        kind = node_type(node_id)
+        args = sources(node_id)
+
+        if kind == "price":
+            field = str(params.get("field", "close")).lower()
+            if field not in PRICE_FIELDS:
+                raise GraphError(f"Node {node_id}: unknown price field '{field}'")
+            i = b.add("price", param=field)
+        elif kind == "constant":
+            try:
+                i = b.add("const", param=float(params.get("value")))
+            except (TypeError, ValueError):
+                raise GraphError(f"Node {node_id}: 'value' must be a number")
+        elif kind == "indicator":
+            src = need_number(args[0], node_id) if args else b.add("price", param="close")
+            i = _lower_indicator(b, str(params.get("kind", "sma")).lower(), src, params, node_id)
+        elif kind == "compare":
+            op = str(params.get("op", ">"))
+            if len(args) != 2:
+                raise GraphError(f"Node {node_id}: compare needs exactly two inputs")
+            x, y = (need_number(a, node_id) for a in args)
+            if op in _MIRRORED:
+                op, x, y = _MIRRORED[op], y, x
+            if op in _COMPARE:
+                i = b.add("cmp", (x, y), op)
+            elif op in ("crosses_above", "crosses_below"):
+                i = b.add("cross", (x, y), op[len("crosses_"):])
+            else:
+                raise GraphError(f"Node {node_id}: unknown comparison '{op}'")
+        elif kind == "logic":
+            op = str(params.get("op", "and")).lower()
+            conds = [need_bool(a, node_id) for a in args]
+            if not conds or (op == "not" and len(conds) != 1):
+                raise GraphError(f"Node {node_id}: wrong number of inputs for '{op}'")
+            if op not in ("and", "or", "not"):
+                raise GraphError(f"Node {node_id}: unknown logic op '{op}'")
+            i = b.add(op, tuple(conds))
+        elif kind in ("buy", "sell"):
+            if not args:
+                raise GraphError(f"Node {node_id}: {kind} node has no condition connected")
+            i = b.add("and", tuple(need_bool(a, node_id) for a in args))
+        else:
+            raise GraphError(f"Node {node_id}: unsupported node type '{kind}'")
+
+        visiting.discard(node_id)
+        built[node_id] = i
+        return i
+
+    entry = b.add("or", tuple(build(n) for n in buys))
+    exit = b.add("or", tuple(build(n) for n in sells)) if sells else None
+    # only the steps the signals depend on, in order
+    keep, stack = set(), [i for i in (entry, exit) if i is not None]
+    while stack:
+        i = stack.pop()
+        if i not in keep:
+            keep.add(i)
+            stack.extend(b.steps[i].args)
+    order = sorted(keep)
+    remap = {old: new for new, old in enumerate(order)}
+    steps = [Step(b.steps[i].op, tuple(remap[a] for a in b.steps[i].args), b.steps[i].param) for i in order]
+    return Plan(steps, remap[entry], remap[exit] if exit is not None else None)
+
+# compiled plans per (strategy id, version); a new version means a changed graph
+_PLAN_CACHE_SIZE = 256
+_plan_cache: "OrderedDict[Tuple[int, int], Optional[Plan]]" = OrderedDict()
+_plan_lock = threading.Lock()
+
+def get_plan(strategy_id: int, version: int, graph: Dict[str, Any]) -> Optional[Plan]:
+    key = (strategy_id, version)
+    with _plan_lock:
+        if key in _plan_cache:
+            _plan_cache.move_to_end(key)
+            return _plan_cache[key]
+    plan = compile_graph(graph)
+    with _plan_lock:
+        _plan_cache[key] = plan
+        while len(_plan_cache) > _PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
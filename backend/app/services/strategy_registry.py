@@ -0,0 +1,89 @@
+"""
+Read-through cache of strategies for the API and the worker.
+
+Entries are keyed by strategy id and hold one version of the strategy with its GET response
+body already rendered, so a read costs a one-column version lookup instead of loading and
+re-serializing the graph. Writes through this process replace the entry; writes from another
+process are noticed through the version, which every update bumps.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+import json
+import threading
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db import crud
+
+@dataclass(frozen=True)
+class CachedStrategy:
+    id: int
+    name: str
+    version: int
+    graph: Dict[str, Any]
+    meta: Optional[Dict[str, Any]]
+    # GET /strategies/{id} response, rendered once per version
+    body: bytes
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.id}-{self.version}"'
+
+def _entry(row) -> CachedStrategy:
+    out = {"id": row.id, "name": row.name, "version": row.version, "graph": row.graph, "metadata": row.meta or {}}
+    return CachedStrategy(row.id, row.name, row.version, row.graph, row.meta, json.dumps(out).encode())
+
+class StrategyRegistry:
+    """Cached strategies are shared between requests and must not be mutated."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CachedStrategy]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, strategy_id: int) -> Optional[CachedStrategy]:
+        return (await self.get_many(db, [strategy_id])).get(strategy_id)
+
+    async def get_many(self, db: AsyncSession, strategy_ids: Iterable[int]) -> Dict[int, CachedStrategy]:
+        """The current version of each existing strategy; only stale or uncached ones are loaded."""
+        versions = await crud.strategy_versions(db, strategy_ids)
+        found: Dict[int, CachedStrategy] = {}
+        with self._lock:
+            for strategy_id, version in versions.items():
+                entry = self._entries.get(strategy_id)
+                if entry is not None and entry.version == version:
+                    self._entries.move_to_end(strategy_id)
+                    found[strategy_id] = entry
+            self.hits += len(found)
+            self.misses += len(versions) - len(found)
+        missing = [i for i in versions if i not in found]
+        if missing:
+            for row in await crud.get_strategies(db, missing):
+                found[row.id] = self.put(row)
+        return found
+
+    def put(self, row) -> CachedStrategy:
+        """Cache a strategy row just written or read; returns its entry."""
+        entry = _entry(row)
+        with self._lock:
+            current = self._entries.get(entry.id)
+            # a concurrent reader may already hold a newer version
+            if current is None or current.version <= entry.version:
+                self._entries[entry.id] = entry
+            self._entries.move_to_end(entry.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, strategy_id: int):
+        with self._lock:
+            self._entries.pop(strategy_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "max_entries": self.max_entries}
+
+registry = StrategyRegistry(settings.STRATEGY_CACHE_SIZE)
@@ -0,0 +1,125 @@
+from typing import Dict, Any, List, Optional
+import asyncio
+import itertools
+import numpy as np
+from app.services.simulator import (load_ohlcv, simulate_crossover_arrays, compute_metrics_from_pnl,
+                                    RunIndicators, run_indicators, run_sma)
+from app.services.instrument import stage, count
+from app.services import job_control
+
+SWEEP_PARAMS = ("fast", "slow", "sl", "tp")
+DEFAULT_GRID = {"fast": [20], "slow": [50], "sl": [None], "tp": [None]}
+# the per-combination metrics (compute_metrics_from_pnl) a sweep or walk-forward can rank by
+RANK_METRICS = ("total_pnl", "trades_count", "win_rate", "avg_pnl")
+
+def expand_param_values(spec: Any) -> List[Any]:
+    """
+    Expand one sweep parameter spec into its list of values.
+    Accepts a scalar, a list, or a {"start", "stop", "step"} range (stop inclusive).
+    """
+    if spec is None:
+        return [None]
+    if isinstance(spec, dict):
+        start, stop = spec["start"], spec["stop"]
+        step = spec.get("step") or 1
+        if step <= 0:
+            raise ValueError("range step must be positive")
+        values = []
+        k = 0
+        # index-based so float steps don't accumulate rounding error
+        while start + k * step <= stop + 1e-12:
+            values.append(start + k * step)
+            k += 1
+        return values
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    return [spec]
+
+def expand_grid(grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Cartesian product of the per-parameter values, skipping fast >= slow."""
+    values = {k: expand_param_values(grid.get(k, DEFAULT_GRID[k])) for k in SWEEP_PARAMS}
+    combos = []
+    for fast, slow, sl, tp in itertools.product(*(values[k] for k in SWEEP_PARAMS)):
+        fast, slow = int(fast), int(slow)
+        if fast < 1 or fast >= slow:
+            continue
+        combos.append({
+            "fast": fast,
+            "slow": slow,
+            "sl": float(sl) if sl is not None else None,
+            "tp": float(tp) if tp is not None else None,
+        })
+    return combos
+
+def sweep_arrays(close: np.ndarray, combos: List[Dict[str, Any]], force_close: bool = True,
+                 indicators: Optional[RunIndicators] = None) -> List[Dict[str, Any]]:
+    """
+    Evaluate every combination against one close array.
+    SMAs are the backtest engine's (indicators.rolling_mean), computed once per distinct
+    window, so each row is what a backtest of that combination finds; each (fast, slow)
+    signal pair is built once and reused for all of its (sl, tp) combinations.
+    With the run's indicators (simulator.run_indicators) the SMAs are the memoized ones that
+    backtests and later sweeps starting on the same bar also use.
+    """
+    close = np.asarray(close, dtype=float)
+    if len(close) == 0:
+        return [dict(c, **compute_metrics_from_pnl(np.empty(0))) for c in combos]
+    sma_cache: Dict[int, np.ndarray] = {}
+
+    def sma(window: int) -> np.ndarray:
+        if window not in sma_cache:
+            sma_cache[window] = run_sma(close, window, indicators)
+        return sma_cache[window]
+
+    by_pair: Dict[tuple, List[Dict[str, Any]]] = {}
+    for c in combos:
+        by_pair.setdefault((c["fast"], c["slow"]), []).append(c)
+    fast_windows = {fast for fast, _ in by_pair}
+
+    results = []
+    current_slow = None
+    for (fast, slow), group in sorted(by_pair.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        if current_slow is not None and current_slow != slow and current_slow not in fast_windows:
+            # pairs are visited in slow order, so a finished slow window is never needed again
+            sma_cache.pop(current_slow, None)
+        current_slow = slow
+        sma_fast, sma_slow = sma(fast), sma(slow)
+        for c in group:
+            entry_idx, exit_idx, _ = simulate_crossover_arrays(
+                close, sma_fast, sma_slow, force_close=force_close, sl_pct=c["sl"], tp_pct=c["tp"])
+            pnl = close[exit_idx] - close[entry_idx]
+            results.append(dict(c, **compute_metrics_from_pnl(pnl)))
+            job_control.advance(len(close))
+    return results
+
+def rank_results(results: List[Dict[str, Any]], rank_by: str = "total_pnl", top_n: Optional[int] = None):
+    ranked = sorted(results, key=lambda r: (r.get(rank_by) is None, -(r.get(rank_by) or 0)))
+    for i, r in enumerate(ranked, 1):
+        r["rank"] = i
+    return ranked[:top_n] if top_n else ranked
+
+def run_parameter_sweep_sync(payload: Dict[str, Any]) -> Dict[str, Any]:
+    combos = expand_grid(payload.get("grid", {}) or {})
+    with stage("load"):
+        df = load_ohlcv(payload.get("symbol"), payload.get("timeframe", "1m"),
+                        payload.get("start"), payload.get("end"))
+    close = df["close"].to_numpy(dtype=float)
+    indicators = run_indicators(payload.get("symbol"), payload.get("timeframe", "1m"), df)
+    job_control.add_total(len(close) * len(combos))
+    with stage("simulate"):
+        results = sweep_arrays(close, combos, force_close=bool(payload.get("force_close", True)),
+                               indicators=indicators)
+    # every combination is one pass over the bars
+    count("bars", len(close) * len(combos))
+    rank_by = payload.get("rank_by", "total_pnl")
+    ranked = rank_results(results, rank_by=rank_by, top_n=payload.get("top_n"))
+    metrics = {
+        "combinations": len(combos),
+        "bars": len(close),
+        "rank_by": rank_by,
+        "best": ranked[0] if ranked else None,
+    }
+    return {"results": ranked, "metrics": metrics}
+
+async def run_parameter_sweep(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await asyncio.to_thread(run_parameter_sweep_sync, payload)
@@ -0,0 +1,156 @@
+"""
+Columnar trade lists.
+
+Trades are kept as parallel numpy arrays (epoch-ns timestamps, prices, pnl and an int8
+exit-reason code) instead of one dict per trade, and stored as compressed chunks so a
+page of trades can be read without decoding the whole run.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+import io
+import numpy as np
+import pandas as pd
+
+# codes are stored, so new reasons are only ever appended
+EXIT_REASONS = ("tp", "sl", "sma_cross", "force_close", "signal")
+TRADE_COLUMNS = {
+    "entry_ts": np.int64,
+    "exit_ts": np.int64,
+    "entry_price": np.float64,
+    "exit_price": np.float64,
+    "qty": np.float64,
+    "pnl": np.float64,
+    "exit_reason": np.int8,
+}
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in TRADE_COLUMNS.items()}
+
+def reason_codes(reasons: List[Optional[str]]) -> np.ndarray:
+    # -1 marks a trade without an exit reason
+    lookup = {r: i for i, r in enumerate(EXIT_REASONS)}
+    return np.asarray([lookup.get(r, -1) for r in reasons], dtype=np.int8)
+
+def epoch_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.asi8
+
+def trade_columns(index: pd.DatetimeIndex, close: np.ndarray, entry_idx: np.ndarray,
+                  exit_idx: np.ndarray, reasons: List[str]) -> Dict[str, np.ndarray]:
+    """Build trade columns straight from bar indices, without materializing per-trade objects."""
+    entry_price = close[entry_idx].astype(np.float64)
+    exit_price = close[exit_idx].astype(np.float64)
+    ts = epoch_ns(index)
+    cols = {
+        "entry_ts": ts[entry_idx],
+        "exit_ts": ts[exit_idx],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "qty": np.ones(len(entry_idx)),
+        "pnl": exit_price - entry_price,
+        "exit_reason": reason_codes(reasons),
+    }
+    if index.tz is not None:
+        cols["tz"] = str(index.tz)
+    return cols
+
+def columns_from_trades(trades: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Convert the list-of-dicts trade format (loop engine, legacy results) into columns."""
+    if not trades:
+        return empty_columns()
+    entry = pd.DatetimeIndex(pd.to_datetime([t["entry_time"] for t in trades]))
+    exit_ = pd.DatetimeIndex(pd.to_datetime([t["exit_time"] for t in trades]))
+    cols = {
+        "entry_ts": epoch_ns(entry),
+        "exit_ts": epoch_ns(exit_),
+        "entry_price": np.asarray([t["entry_price"] for t in trades], dtype=np.float64),
+        "exit_price": np.asarray([t["exit_price"] for t in trades], dtype=np.float64),
+        "qty": np.asarray([t["qty"] for t in trades], dtype=np.float64),
+        "pnl": np.asarray([t["pnl"] for t in trades], dtype=np.float64),
+        "exit_reason": reason_codes([t.get("exit_reason") for t in trades]),
+    }
+    if entry.tz is not None:
+        cols["tz"] = str(entry.tz)
+    return cols
+
+def _to_iso(ts: np.ndarray, tz: Optional[str]) -> List[str]:
+    index = pd.DatetimeIndex(ts.view("datetime64[ns]"))
+    if tz:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return [t.isoformat() for t in index]
+
+def trades_from_columns(cols: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Render columns as the list-of-dicts format with ISO timestamps."""
+    tz = cols.get("tz")
+    entry_times = _to_iso(cols["entry_ts"], tz)
+    exit_times = _to_iso(cols["exit_ts"], tz)
+    qty = cols["qty"]
+    trades = []
+    for i in range(len(entry_times)):
+        code = int(cols["exit_reason"][i])
+        q = float(qty[i])
+        trades.append({
+            "entry_time": entry_times[i],
+            "exit_time": exit_times[i],
+            "entry_price": float(cols["entry_price"][i]),
+            "exit_price": float(cols["exit_price"][i]),
+            "qty": int(q) if q.is_integer() else q,
+            "pnl": float(cols["pnl"][i]),
+            "exit_reason": EXIT_REASONS[code] if code >= 0 else None,
+        })
+    return trades
+
+def columns_to_json(cols: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Parallel-array JSON form: epoch-ns timestamps and exit-reason codes plus their table."""
+    out = {name: cols[name].tolist() for name in TRADE_COLUMNS}
+    out["exit_reason_codes"] = list(EXIT_REASONS)
+    out["tz"] = cols.get("tz")
+    return out
+
+def slice_columns(cols: Dict[str, np.ndarray], lo: int, hi: int) -> Dict[str, np.ndarray]:
+    out = {name: cols[name][lo:hi] for name in TRADE_COLUMNS}
+    if "tz" in cols:
+        out["tz"] = cols["tz"]
+    return out
+
+def concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    if not parts:
+        return empty_columns()
+    out = {name: np.concatenate([p[name] for p in parts]) for name in TRADE_COLUMNS}
+    tz = next((p["tz"] for p in parts if "tz" in p), None)
+    if tz:
+        out["tz"] = tz
+    return out
+
+def encode_columns(cols: Dict[str, np.ndarray]) -> bytes:
+    buf = io.BytesIO()
+    arrays = {name: np.ascontiguousarray(cols[name], dtype=dtype) for name, dtype in TRADE_COLUMNS.items()}
+    if "tz" in cols:
+        arrays["tz"] = np.asarray(cols["tz"])
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+def decode_columns(blob: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as z:
+        cols = {name: z[name] for name in TRADE_COLUMNS}
+        if "tz" in z.files:
+            cols["tz"] = str(z["tz"])
+    return cols
+
+def iter_chunks(cols: Dict[str, np.ndarray], chunk_size: int, first_index: int = 0,
+                first_seq: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Split columns into storable chunks with their position and entry-time range.
+    first_index/first_seq place cols after trades already stored for the run.
+    """
+    n = len(cols["entry_ts"])
+    for seq, lo in enumerate(range(0, n, chunk_size), start=first_seq):
+        part = slice_columns(cols, lo, lo + chunk_size)
+        yield {
+            "seq": seq,
+            "first_index": first_index + lo,
+            "count": len(part["entry_ts"]),
+            "first_entry_ts": int(part["entry_ts"][0]),
+            "last_entry_ts": int(part["entry_ts"][-1]),
+            "data": encode_columns(part),
+        }
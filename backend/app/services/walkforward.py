@@ -0,0 +1,203 @@
+"""
+Walk-forward optimization of the SMA crossover's (fast, slow, sl, tp).
+
+The bars are split into rolling folds: a train window followed by the test window right after
+it, each fold shifted by one test window. The folds are the rungs of a successive-halving
+search: the surviving candidates are ranked on a fold's train window, the best by mean train
+rank so far is the fold's pick (evaluated out of sample on its test window), and only the top
+1/eta of the survivors go on to the next fold. N candidates cost at most N * eta / (eta - 1)
+window evaluations instead of N * folds, and the candidates of one pool task share their SMAs
+(sweep_arrays), so indicator work grows with the distinct windows rather than with N.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import Executor
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.simulator import (load_ohlcv, simulate_crossover_arrays, compute_metrics_from_pnl,
+                                    compute_equity_metrics, run_indicators, run_sma)
+from app.services.sweep import expand_grid, sweep_arrays
+from app.services.trade_store import epoch_ns
+from app.services.instrument import stage, count, run_recorded, merge_stats
+from app.services import job_control
+
+def fold_windows(n: int, folds: int, train_ratio: float) -> List[Tuple[int, int, int]]:
+    """
+    (train start, test start, test end) bar positions of each fold. The train window is
+    train_ratio test windows long; the last test window ends on the last bar.
+    """
+    test = int(n / (folds + train_ratio))
+    train = int(test * train_ratio)
+    if test < 1 or train < 2:
+        raise ValueError(f"{n} bars are too few for {folds} folds with train_ratio {train_ratio}")
+    offset = n - train - folds * test
+    return [(offset + k * test, offset + k * test + train, offset + (k + 1) * test + train) for k in range(folds)]
+
+def _load(payload: Dict[str, Any]):
+    with stage("load"):
+        return load_ohlcv(payload.get("symbol"), payload.get("timeframe", "1m"), payload.get("start"), payload.get("end"))
+
+# pool tasks: each takes one picklable dict so it can go through instrument.run_recorded
+
+def plan_folds(payload: Dict[str, Any]) -> Dict[str, Any]:
+    df = _load(payload)
+    windows = fold_windows(len(df), int(payload.get("folds", 5)), float(payload.get("train_ratio", 3.0)))
+    iso = lambda i: df.index[i].isoformat()
+    return {
+        "bars": len(df),
+        "windows": windows,
+        "times": [{"train": [iso(lo), iso(mid - 1)], "test": [iso(mid), iso(hi - 1)]} for lo, mid, hi in windows],
+    }
+
+def evaluate_window(task: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """sweep_arrays metrics of task["combos"] on the bars [lo, hi) of the payload's range."""
+    payload = task["payload"]
+    lo, hi = task["window"]
+    df = _load(payload).iloc[lo:hi]
+    indicators = run_indicators(payload.get("symbol"), payload.get("timeframe", "1m"), df)
+    with stage("simulate"):
+        results = sweep_arrays(df["close"].to_numpy(dtype=float), task["combos"],
+                               force_close=bool(payload.get("force_close", True)), indicators=indicators)
+    count("bars", len(df) * len(task["combos"]))
+    return results
+
+def evaluate_oos(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Trade and equity metrics of one parameter set on the bars [lo, hi), as a fresh backtest there."""
+    payload, params = task["payload"], task["params"]
+    lo, hi = task["window"]
+    df = _load(payload).iloc[lo:hi]
+    close = df["close"].to_numpy(dtype=float)
+    # the engine's SMAs from the window's first bar, as a backtest of the window computes them
+    indicators = run_indicators(payload.get("symbol"), payload.get("timeframe", "1m"), df)
+    with stage("simulate"):
+        entry_idx, exit_idx, _ = simulate_crossover_arrays(
+            close, run_sma(close, params["fast"], indicators), run_sma(close, params["slow"], indicators),
+            force_close=bool(payload.get("force_close", True)), sl_pct=params["sl"], tp_pct=params["tp"])
+    count("bars", len(df))
+    job_control.advance(len(df))
+    with stage("metrics"):
+        ts = epoch_ns(df.index)
+        pnl = close[exit_idx] - close[entry_idx]
+        metrics = compute_metrics_from_pnl(pnl)
+        risk, _ = compute_equity_metrics(df, {"entry_ts": ts[entry_idx], "exit_ts": ts[exit_idx], "pnl": pnl},
+                                         payload.get("timeframe", "1m"))
+        metrics.update(risk)
+    return metrics
+
+RunTasks = Callable[[Callable[[Dict[str, Any]], Any], List[Dict[str, Any]]], Awaitable[List[Any]]]
+
+def _batches(candidates: List[Dict[str, Any]], parts: int) -> List[List[Dict[str, Any]]]:
+    # contiguous runs in (slow, fast) order keep each SMA pair within one task
+    ordered = sorted(candidates, key=lambda c: (c["slow"], c["fast"], c["candidate"]))
+    size = math.ceil(len(ordered) / max(1, min(parts, len(ordered))))
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+def _mean_score(scores: List[Optional[float]]) -> Optional[float]:
+    return float(np.mean(scores)) if scores and all(s is not None for s in scores) else None
+
+def _fold_ranks(values: Dict[int, Optional[float]]) -> Dict[int, float]:
+    """
+    Rank of each candidate's value within one fold, 1 for the highest, ties sharing their
+    average rank. A missing value (e.g. win_rate with no trades) ranks last in this fold only.
+    """
+    ranks = pd.Series(values, dtype=float).rank(ascending=False, method="average", na_option="bottom")
+    return {int(i): float(r) for i, r in ranks.items()}
+
+async def _search(payload: Dict[str, Any], run_tasks: RunTasks, parts: int) -> Dict[str, Any]:
+    combos = [dict(c, candidate=i) for i, c in enumerate(expand_grid(payload.get("grid", {}) or {}))]
+    if not combos:
+        raise ValueError("Walk-forward grid has no valid combinations")
+    rank_by = payload.get("rank_by", "total_pnl")
+    eta = max(2, int(payload.get("eta", 2)))
+    (plan,) = await run_tasks(plan_folds, [payload])
+
+    scores: Dict[int, List[Optional[float]]] = {c["candidate"]: [] for c in combos}
+    ranks: Dict[int, List[float]] = {c["candidate"]: [] for c in combos}
+    alive = combos
+    folds, evaluations = [], 0
+    for k, (lo, mid, hi) in enumerate(plan["windows"]):
+        batches = _batches(alive, parts)
+        job_control.add_total((mid - lo) * len(alive))
+        runs = await run_tasks(evaluate_window, [{"payload": payload, "window": [lo, mid], "combos": b} for b in batches])
+        train = {r["candidate"]: r for results in runs for r in results}
+        evaluations += len(alive)
+        for i, r in train.items():
+            scores[i].append(r.get(rank_by))
+        for i, rank in _fold_ranks({i: r.get(rank_by) for i, r in train.items()}).items():
+            ranks[i].append(rank)
+        ranked = sorted(alive, key=lambda c: (np.mean(ranks[c["candidate"]]), c["candidate"]))
+        best = train[ranked[0]["candidate"]]
+        folds.append({
+            "fold": k,
+            "train": {"start": plan["times"][k]["train"][0], "end": plan["times"][k]["train"][1], "bars": mid - lo},
+            "test": {"start": plan["times"][k]["test"][0], "end": plan["times"][k]["test"][1], "bars": hi - mid},
+            "candidates": len(alive),
+            "params": {p: best[p] for p in ("fast", "slow", "sl", "tp")},
+            "train_metrics": {m: v for m, v in best.items() if m not in ("fast", "slow", "sl", "tp", "candidate")},
+            "train_score": _mean_score(scores[best["candidate"]]),
+            "train_rank": float(np.mean(ranks[best["candidate"]])),
+        })
+        alive = ranked[:max(1, math.ceil(len(ranked) / eta))]
+
+    # the picks are fixed once the search is done, so the test windows all run at once
+    job_control.add_total(sum(hi - mid for _, mid, hi in plan["windows"]))
+    oos = await run_tasks(evaluate_oos, [{"payload": payload, "window": [mid, hi], "params": f["params"]}
+                                         for f, (_, mid, hi) in zip(folds, plan["windows"])])
+    for f, metrics in zip(folds, oos):
+        f["oos_metrics"] = metrics
+    oos_pnl = sum(m["total_pnl"] for m in oos)
+    oos_trades = sum(m["trades_count"] for m in oos)
+    oos_wins = sum((m["win_rate"] or 0) * m["trades_count"] for m in oos)
+    metrics = {
+        "candidates": len(combos),
+        "folds": len(folds),
+        "bars": plan["bars"],
+        "rank_by": rank_by,
+        "eta": eta,
+        # train-window evaluations run, against candidates x folds for the full grid
+        "evaluations": evaluations,
+        "grid_evaluations": len(combos) * len(folds),
+        "oos_total_pnl": oos_pnl,
+        "oos_trades_count": oos_trades,
+        "oos_win_rate": oos_wins / oos_trades if oos_trades else None,
+        "oos_avg_pnl": oos_pnl / oos_trades if oos_trades else None,
+    }
+    survivors = [dict({p: c[p] for p in ("fast", "slow", "sl", "tp")}, train_score=_mean_score(scores[c["candidate"]]),
+                      train_rank=float(np.mean(ranks[c["candidate"]])))
+                 for c in alive]
+    return {"folds": folds, "survivors": survivors, "metrics": metrics}
+
+def run_walkforward_sync(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # every task inline, one after another; the worker spreads them over its pool through run_walkforward
+    async def inline(fn, tasks):
+        return [fn(t) for t in tasks]
+    return asyncio.run(_search(payload, inline, 1))
+
+async def run_walkforward(payload: Dict[str, Any], executor: Optional[Executor] = None,
+                          job_id: Optional[int] = None):
+    """
+    The search with each rung's candidates split into one task per pool process on executor.
+    Returns (result, stats) like instrument.run_recorded.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    parts: List[Dict[str, Any]] = []
+    control = job_control.current()
+
+    async def pooled(fn, tasks):
+        base = len(parts)
+        runs = await asyncio.gather(*(
+            loop.run_in_executor(executor, run_recorded, fn, t, f"job_{job_id}_{base + i}_{fn.__name__}", control)
+            for i, t in enumerate(tasks)))
+        parts.extend(s for _, s in runs)
+        return [r for r, _ in runs]
+
+    result = await _search(payload, pooled, settings.WORKER_CONCURRENCY or os.cpu_count() or 1)
+    stats = merge_stats(parts)
+    # the tasks' stage times are summed over processes; run is the search's wall time
+    stats["timings"]["run"] = time.perf_counter() - start
+    return result, stats
@@ -1,40 +1,267 @@
 import asyncio
 import logging
+import multiprocessing
+import os
+import threading
+import time
 import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
 from app.db.session import async_session
 from app.db import crud
-from app.services.simulator import run_backtest_simulation
+from app.db.notify import local_notifier, start_listener, JOBS_QUEUED
+from app.services.simulator import run_backtest_sync, dataset_cache
+from app.services.sweep import run_parameter_sweep_sync
+from app.services.portfolio import run_portfolio, run_portfolio_sync
+from app.services.walkforward import run_walkforward, run_walkforward_sync
+from app.services.montecarlo import run_montecarlo_sync
+from app.services.sharding import run_sharded_backtest
+from app.services.instrument import run_recorded
+from app.services import job_control
+from app.services.job_control import JobControl, JobSlots, JobStopped, STOP_CANCELLED, STOP_TIMEOUT
+from app.services.strategy_registry import registry
+from app.services.shared_data import SharedDatasetStore, init_process, warm_up
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("worker")
 
-async def process_job(job):
+JOB_RUNNERS = {
+    "backtest": run_backtest_sync,
+    "sweep": run_parameter_sweep_sync,
+    "portfolio": run_portfolio_sync,
+    "walkforward": run_walkforward_sync,
+    "montecarlo": run_montecarlo_sync,
+}
+
+# job types that fan out over the pool themselves instead of occupying one pool process
+POOL_JOB_RUNNERS = {
+    "portfolio": run_portfolio,
+    "walkforward": run_walkforward,
+}
+
+def _pool_runner(payload: Dict[str, Any]):
+    job_type = payload.get("job_type", "backtest")
+    if job_type == "backtest" and int(payload.get("shards", 1)) != 1:
+        return run_sharded_backtest
+    return POOL_JOB_RUNNERS.get(job_type)
+
+def execute_job(payload: Dict[str, Any], job_id: Optional[int] = None, control: Optional[JobControl] = None):
+    """(result, stats) of the job's runner, see instrument.run_recorded."""
+    # runs inside a pool process, so it must stay a picklable module-level function
+    job_type = payload.get("job_type", "backtest")
+    runner = JOB_RUNNERS.get(job_type)
+    if runner is None:
+        raise ValueError(f"Unknown job type: {job_type}")
+    result, stats = run_recorded(runner, payload, profile_name=f"job_{job_id}", control=control)
+    logger.info(f"pid {os.getpid()} dataset cache: {dataset_cache.stats()}")
+    return result, stats
+
+async def _job_inputs(job) -> Dict[str, Any]:
+    """The job's payload plus anything the runner needs from the database."""
+    payload = job.payload
+    if payload.get("job_type", "backtest") in ("backtest", "portfolio") and payload.get("strategy_id") is not None:
+        async with async_session() as db:
+            s = await registry.get(db, payload["strategy_id"])
+        if s is None:
+            raise ValueError(f"Strategy {payload['strategy_id']} not found")
+        payload = dict(payload, strategy={"id": s.id, "version": s.version, "graph": s.graph})
+    if payload.get("job_type") == "montecarlo":
+        async with async_session() as db:
+            source = await crud.get_job(db, payload["source_job_id"])
+            if source is None or source.status != "finished":
+                raise ValueError(f"Job {payload['source_job_id']} is not a finished backtest")
+            payload = dict(payload, pnl=await crud.get_job_pnl(db, source))
+    resume_from = payload.get("resume_from")
+    if resume_from is not None:
+        async with async_session() as db:
+            checkpoint = await crud.get_checkpoint(db, resume_from)
+        if checkpoint is None:
+            raise ValueError(f"Job {resume_from} has no checkpoint to resume from")
+        payload = dict(payload, checkpoint_state={
+            "job_id": resume_from, "last_ts": checkpoint.last_ts, "data": checkpoint.data})
+    return payload
+
+def _job_datasets(payload: Dict[str, Any]) -> List[Tuple[str, str]]:
+    timeframe = payload.get("timeframe", "1m")
+    symbols = payload.get("symbols") or ([payload["symbol"]] if payload.get("symbol") else [])
+    return [(s, timeframe) for s in symbols]
+
+async def _watch_job(job_id: int, slots: JobSlots, control: JobControl, started: float):
+    """Copy the job's progress to its row every PROGRESS_INTERVAL_SECONDS; stop it on cancel or timeout."""
+    while True:
+        await asyncio.sleep(settings.PROGRESS_INTERVAL_SECONDS)
+        done, total = slots.progress(control)
+        try:
+            async with async_session() as db:
+                cancel = await crud.update_job_progress(db, job_id, done, total)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: progress update failed: {e}")
+            continue
+        if cancel:
+            slots.stop(control, STOP_CANCELLED)
+        elif settings.JOB_MAX_SECONDS > 0 and time.monotonic() - started > settings.JOB_MAX_SECONDS:
+            slots.stop(control, STOP_TIMEOUT)
+
+async def process_job(job, executor: Optional[Executor] = None, shared: Optional[SharedDatasetStore] = None,
+                      slots: Optional[JobSlots] = None):
     job_id = job.id
     logger.info(f"Processing job {job_id}")
+    timings: Dict[str, float] = {}
+    if job.started_at is not None and job.created_at is not None:
+        timings["queue_wait"] = max(0.0, (job.started_at - job.created_at).total_seconds())
+    stats: Dict[str, Any] = {"timings": timings}
+    leases: List[str] = []
+    # without slots (e.g. called directly) the job can't report progress or be stopped
+    control = slots.allocate(job_id) if slots is not None else None
+    watcher = None
+    if control is not None:
+        watcher = asyncio.create_task(_watch_job(job_id, slots, control, time.monotonic()))
     try:
-        result = await run_backtest_simulation(job.payload)
+        t = time.perf_counter()
+        payload = await _job_inputs(job)
+        timings["inputs"] = time.perf_counter() - t
+        if shared is not None:
+            # publishes the datasets on first use; they stay until the job releases them
+            t = time.perf_counter()
+            leases = await asyncio.get_running_loop().run_in_executor(None, shared.acquire_many, _job_datasets(payload))
+            timings["publish"] = time.perf_counter() - t
+        pool_runner = _pool_runner(payload)
+        t = time.perf_counter()
+        if pool_runner is not None:
+            # the runner's own work happens here and its tasks bind control in the pool
+            with job_control.bound(control, check_memory=False):
+                result, stats = await pool_runner(payload, executor, job_id)
+        else:
+            # executor=None runs on the default thread pool
+            loop = asyncio.get_running_loop()
+            result, stats = await loop.run_in_executor(executor, execute_job, payload, job_id, control)
+        if control is not None:
+            stats["progress"] = slots.progress(control)
+        # pickling the payload and result and waiting for a pool process
+        timings["dispatch"] = max(0.0, time.perf_counter() - t - stats["timings"]["run"])
+        stats["timings"].update(timings)
+        async with async_session() as db:
+            await crud.save_backtest_result(db, job_id, result, stats)
+        logger.info(f"Finished job {job_id}: {stats['bars']} bars, "
+                    + ", ".join(f"{k} {v:.3f}s" for k, v in stats["timings"].items()))
+    except BrokenProcessPool as e:
+        # the process running (part of) the job was killed or crashed, e.g. by the OOM killer
+        logger.error(f"Job {job_id} failed: a pool process died: {e}")
         async with async_session() as db:
-            await crud.save_backtest_result(db, job_id, result)
-        logger.info(f"Finished job {job_id}")
+            await crud.mark_job_failed(db, job_id, error="A worker process died while running the job "
+                                                         "(out of memory or crashed)", stats=stats)
+    except JobStopped as e:
+        logger.info(f"Job {job_id} stopped: {e}")
+        stats["progress"] = slots.progress(control)
+        async with async_session() as db:
+            await crud.mark_job_failed(db, job_id, error=str(e), stats=stats, status=e.status)
     except Exception as e:
         tb = traceback.format_exc()
         logger.error(f"Job {job_id} failed: {e}\\n{tb}")
         async with async_session() as db:
-            await crud.mark_job_failed(db, job_id, error=str(e))
+            await crud.mark_job_failed(db, job_id, error=str(e), stats=stats)
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if control is not None:
+            slots.release(control)
+        if leases:
+            shared.release_many(leases)
 
-async def worker_loop(poll_interval: float = 2.0):
-    logger.info("Worker loop started")
-    while True:
-        try:
-            async with async_session() as db:
-                job = await crud.fetch_next_queued_job(db)
-            if job:
-                await process_job(job)
-            else:
-                await asyncio.sleep(poll_interval)
-        except Exception as e:
-            logger.exception("Unexpected worker exception: %s", e)
-            await asyncio.sleep(5)
+class RespawningPool(Executor):
+    """
+    A ProcessPoolExecutor that is started again once one of its processes dies: the jobs whose
+    tasks were on the broken pool fail, later submissions go to the new pool.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._pool = ProcessPoolExecutor(**kwargs)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            try:
+                return self._pool.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                logger.error("A pool process died; starting a new pool")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(**self._kwargs)
+                return self._pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+def _init_pool_process(shared_root: Optional[str], slot_array):
+    job_control.init_process(slot_array)
+    init_process(shared_root)
+
+def worker_concurrency() -> int:
+    return settings.WORKER_CONCURRENCY or os.cpu_count() or 1
+
+async def _wait_for_wakeup(wakeups: asyncio.Queue, running: set, timeout: float) -> bool:
+    # returns on a job notification or a finished slot (True), or the safety-net timeout (False)
+    waiter = asyncio.create_task(wakeups.get())
+    try:
+        done, _ = await asyncio.wait({waiter, *running}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+    # coalesce bursts: one claim round covers every pending notification
+    while not wakeups.empty():
+        wakeups.get_nowait()
+    return bool(done)
+
+async def worker_loop(poll_interval: Optional[float] = None, concurrency: Optional[int] = None):
+    poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+    concurrency = concurrency or worker_concurrency()
+    logger.info(f"Worker loop started with {concurrency} slots")
+    shared = None
+    if settings.SHARED_DATASETS:
+        shared = SharedDatasetStore(settings.SHARED_DATA_DIR or None, settings.SHARED_DATA_MAX_BYTES)
+    # spawn rather than fork: the parent holds an event loop and DB connections
+    ctx = multiprocessing.get_context("spawn")
+    slots = JobSlots(concurrency, ctx)
+    pool = RespawningPool(max_workers=concurrency, mp_context=ctx, initializer=_init_pool_process,
+                          initargs=(shared.root if shared else None, slots.array))
+    # start every pool process now, so no job waits for a spawn and its imports
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(*(loop.run_in_executor(pool, warm_up) for _ in range(concurrency)))
+    logger.info(f"Pool processes ready: {sorted(set(pids))}")
+    wakeups = local_notifier.subscribe(JOBS_QUEUED)
+    listener = start_listener([JOBS_QUEUED])
+    running = set()
+    try:
+        while True:
+            try:
+                jobs = []
+                free = concurrency - len(running)
+                if free > 0:
+                    async with async_session() as db:
+                        jobs = await crud.claim_queued_jobs(db, limit=free)
+                for job in jobs:
+                    task = asyncio.create_task(process_job(job, pool, shared, slots))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                if jobs:
+                    continue
+                woke = await _wait_for_wakeup(wakeups, running, poll_interval)
+                if not woke and settings.RESULT_CACHE_TTL_SECONDS > 0:
+                    # quiet period: retire expired result-cache entries
+                    async with async_session() as db:
+                        await crud.expire_fingerprints(db, settings.RESULT_CACHE_TTL_SECONDS)
+            except Exception as e:
+                logger.exception("Unexpected worker exception: %s", e)
+                await asyncio.sleep(5)
+    finally:
+        local_notifier.unsubscribe(JOBS_QUEUED, wakeups)
+        if listener:
+            listener.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+        if shared is not None:
+            shared.close()
 
 def main():
     asyncio.run(worker_loop())
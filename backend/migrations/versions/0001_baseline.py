@@ -0,0 +1,40 @@
+"""baseline: strategies and backtest jobs
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "strategies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("graph", sa.JSON(), nullable=False),
+        sa.Column("meta", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_strategies_id", "strategies", ["id"])
+    op.create_table(
+        "backtest_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_backtest_jobs_id", "backtest_jobs", ["id"])
+    op.create_index("ix_backtest_jobs_status", "backtest_jobs", ["status"])
+
+def downgrade():
+    op.drop_table("backtest_jobs")
+    op.drop_table("strategies")
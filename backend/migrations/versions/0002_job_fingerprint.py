@@ -0,0 +1,21 @@
+"""result cache: backtest_jobs.fingerprint
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("backtest_jobs", sa.Column("fingerprint", sa.String(64), nullable=True))
+    op.create_index("ix_backtest_jobs_fingerprint", "backtest_jobs", ["fingerprint"])
+
+def downgrade():
+    op.drop_index("ix_backtest_jobs_fingerprint", "backtest_jobs")
+    op.drop_column("backtest_jobs", "fingerprint")
@@ -0,0 +1,30 @@
+"""columnar trade storage: backtest_trade_chunks
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "backtest_trade_chunks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("backtest_jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("first_index", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("first_entry_ts", sa.BigInteger(), nullable=False),
+        sa.Column("last_entry_ts", sa.BigInteger(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+    )
+    op.create_index("ix_backtest_trade_chunks_job_id", "backtest_trade_chunks", ["job_id"])
+
+def downgrade():
+    op.drop_table("backtest_trade_chunks")
@@ -0,0 +1,25 @@
+"""incremental backtests: backtest_checkpoints
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "backtest_checkpoints",
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("backtest_jobs.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("last_ts", sa.BigInteger(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+
+def downgrade():
+    op.drop_table("backtest_checkpoints")
@@ -0,0 +1,19 @@
+"""compiled strategy plans: strategies.version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("strategies", sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+def downgrade():
+    op.drop_column("strategies", "version")
@@ -0,0 +1,30 @@
+"""run statistics: backtest_jobs timings, bars, peak memory and diagnostics
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+_COLUMNS = (
+    ("started_at", sa.DateTime(timezone=True)),
+    ("finished_at", sa.DateTime(timezone=True)),
+    ("timings", sa.JSON()),
+    ("bars", sa.BigInteger()),
+    ("peak_rss_mb", sa.Float()),
+    ("diagnostics", sa.JSON()),
+)
+
+def upgrade():
+    for name, type_ in _COLUMNS:
+        op.add_column("backtest_jobs", sa.Column(name, type_, nullable=True))
+
+def downgrade():
+    for name, _ in reversed(_COLUMNS):
+        op.drop_column("backtest_jobs", name)
@@ -0,0 +1,18 @@
+"""strategy list order: index on strategies.created_at
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_strategies_created_at", "strategies", ["created_at"])
+
+def downgrade():
+    op.drop_index("ix_strategies_created_at", "strategies")
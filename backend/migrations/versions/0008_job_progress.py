@@ -0,0 +1,25 @@
+"""progress and cancellation: backtest_jobs progress_done, progress_total, cancel_requested
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("backtest_jobs", sa.Column("progress_done", sa.BigInteger(), nullable=True))
+    op.add_column("backtest_jobs", sa.Column("progress_total", sa.BigInteger(), nullable=True))
+    # existing jobs get false, as new ones do
+    op.add_column("backtest_jobs", sa.Column("cancel_requested", sa.Boolean(), nullable=False,
+                                             server_default=sa.false()))
+
+def downgrade():
+    op.drop_column("backtest_jobs", "cancel_requested")
+    op.drop_column("backtest_jobs", "progress_total")
+    op.drop_column("backtest_jobs", "progress_done")
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.simulator import run_sma_crossover, StreamingStrategy, stream_trades, SMA_BLOCK
+from app.services.strategy_graph import sma_crossover_plan
+from app.services.trade_store import concat_columns, trades_from_columns
+
+PARAMS = [
+    (2, 3, None, None), (3, 8, None, None), (5, 20, 0.002, None),
+    (5, 20, None, 0.003), (10, 30, 0.004, 0.004), (2, 50, 0.001, 0.001),
+]
+
+def random_ohlcv(n, seed):
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    # round some series to a tick so fast/slow ties and exact TP/SL hits happen too
+    if seed % 2:
+        close = np.round(close, 1)
+    idx = pd.date_range("2023-01-01", periods=n, freq="1min")
+    return pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=idx)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_loop_and_vectorized_engines_agree(seed):
+    df = random_ohlcv(3000, seed)
+    for fast, slow, sl, tp in PARAMS:
+        for force_close in (True, False):
+            kwargs = dict(fast=fast, slow=slow, force_close=force_close, sl_pct=sl, tp_pct=tp)
+            ref = run_sma_crossover(df, engine="loop", **kwargs)
+            assert ref, kwargs
+            assert run_sma_crossover(df, engine="vectorized", **kwargs) == ref, kwargs
+
+@pytest.mark.parametrize("seed", range(3))
+def test_streaming_matches_in_memory(seed):
+    # chunks that straddle SMA blocks must give the in-memory run's trades
+    df = random_ohlcv(2 * SMA_BLOCK + 5000, seed)
+    for fast, slow, sl, tp in PARAMS:
+        for force_close in (True, False):
+            ref = run_sma_crossover(df, fast=fast, slow=slow, force_close=force_close, sl_pct=sl, tp_pct=tp)
+            for chunk_rows in (997, SMA_BLOCK - 1, 50000):
+                strategy = StreamingStrategy(sma_crossover_plan(fast, slow), force_close, sl, tp)
+                chunks = (df.iloc[i:i + chunk_rows] for i in range(0, len(df), chunk_rows))
+                streamed = trades_from_columns(concat_columns(list(stream_trades(strategy, chunks))))
+                assert streamed == ref, (chunk_rows, fast, slow, sl, tp, force_close)
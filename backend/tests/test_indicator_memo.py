@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.indicators import indicator_cache
+from app.services.simulator import compute_metrics_from_pnl, run_backtest_sync, run_sma_crossover_columns
+from app.services.sweep import run_parameter_sweep_sync
+
+METRICS = ("total_pnl", "trades_count", "win_rate", "avg_pnl")
+PARAMS = {"fast": 5, "slow": 21, "sl": None, "tp": None}
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    rng = np.random.default_rng(7)
+    close = np.round(20.0 + np.cumsum(rng.normal(0, 0.05, 5000)), 2)
+    idx = pd.date_range("2023-01-01", periods=len(close), freq="1min", name="timestamp")
+    df = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=idx)
+    df.to_csv(tmp_path / "data" / "TICK_1m.csv")
+    indicator_cache.clear()
+    return df
+
+def standalone(df, start, end):
+    window = df.loc[start:end]
+    trades = run_sma_crossover_columns(window, PARAMS["fast"], PARAMS["slow"], True)
+    return compute_metrics_from_pnl(trades["pnl"])
+
+def test_runs_from_the_same_bar_share_indicators(dataset):
+    start = "2023-01-01 03:00"
+    ends = ("2023-01-02 04:00", "2023-01-03 01:00", "2023-01-01 09:30")
+    before, misses = indicator_cache.misses, None
+    for end in ends:
+        metrics = run_backtest_sync({"symbol": "TICK", "timeframe": "1m", "start": start, "end": end,
+                                     "params": PARAMS})["metrics"]
+        assert {m: metrics[m] for m in METRICS} == standalone(dataset, start, end)
+        if misses is None:
+            misses, hits = indicator_cache.misses, indicator_cache.hits
+            assert misses == before + 2
+    # the later runs only slice the arrays of the first one
+    assert indicator_cache.misses == misses
+    assert indicator_cache.hits == hits + 2 * (len(ends) - 1)
+
+    # so does a sweep from that bar
+    result = run_parameter_sweep_sync({"symbol": "TICK", "timeframe": "1m", "start": start, "end": ends[1],
+                                       "grid": {k: [v] for k, v in PARAMS.items()}})
+    assert indicator_cache.misses == misses
+    assert {m: result["results"][0][m] for m in METRICS} == standalone(dataset, start, ends[1])
+
+def test_runs_from_another_bar_compute_their_own(dataset):
+    misses = indicator_cache.misses
+    for start in ("2023-01-01 03:00", "2023-01-01 03:01"):
+        end = "2023-01-02 04:00"
+        metrics = run_backtest_sync({"symbol": "TICK", "timeframe": "1m", "start": start, "end": end,
+                                     "params": PARAMS})["metrics"]
+        assert {m: metrics[m] for m in METRICS} == standalone(dataset, start, end)
+    assert indicator_cache.misses == misses + 4
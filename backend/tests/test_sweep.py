@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.simulator import compute_metrics_from_pnl, run_backtest_sync, run_sma_crossover_columns
+from app.services.sweep import expand_grid, run_parameter_sweep_sync, sweep_arrays
+
+METRICS = ("total_pnl", "trades_count", "win_rate", "avg_pnl")
+GRID = {"fast": {"start": 2, "stop": 12, "step": 2}, "slow": [5, 13, 30], "sl": [None, 0.004], "tp": [None, 0.006]}
+
+def tick_series(n, seed):
+    # 2-decimal prices, so fast/slow ties and exact TP/SL hits are common
+    rng = np.random.default_rng(seed)
+    close = np.round(20.0 + np.cumsum(rng.normal(0, 0.05, n)), 2)
+    idx = pd.date_range("2023-01-01", periods=n, freq="1min")
+    return pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=idx)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sweep_rows_match_standalone_runs(seed):
+    df = tick_series(2000, seed)
+    combos = expand_grid(GRID)
+    for force_close in (True, False):
+        rows = sweep_arrays(df["close"].to_numpy(), combos, force_close=force_close)
+        for row in rows:
+            trades = run_sma_crossover_columns(df, row["fast"], row["slow"], force_close, row["sl"], row["tp"])
+            assert {m: row[m] for m in METRICS} == compute_metrics_from_pnl(trades["pnl"]), row
+
+def test_sweep_job_matches_backtest_jobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    df = tick_series(3000, 42)
+    df.index.name = "timestamp"
+    df.to_csv(tmp_path / "data" / "TICK_1m.csv")
+    window = {"symbol": "TICK", "timeframe": "1m", "start": "2023-01-01 02:00", "end": "2023-01-02 10:00"}
+    result = run_parameter_sweep_sync(dict(window, grid=GRID))
+    assert result["results"]
+    for row in result["results"]:
+        params = {"fast": row["fast"], "slow": row["slow"], "sl": row["sl"], "tp": row["tp"]}
+        metrics = run_backtest_sync(dict(window, params=params))["metrics"]
+        assert {m: row[m] for m in METRICS} == {m: metrics[m] for m in METRICS}, row
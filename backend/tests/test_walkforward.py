@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.simulator import run_backtest_sync
+from app.services import walkforward
+from app.services.walkforward import run_walkforward_sync
+
+METRICS = ("total_pnl", "trades_count", "win_rate", "avg_pnl")
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    rng = np.random.default_rng(7)
+    close = np.round(20.0 + np.cumsum(rng.normal(0, 0.05, 6000)), 2)
+    idx = pd.date_range("2023-01-01", periods=len(close), freq="1min", name="timestamp")
+    df = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": 1.0}, index=idx)
+    df.to_csv(tmp_path / "data" / "TICK_1m.csv")
+    return {"symbol": "TICK", "timeframe": "1m", "start": None, "end": None}
+
+def test_oos_metrics_match_backtests_of_the_test_windows(dataset):
+    grid = {"fast": [2, 3, 5, 8], "slow": [10, 21, 34], "sl": [None, 0.003], "tp": [None, 0.005]}
+    result = run_walkforward_sync(dict(dataset, grid=grid, folds=4, train_ratio=2.0))
+    assert len(result["folds"]) == 4
+    for fold in result["folds"]:
+        window = dict(dataset, start=fold["test"]["start"], end=fold["test"]["end"])
+        metrics = run_backtest_sync(dict(window, params=fold["params"]))["metrics"]
+        assert {m: fold["oos_metrics"][m] for m in METRICS} == {m: metrics[m] for m in METRICS}, fold
+
+def test_a_missing_metric_ranks_last_in_its_fold_only(monkeypatch):
+    # win_rate of 8 candidates on two train windows; None is a window without trades
+    win_rates = {0: [0.9, None, None, None, None, None, None, None],
+                 5: [0.7, 0.6, 0.95, 0.5]}
+    windows = [[0, 10, 15], [5, 15, 20]]
+    monkeypatch.setattr(walkforward, "plan_folds", lambda payload: {
+        "bars": 20, "windows": windows, "times": [{"train": ["a", "b"], "test": ["c", "d"]}] * 2})
+    monkeypatch.setattr(walkforward, "evaluate_window", lambda task: [
+        dict(c, win_rate=win_rates[task["window"][0]][c["candidate"]]) for c in task["combos"]])
+    monkeypatch.setattr(walkforward, "evaluate_oos", lambda task: {
+        "total_pnl": 0.0, "trades_count": 0, "win_rate": None, "avg_pnl": None})
+
+    result = run_walkforward_sync({"grid": {"fast": list(range(1, 9)), "slow": [50]}, "rank_by": "win_rate"})
+    # candidates 1-3 share the last rank of fold 0 (5) and go on by order; winning fold 1
+    # lifts candidate 2 to a mean rank of 3, ahead of 1 and 3 rather than last for good
+    assert [f["candidates"] for f in result["folds"]] == [8, 4]
+    assert [s["fast"] for s in result["survivors"]] == [1, 3]
+    assert [s["train_rank"] for s in result["survivors"]] == [1.5, 3.0]
+    assert [s["train_score"] for s in result["survivors"]] == [0.8, None]
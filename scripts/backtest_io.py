@@ -0,0 +1,75 @@
+"""
+Loading backtest results for the analysis scripts.
+
+Accepts a saved API response or raw result (.json), or a trades/equity export from
+/api/v1/backtests/{id}/trades or /equity in NDJSON (.ndjson, .jsonl) or Arrow IPC stream
+(.arrow, .arrows) form, as a file or an http(s) URL. Exports are read column-wise into
+DataFrames with UTC timestamps; nothing is parsed row by row.
+"""
+import json
+import os
+import urllib.request
+import pandas as pd
+
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+TIME_COLUMNS = ("entry_ts", "exit_ts", "ts")
+
+def _export_kind(path, content_type=None):
+    media = (content_type or "").split(";")[0].strip()
+    ext = os.path.splitext(path.split("?")[0])[1].lower()
+    if media == ARROW or ext in (".arrow", ".arrows"):
+        return "arrow"
+    if media in (NDJSON, "application/ndjson") or ext in (".ndjson", ".jsonl") or "format=ndjson" in path:
+        return "ndjson"
+    if "format=arrow" in path:
+        return "arrow"
+    return "json"
+
+def _with_times(df):
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col].astype("int64"), unit="ns", utc=True)
+    return df
+
+def _read_export(source, kind):
+    if kind == "arrow":
+        import pyarrow as pa
+        return _with_times(pa.ipc.open_stream(source).read_all().to_pandas())
+    # precise_float keeps prices identical to the server's float64 values
+    return _with_times(pd.read_json(source, lines=True, dtype=False, precise_float=True))
+
+def _from_json(data):
+    # support both API-wrapped result and raw result object
+    result = (data.get("result") or {}) if "result" in data else data
+    metrics = result.get("metrics") or {}
+    trades = pd.DataFrame(result.get("trades") or [])
+    if len(trades):
+        for col in ("entry_time", "exit_time"):
+            trades[col.replace("_time", "_ts")] = pd.to_datetime(trades[col], utc=True)
+    equity = result.get("equity") or {}
+    equity = pd.DataFrame({"ts": equity.get("ts", []), "equity": equity.get("equity", [])})
+    return metrics, trades, _with_times(equity) if len(equity) else None
+
+def load(path):
+    """
+    (metrics, trades, equity) from path. trades/equity are DataFrames with UTC timestamp
+    columns (entry_ts/exit_ts, ts), or None when the source doesn't hold them; an export
+    carries no metrics.
+    """
+    if path.startswith(("http://", "https://")):
+        response = urllib.request.urlopen(path)
+        kind = _export_kind(path, response.headers.get("Content-Type"))
+        if kind == "json":
+            return _from_json(json.load(response))
+        table = _read_export(response, kind)
+    else:
+        kind = _export_kind(path)
+        if kind == "json":
+            with open(path) as f:
+                return _from_json(json.load(f))
+        with open(path, "rb") as f:
+            table = _read_export(f, kind)
+    if "equity" in table.columns:
+        return {}, None, table
+    return {}, table, None
@@ -0,0 +1,313 @@
+"""
+Simulator benchmarks on deterministic synthetic data.
+
+    python scripts/benchmark.py run --sizes 1e4 1e5 1e6 --out bench.json
+    python scripts/benchmark.py run --sizes 1e6 --baseline bench.json   # run and compare
+    python scripts/benchmark.py compare bench_new.json bench.json
+    python scripts/benchmark.py generate SYN 1e7 --dir backend/data --format columnar
+
+Every case runs in a fresh process, so the reported peak RSS belongs to that case alone;
+peak_alloc_mb is the operation's own peak allocation (tracemalloc, one extra untimed call).
+Sizes up to --max-in-memory bars are written as CSV and run through the in-memory functions;
+larger ones are written to the columnar store and only run end to end as a streaming job.
+The end-to-end case goes through worker.process_job against a SQLite database (needs aiosqlite).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+SYMBOL = "BENCH"
+# bars generated per random block; fixed so the data does not depend on how it is written
+GEN_BLOCK = 1 << 20
+GEN_START = pd.Timestamp("2000-01-01")
+IN_MEMORY_CASES = ("load_ohlcv_from_csv", "run_sma_crossover", "run_sma_crossover_sltp",
+                   "compute_metrics", "compute_equity_metrics", "process_job")
+
+def synthetic_blocks(n, seed=0):
+    """
+    Yield (epoch-ns timestamps, open, high, low, close, volume) blocks of a 1-minute random
+    walk. Block k only depends on (seed, k) and the last close of block k-1, so any n gives
+    a prefix of the same series.
+    """
+    last = 100.0
+    for k, lo in enumerate(range(0, n, GEN_BLOCK)):
+        m = min(GEN_BLOCK, n - lo)
+        rng = np.random.default_rng([seed, k])
+        # volatility regimes make trade counts and holding times vary like real data
+        vol = 0.0015 * np.exp(0.5 * np.sin(np.arange(lo, lo + m) * (2 * np.pi / 20000)))
+        close = last * np.exp(np.cumsum(rng.normal(0.0, 1.0, m) * vol))
+        open_ = np.concatenate(([last], close[:-1]))
+        wick = np.abs(rng.normal(0.0, 1.0, (2, m))) * vol * close
+        high = np.maximum(open_, close) + wick[0]
+        low = np.minimum(open_, close) - wick[1]
+        volume = rng.gamma(2.0, 50.0, m)
+        ts = GEN_START.value + (lo + np.arange(m, dtype=np.int64)) * 60_000_000_000
+        last = float(close[-1])
+        yield ts, open_, high, low, close, volume
+
+def write_csv(path, n, seed=0):
+    with open(path, "w") as f:
+        f.write("timestamp,open,high,low,close,volume\n")
+        for ts, *cols in synthetic_blocks(n, seed):
+            frame = pd.DataFrame(dict(zip(("open", "high", "low", "close", "volume"), cols)),
+                                 index=pd.DatetimeIndex(ts.view("datetime64[ns]"), name="timestamp"))
+            frame.to_csv(f, header=False)
+
+def write_columnar(directory, n, seed=0, symbol=SYMBOL):
+    """Same layout as app.services.datastore.ingest_csv, written block by block."""
+    from app.services.datastore import META_FILE, OHLCV_COLUMNS
+    os.makedirs(directory, exist_ok=True)
+    names = ("timestamp",) + OHLCV_COLUMNS
+    outs = [np.lib.format.open_memmap(os.path.join(directory, f"{c}.npy"), mode="w+",
+                                      dtype=np.int64 if c == "timestamp" else np.float64, shape=(n,))
+            for c in names]
+    lo = 0
+    for block in synthetic_blocks(n, seed):
+        m = len(block[0])
+        for out, values in zip(outs, block):
+            out[lo:lo + m] = values
+        lo += m
+    for out in outs:
+        out.flush()
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump({"symbol": symbol, "timeframe": "1m", "columns": list(OHLCV_COLUMNS),
+                   "rows": n, "tz": None, "source": "synthetic"}, f)
+
+def dataset(workdir, n, seed, columnar):
+    """Symbol name of the generated dataset of n bars in workdir/data, generated on first use."""
+    symbol = f"{SYMBOL}{n}"
+    data = os.path.join(workdir, "data")
+    os.makedirs(data, exist_ok=True)
+    if columnar:
+        path = os.path.join(data, f"{symbol}_1m")
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            write_columnar(path, n, seed, symbol)
+    else:
+        path = os.path.join(data, f"{symbol}_1m.csv")
+        if not os.path.exists(path):
+            write_csv(path + ".tmp", n, seed)
+            os.replace(path + ".tmp", path)
+    return symbol
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def _process_job_timer(symbol, n, streaming):
+    from app.db.session import engine, async_session
+    from app.db.models import Base, Strategy
+    from app.db import crud
+    from app.services.simulator import dataset_cache
+    from app.workers.worker import process_job
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_session() as db:
+            strategy = Strategy(name="bench", graph={"nodes": [], "edges": []})
+            db.add(strategy)
+            await db.commit()
+            return strategy.id
+
+    async def one(strategy_id):
+        payload = {"strategy_id": strategy_id, "symbol": symbol, "timeframe": "1m", "start": None, "end": None,
+                   "params": {"fast": 20, "slow": 50, "sl": 0.01, "tp": 0.02}, "force_close": True,
+                   "streaming": streaming}
+        async with async_session() as db:
+            job = await crud.create_backtest_job(db, payload)
+            await db.commit()
+        async with async_session() as db:
+            job = await crud.fetch_next_queued_job(db)
+        await process_job(job)
+        async with async_session() as db:
+            job = await crud.get_job(db, job.id)
+        if job.status != "finished":
+            raise RuntimeError(f"benchmark job failed: {job.error}")
+        return job.result["trades_count"]
+
+    loop = asyncio.new_event_loop()
+    strategy_id = loop.run_until_complete(setup())
+
+    def run():
+        # every repeat reads the data again, as a fresh worker would
+        dataset_cache.clear()
+        return loop.run_until_complete(one(strategy_id))
+    return run
+
+def run_case(case, workdir, n, seed, repeat, streaming):
+    """Runs in a fresh process: (best seconds, extra info, peak MiB allocated by one call, peak RSS MiB)."""
+    os.chdir(workdir)
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}")
+    from app.services import simulator
+
+    symbol = dataset(workdir, n, seed, columnar=streaming)
+    sltp = {"sl_pct": 0.01, "tp_pct": 0.02}
+    info = {}
+    if case == "load_ohlcv_from_csv":
+        fn = lambda: simulator.load_ohlcv_from_csv(symbol, "1m", None, None)
+    elif case == "process_job":
+        fn = _process_job_timer(symbol, n, streaming)
+        info["streaming"] = streaming
+    else:
+        df = simulator.load_ohlcv_from_csv(symbol, "1m", None, None)
+        if case == "run_sma_crossover":
+            fn = lambda: simulator.run_sma_crossover(df, 20, 50)
+        elif case == "run_sma_crossover_sltp":
+            fn = lambda: simulator.run_sma_crossover(df, 20, 50, **sltp)
+        elif case == "compute_metrics":
+            trades = simulator.run_sma_crossover(df, 20, 50, **sltp)
+            fn = lambda: simulator.compute_metrics(trades)
+            info["trades"] = len(trades)
+        elif case == "compute_equity_metrics":
+            trades = simulator.run_sma_crossover_columns(df, 20, 50, **sltp)
+            fn = lambda: simulator.compute_equity_metrics(df, trades, "1m")
+            info["trades"] = len(trades["pnl"])
+        else:
+            raise ValueError(f"unknown case {case}")
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    if case == "process_job":
+        info["trades"] = out
+    tracemalloc.start()
+    fn()
+    alloc = tracemalloc.get_traced_memory()[1] / (1 << 20)
+    tracemalloc.stop()
+    return best, info, alloc, peak_rss_mb()
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(args):
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="backtester-bench-"))
+    results = []
+    for n in (int(float(s)) for s in args.sizes):
+        streaming = n > args.max_in_memory
+        cases = ["process_job"] if streaming else IN_MEMORY_CASES
+        # generate once in this process so the timed children only read
+        dataset(workdir, n, args.seed, columnar=streaming)
+        for case in (c for c in cases if c in args.cases):
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                seconds, info, alloc, peak = pool.submit(
+                    run_case, case, workdir, n, args.seed, args.repeat, streaming).result()
+            row = {"case": case, "bars": n, "seconds": seconds, "bars_per_sec": n / seconds if seconds else None,
+                   "peak_alloc_mb": alloc, "peak_rss_mb": peak, **info}
+            results.append(row)
+            print(f"{case:24s} {n:>11,d} bars  {seconds:9.4f}s  {row['bars_per_sec']:>14,.0f} bars/s  "
+                  f"alloc {alloc:8.1f} MiB  rss {peak or 0:8.1f} MiB")
+    report = {
+        "meta": {
+            "created_at": pd.Timestamp.utcnow().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            return compare(report, json.load(f), args.threshold)
+    return 0
+
+def compare(current, baseline, threshold):
+    """Print throughput and memory changes per (case, bars); 1 if any regressed by more than threshold."""
+    base = {(r["case"], r["bars"]): r for r in baseline["results"]}
+    regressions = 0
+    for r in current["results"]:
+        b = base.get((r["case"], r["bars"]))
+        if b is None:
+            continue
+        flags = []
+        speed = r["bars_per_sec"] / b["bars_per_sec"] - 1 if r["bars_per_sec"] and b["bars_per_sec"] else None
+        if speed is not None and speed < -threshold:
+            flags.append("SLOWER")
+        # tiny allocations are mostly noise
+        mem = r["peak_alloc_mb"] / b["peak_alloc_mb"] - 1 if b["peak_alloc_mb"] >= 1 else None
+        if mem is not None and mem > threshold:
+            flags.append("MORE MEMORY")
+        regressions += bool(flags)
+        speed_s = f"{speed:+7.1%}" if speed is not None else "    n/a"
+        mem_s = f"{mem:+7.1%}" if mem is not None else "    n/a"
+        print(f"{r['case']:24s} {r['bars']:>11,d} bars  throughput {speed_s}  memory {mem_s}  {' '.join(flags)}")
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulator on synthetic OHLCV data")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the benchmarks and write a JSON report")
+    run.add_argument("--sizes", nargs="+", default=["1e4", "1e5", "1e6"], help="bar counts, e.g. 1e4 1e8")
+    run.add_argument("--cases", nargs="+", default=list(IN_MEMORY_CASES), choices=IN_MEMORY_CASES)
+    run.add_argument("--repeat", type=int, default=3, help="timed repeats per case; the best is reported")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--max-in-memory", type=float, default=1e7,
+                     help="larger sizes only run the streaming end-to-end job on the columnar store")
+    run.add_argument("--workdir", help="where generated data and the SQLite DB are kept (default: a temp dir)")
+    run.add_argument("--out", default="benchmark_results.json")
+    run.add_argument("--baseline", help="report to compare the new results against")
+    run.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+
+    cmp = sub.add_parser("compare", help="compare two reports")
+    cmp.add_argument("current")
+    cmp.add_argument("baseline")
+    cmp.add_argument("--threshold", type=float, default=0.10)
+
+    gen = sub.add_parser("generate", help="write a synthetic dataset")
+    gen.add_argument("symbol")
+    gen.add_argument("bars")
+    gen.add_argument("--dir", default=os.path.join("backend", "data"))
+    gen.add_argument("--format", choices=("csv", "columnar"), default="csv")
+    gen.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        sys.exit(run_benchmarks(args))
+    if args.command == "compare":
+        with open(args.current) as f, open(args.baseline) as g:
+            sys.exit(compare(json.load(f), json.load(g), args.threshold))
+    n = int(float(args.bars))
+    os.makedirs(args.dir, exist_ok=True)
+    if args.format == "csv":
+        write_csv(os.path.join(args.dir, f"{args.symbol}_1m.csv"), n, args.seed)
+    else:
+        write_columnar(os.path.join(args.dir, f"{args.symbol}_1m"), n, args.seed, args.symbol)
+    print(f"Wrote {n:,d} bars of {args.symbol} 1m to {args.dir}")
+
+if __name__ == '__main__':
+    main()
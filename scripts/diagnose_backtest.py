@@ -1,7 +1,11 @@
+import sys
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+from app.services.indicators import rolling_mean  # noqa: E402
+
 def load_df():
     p1 = Path("backend/data/BTCUSD_1m.csv")
     p2 = Path("data/BTCUSD_1m.csv")
@@ -16,8 +20,10 @@ def load_df():
 
 def compute_smas(df, fast, slow):
     d = df.copy()
-    d["sma_fast"] = d["close"].rolling(window=fast, min_periods=1).mean()
-    d["sma_slow"] = d["close"].rolling(window=slow, min_periods=1).mean()
+    close = d["close"].to_numpy(dtype=float)
+    # same kernel as the engines, so the diagnosis sees the exact SMAs they traded on
+    d["sma_fast"] = rolling_mean(close, fast)
+    d["sma_slow"] = rolling_mean(close, slow)
     d["fast_gt_slow"] = d["sma_fast"] > d["sma_slow"]
     d["signal"] = d["fast_gt_slow"].astype(int).diff().fillna(0).astype(int)
     return d
@@ -1,19 +1,13 @@
 import sys
-import json
-from datetime import datetime
 import matplotlib.pyplot as plt
+from backtest_io import load
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python scripts/plot_backtest.py <backtest_json_file>")
+        print("Usage: python scripts/plot_backtest.py <backtest_json_file | trades or equity .ndjson/.arrow export | export URL>")
         sys.exit(1)
 
-    fn = sys.argv[1]
-    with open(fn) as f:
-        data = json.load(f)
-
-    trades = data.get("result", {}).get("trades", []) if "result" in data else data.get("trades", [])
-    metrics = data.get("result", {}).get("metrics", {}) if "result" in data else data.get("metrics", {})
+    metrics, trades, equity = load(sys.argv[1])
 
     print("METRICS:")
     if metrics:
@@ -22,18 +16,22 @@ def main():
     else:
         print("  (no metrics found)")
 
-    # build equity (cumulative pnl) over trade exit times
-    if trades:
-        trades_sorted = sorted(trades, key=lambda t: t["exit_time"])
-        times = [datetime.fromisoformat(t["exit_time"]) for t in trades_sorted]
-        pnls = [t["pnl"] for t in trades_sorted]
-        cum = []
-        s = 0.0
-        for p in pnls:
-            s += p
-            cum.append(s)
+    # bar-level equity stored by the simulator, when the result has it
+    if equity is not None and len(equity):
+        plt.plot(equity["ts"], equity["equity"])
+        plt.title("Equity curve (mark-to-market)")
+        plt.xlabel("Time")
+        plt.ylabel("Equity (PnL)")
+        plt.grid(True)
+        plt.tight_layout()
+        plt.show()
+    # otherwise build equity (cumulative pnl) over trade exit times
+    elif trades is not None and len(trades):
+        trades_sorted = trades.sort_values("exit_ts", kind="stable")
+        cum = trades_sorted["pnl"].cumsum()
 
-        plt.plot(times, cum, marker='o')
+        # markers only while they stay readable
+        plt.plot(trades_sorted["exit_ts"], cum, marker='o' if len(cum) <= 1000 else None)
         plt.title("Equity curve (trade-based)")
         plt.xlabel("Exit time")
         plt.ylabel("Cumulative PnL")
@@ -1,28 +1,12 @@
 import sys
-import json
-from datetime import datetime
-
-def parse_time(s):
-    # handles ISO timestamps produced by the simulator
-    try:
-        return datetime.fromisoformat(s)
-    except Exception:
-        # fallback: try removing timezone Z or fractions
-        return datetime.fromisoformat(s.split('+')[0])
+from backtest_io import load
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python scripts/print_backtest.py <backtest_json_file>")
+        print("Usage: python scripts/print_backtest.py <backtest_json_file | trades .ndjson/.arrow export | export URL>")
         sys.exit(1)
 
-    fn = sys.argv[1]
-    with open(fn) as f:
-        data = json.load(f)
-
-    # support both API-wrapped result and raw result object
-    wrapper = "result" in data
-    trades = data.get("result", {}).get("trades", []) if wrapper else data.get("trades", [])
-    metrics = data.get("result", {}).get("metrics", {}) if wrapper else data.get("metrics", {})
+    metrics, trades, _ = load(sys.argv[1])
 
     print("METRICS:")
     if metrics:
@@ -30,35 +14,20 @@ def main():
             print(f"  {k}: {v}")
     else:
         print("  (no metrics found)")
-    print(f"Number of trades: {len(trades)}\n")
+    n = len(trades) if trades is not None else 0
+    print(f"Number of trades: {n}\n")
 
-    if not trades:
+    if not n:
         print("No trades in this backtest.")
         return
 
-    for i, t in enumerate(trades, 1):
-        entry_time = t.get("entry_time")
-        exit_time = t.get("exit_time")
-        entry_price = t.get("entry_price")
-        exit_price = t.get("exit_price")
-        pnl = t.get("pnl")
-        reason = t.get("exit_reason", "n/a")
-
-        # duration in seconds and in bars (if timestamps parse)
-        duration_sec = None
-        duration_bars = None
-        try:
-            et = parse_time(entry_time)
-            xt = parse_time(exit_time)
-            duration_sec = (xt - et).total_seconds()
-        except Exception:
-            duration_sec = None
-
-        # estimate bars if timestamps are evenly spaced: count bars between times in trades list not available here,
-        # so show duration in seconds and leave bars None.
-        print(f"Trade {i}: entry={entry_price} at {entry_time} | exit={exit_price} at {exit_time} | pnl={pnl} | reason={reason}")
-        if duration_sec is not None:
-            print(f"         duration: {duration_sec} seconds")
+    # duration in seconds, for every trade at once
+    duration = (trades["exit_ts"] - trades["entry_ts"]).dt.total_seconds()
+    reasons = trades["exit_reason"] if "exit_reason" in trades else None
+    reasons = reasons.astype(object).where(reasons.notna(), "n/a") if reasons is not None else ["n/a"] * n
+    for i, (t, sec, reason) in enumerate(zip(trades.itertuples(index=False), duration, reasons), 1):
+        print(f"Trade {i}: entry={t.entry_price} at {t.entry_ts.isoformat()} | exit={t.exit_price} at {t.exit_ts.isoformat()} | pnl={t.pnl} | reason={reason}")
+        print(f"         duration: {sec} seconds")
         print()
 
 if __name__ == '__main__':